@@ -12,6 +12,7 @@ from pathlib import Path
 from ThreeDiToolbox import dependencies
 
 import faulthandler
+import multiprocessing
 import sys
 
 
@@ -23,7 +24,12 @@ PLUGIN_DIR = Path(__file__).parent
 # uses by default.
 if sys.stderr is not None and hasattr(sys.stderr, "fileno"):
     faulthandler.enable()
-dependencies.ensure_everything_installed()
+# Worker processes (see processing/workers.py) import this package as well to
+# run their jobs. The dependencies have been checked by Qgis' own process
+# already, checking them again per worker would only slow down the start.
+# (Not multiprocessing.parent_process(): that needs python 3.8.)
+if multiprocessing.current_process().name == "MainProcess":
+    dependencies.ensure_everything_installed()
 
 
 def classFactory(iface):
@@ -30,6 +30,22 @@ bergermeer_dir = data_dir / "testmodel" / "v2_bergermeer"
 results_3di_path = bergermeer_dir / "results_3di.nc"
 
 
+@pytest.fixture(autouse=True)
+def array_cache(tmp_path):
+    """Fixture: an empty disk cache of result arrays for every test
+
+    Otherwise the tests share the cache in the temp dir with each other (and
+    with QGIS).
+    """
+    # Late import, otherwise we get circular import errors.
+    from ThreeDiToolbox.datasource import result_array_cache
+
+    old_settings = dict(result_array_cache._settings)
+    result_array_cache.configure(directory=tmp_path / "array_cache")
+    yield
+    result_array_cache._settings.update(old_settings)
+
+
 @pytest.fixture()
 def threedi_result():
     """Fixture: return a instance of ThreediResult
@@ -0,0 +1,138 @@
+"""Disk cache of decoded result variables, shared between QGIS sessions
+
+``ThreediResult`` keeps every variable it reads (all timesteps, all objects)
+in memory. This module additionally stores those arrays as .npy files, so a
+new QGIS session memory-maps them instead of decoding the netcdf again.
+
+The files are keyed by the path and signature of the result file (see
+``file_signature()``) and the variable, so a changed result is never served
+from the cache. The total size of the cache is kept below ``max_size`` by
+removing the least recently used files.
+
+Note: this module does not import qgis.
+"""
+from ThreeDiToolbox.datasource.result_metadata import file_signature
+
+import glob
+import hashlib
+import logging
+import numpy as np
+import os
+import tempfile
+
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = ".npy"
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # 2 GB
+
+_settings = {
+    "directory": os.path.join(tempfile.gettempdir(), "threedi_result_cache"),
+    "max_size": DEFAULT_MAX_SIZE,
+}
+
+
+def configure(directory=None, max_size=None):
+    """Set the cache directory and/or the maximum cache size in bytes"""
+    if directory is not None:
+        _settings["directory"] = str(directory)
+    if max_size is not None:
+        _settings["max_size"] = max_size
+
+
+def cache_dir():
+    return _settings["directory"]
+
+
+def _cache_file(file_path, variable):
+    path = os.path.abspath(str(file_path))
+    key = "{}|{}|{}|{}".format(path, *file_signature(path), variable)
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir(), "{}_{}{}".format(variable, digest, SUFFIX))
+
+
+def load_array(file_path, variable):
+    """Return the cached array of a variable (read-only, memory-mapped) or None
+
+    :param file_path: the result file the variable is read from
+    :param variable: (str) variable name, e.g. 's1', 'q_pump'
+    """
+    cache_file = _cache_file(file_path, variable)
+    if not os.path.exists(cache_file):
+        return None
+    try:
+        values = np.load(cache_file, mmap_mode="r")
+    except (OSError, ValueError):
+        logger.exception("Could not read cached %s, ignoring it", cache_file)
+        return None
+    # the modification time is the last use, for evicting the oldest files
+    os.utime(cache_file)
+    logger.debug("Loaded %s of %s from %s", variable, file_path, cache_file)
+    return values
+
+
+def save_array(file_path, variable, values):
+    """Write the array of a variable to the cache and evict old files
+
+    Nothing is written when the array alone is larger than the maximum size.
+    """
+    if values.nbytes > _settings["max_size"]:
+        return
+    cache_file = _cache_file(file_path, variable)
+    os.makedirs(cache_dir(), exist_ok=True)
+    # write under a temporary name, so a half written file is never loaded
+    fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=cache_dir())
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            np.save(tmp_file, np.ascontiguousarray(values))
+        os.replace(tmp_path, cache_file)
+    except OSError:
+        logger.exception("Could not write %s to the cache", variable)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    evict(keep=cache_file)
+
+
+def cache_files():
+    """Return the paths of all cached arrays"""
+    return glob.glob(os.path.join(cache_dir(), "*" + SUFFIX))
+
+
+def cache_size():
+    """Return the total size of the cached arrays in bytes"""
+    return sum(os.path.getsize(path) for path in cache_files())
+
+
+def evict(keep=None):
+    """Remove least recently used arrays until the cache fits in max_size"""
+    files = [(os.stat(path), path) for path in cache_files()]
+    files.sort(key=lambda item: item[0].st_mtime)
+    total = sum(stat.st_size for stat, _ in files)
+    for stat, path in files:
+        if total <= _settings["max_size"]:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            # on windows, arrays that are still memory-mapped can't be removed
+            logger.debug("Could not evict %s", path)
+            continue
+        total -= stat.st_size
+
+
+def clear_array_cache():
+    """Remove all cached arrays
+
+    :return: list of the files that could not be removed (still in use)
+    """
+    failed = []
+    for path in cache_files():
+        try:
+            os.remove(path)
+        except OSError:
+            logger.exception("Could not remove %s", path)
+            failed.append(path)
+    return failed
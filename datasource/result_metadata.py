@@ -0,0 +1,66 @@
+"""Cache of metadata (like timestamps) read from result files
+
+The processing dialogs, the time slider and the tools all ask for the same
+timestamps. The values are cached per file and kept until the file changes
+(see ``file_signature()``), so re-opening a dialog or switching between
+results does not read the HDF5 file again.
+
+Note: this module does not import qgis.
+"""
+import h5py
+import logging
+import numpy as np
+import os
+
+
+logger = logging.getLogger(__name__)
+
+# {(file path, key): (file signature, value)}
+_metadata_cache = {}
+
+
+def file_signature(file_path):
+    """Return (mtime, size) of a file, to detect that it has changed"""
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def cached_metadata(file_path, key, load):
+    """Return ``load()``, cached per file and key until the file changes
+
+    :param file_path: the file the value is read from
+    :param key: hashable, identifies the value within the file
+    :param load: callable without arguments that reads the value
+
+    Cached numpy arrays are made read-only, as every caller gets the same
+    array.
+    """
+    path = os.path.abspath(str(file_path))
+    signature = file_signature(path)
+    cached = _metadata_cache.get((path, key))
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    logger.debug("Reading %s of %s", key, path)
+    value = load()
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    _metadata_cache[(path, key)] = (signature, value)
+    return value
+
+
+def clear_metadata_cache():
+    """Forget all cached metadata"""
+    _metadata_cache.clear()
+
+
+def netcdf_timestamps(netcdf_file_path):
+    """Return the 'time' variable of a (results_3di.nc) netcdf, cached
+
+    :return: 1d np.array with the timestamps in seconds
+    """
+
+    def load():
+        with h5py.File(netcdf_file_path, "r") as results:
+            return results["time"][:]
+
+    return cached_metadata(netcdf_file_path, "time", load)
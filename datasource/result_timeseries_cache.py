@@ -0,0 +1,131 @@
+"""Node-major copy of result variables, for fast time series of single objects
+
+The result netcdfs are stored time-major: the values of one node are spread
+over every timestep chunk, so the time series of one node (the graph tool, the
+sideview) reads the whole variable. The sidecar file next to the netcdf (see
+``timeseries_cache_path()``) stores selected variables transposed, as
+(object id, timestep), chunked per group of objects and compressed. The time
+series of a few objects then only reads a few chunks.
+
+The sidecar is optional: it is only used for variables that have been written
+to it and it is ignored when the netcdf changed after writing (see
+``file_signature()``). Timestep oriented reads keep using the netcdf.
+
+Note: this module does not import qgis.
+"""
+from ThreeDiToolbox.datasource.result_metadata import file_signature
+
+import h5py
+import logging
+import numpy as np
+import os
+
+
+logger = logging.getLogger(__name__)
+
+# Target (uncompressed) size of one chunk of the sidecar datasets
+CHUNK_BYTES = 1024 * 1024
+# Number of timesteps read from the netcdf at once while writing
+BLOCK_TIMESTEPS = 100
+# Maximum size of the hdf5 chunk cache while writing: when the whole variable
+# fits in it, every chunk is compressed only once
+MAX_WRITE_CACHE_BYTES = 512 * 1024 * 1024
+
+
+def timeseries_cache_path(netcdf_file_path):
+    """Return the path of the sidecar file of a netcdf
+
+    E.g. 'results_3di.nc' -> 'results_3di.timeseries.h5'
+    """
+    return os.path.splitext(str(netcdf_file_path))[0] + ".timeseries.h5"
+
+
+def has_variable(netcdf_file_path, variable):
+    """Return whether the sidecar contains an up to date copy of the variable"""
+    cache_path = timeseries_cache_path(netcdf_file_path)
+    if not os.path.exists(cache_path):
+        return False
+    signature = list(file_signature(netcdf_file_path))
+    try:
+        with h5py.File(cache_path, "r") as cache:
+            if variable not in cache:
+                return False
+            return list(cache[variable].attrs.get("source_signature", [])) == signature
+    except OSError:
+        logger.exception("Could not read time series cache %s", cache_path)
+        return False
+
+
+def read_timeseries(netcdf_file_path, variable, object_ids):
+    """Return the time series of objects from the sidecar
+
+    :param object_ids: sequence of object ids, in any order, with duplicates
+    :return: 2d np.array of shape (timesteps, len(object_ids)), or None when
+        an id is not in the cached variable
+    """
+    object_ids = np.asarray(object_ids, dtype=int).ravel()
+    # h5py only accepts increasing, unique indices
+    unique_ids, inverse = np.unique(object_ids, return_inverse=True)
+    cache_path = timeseries_cache_path(netcdf_file_path)
+    with h5py.File(cache_path, "r") as cache:
+        dataset = cache[variable]
+        if len(unique_ids) and (unique_ids[0] < 0 or unique_ids[-1] >= len(dataset)):
+            return None
+        values = dataset[unique_ids, :]
+    return values[inverse].T
+
+
+def _chunk_rows(n_objects, n_timesteps, itemsize):
+    """Number of objects per chunk, for chunks of about CHUNK_BYTES"""
+    rows = CHUNK_BYTES // max(1, n_timesteps * itemsize)
+    return int(min(max(1, rows), max(1, n_objects)))
+
+
+def write_variable(netcdf_file_path, variable, read_block, n_timesteps):
+    """Write a variable node-major to the sidecar
+
+    The variable is read in blocks of BLOCK_TIMESTEPS. The signature of the
+    netcdf is written last, so an interrupted write is never used.
+
+    :param read_block: callable(start, stop) returning the values of timesteps
+        start:stop as a 2d np.array of shape (stop - start, objects)
+    :param n_timesteps: the number of timesteps of the variable
+    :return: generator yielding the number of timesteps written so far. Iterate
+        it to write the variable, stop iterating to cancel.
+    """
+    if n_timesteps == 0:
+        return
+    signature = file_signature(netcdf_file_path)
+    cache_path = timeseries_cache_path(netcdf_file_path)
+    first = read_block(0, min(BLOCK_TIMESTEPS, n_timesteps))
+    n_objects = first.shape[1]
+    nbytes = n_objects * n_timesteps * first.dtype.itemsize
+    rows = _chunk_rows(n_objects, n_timesteps, first.dtype.itemsize)
+    n_chunks = -(-n_objects // rows)
+    with h5py.File(
+        cache_path,
+        "a",
+        rdcc_nbytes=min(nbytes, MAX_WRITE_CACHE_BYTES) + CHUNK_BYTES,
+        rdcc_nslots=n_chunks * 100 + 1,
+    ) as cache:
+        if variable in cache:
+            del cache[variable]
+        dataset = cache.create_dataset(
+            variable,
+            shape=(n_objects, n_timesteps),
+            dtype=first.dtype,
+            chunks=(rows, n_timesteps),
+            compression="gzip",
+            shuffle=True,
+        )
+        values = first
+        start = 0
+        while start < n_timesteps:
+            stop = start + values.shape[0]
+            dataset[:, start:stop] = values.T
+            yield stop
+            start = stop
+            if start < n_timesteps:
+                values = read_block(start, min(start + BLOCK_TIMESTEPS, n_timesteps))
+        dataset.attrs["source_signature"] = list(signature)
+    logger.info("Wrote %s to time series cache %s", variable, cache_path)
@@ -7,10 +7,12 @@ from qgis.PyQt.QtCore import QVariant
 from threedigrid.admin import gridresultadmin
 from threedigrid.admin.constants import NO_DATA_VALUE
 from ThreeDiToolbox.datasource import base
+from ThreeDiToolbox.datasource import threedi_results
 from ThreeDiToolbox.datasource.spatialite import Spatialite
 from ThreeDiToolbox.datasource.threedi_results import find_aggregation_netcdf
 from ThreeDiToolbox.datasource.threedi_results import find_h5_file
 from ThreeDiToolbox.datasource.threedi_results import normalized_object_type
+from ThreeDiToolbox.datasource.threedi_results import plan_chunk_reads
 from ThreeDiToolbox.datasource.threedi_results import ThreediResult
 from ThreeDiToolbox.tests.utilities import ensure_qgis_app_is_initialized
 from ThreeDiToolbox.tests.utilities import TemporaryDirectory
@@ -452,3 +454,56 @@ def test_ds_aggregation_file_missing(threedi_result):
 def test_find_h5_file_not_found():
     with pytest.raises(FileNotFoundError):
         find_h5_file("/does/not/exist/")
+
+
+def test_plan_chunk_reads():
+    ranges, rows = plan_chunk_reads([5, 3, 3, 40, 41, 92], 10, 95)
+    assert ranges == [(0, 10), (40, 50), (90, 95)]
+    assert rows.tolist() == [5, 3, 3, 10, 11, 22]
+    # negative indices count from the end
+    ranges, rows = plan_chunk_reads([-1, 2], 10, 95)
+    assert ranges == [(0, 10), (90, 95)]
+    assert rows.tolist() == [14, 2]
+    ranges, rows = plan_chunk_reads([], 10, 95)
+    assert ranges == []
+    assert rows.tolist() == []
+    with pytest.raises(IndexError):
+        plan_chunk_reads([95], 10, 95)
+    with pytest.raises(IndexError):
+        plan_chunk_reads([-96], 10, 95)
+
+
+def test_plan_chunk_reads_consecutive_chunks():
+    ranges, rows = plan_chunk_reads([25, 3, 17], 10, 100)
+    assert ranges == [(0, 30)]
+    assert rows.tolist() == [25, 3, 17]
+
+
+def test_get_values_by_timestep_nr_without_cache(threedi_result):
+    timestamp_idx = np.array([3, 1, 3])
+    node_ids = np.array([5, 2, 5])
+    values = threedi_result.get_values_by_timestep_nr(
+        "s1", timestamp_idx, node_ids=node_ids, use_cache=False
+    )
+    assert "s1" not in threedi_result._cache
+    expected = threedi_result.get_values_by_timestep_nr(
+        "s1", timestamp_idx, node_ids=node_ids
+    )
+    np.testing.assert_equal(values, expected)
+
+
+@mock.patch.object(threedi_results, "READ_BLOCK_SIZE", 1)
+def test_iter_values_by_timestep(threedi_result):
+    node_ids = np.array([5, 2, 5])
+    values = list(threedi_result.iter_values_by_timestep("s1", node_ids=node_ids))
+    assert "s1" not in threedi_result._cache
+    n_timestamps = len(threedi_result.get_timestamps("s1"))
+    expected = threedi_result.get_values_by_timestep_nr(
+        "s1", np.arange(n_timestamps), node_ids=node_ids
+    )
+    np.testing.assert_equal(values, expected)
+    # from the cache, without the trash element
+    values = list(threedi_result.iter_values_by_timestep("s1"))
+    np.testing.assert_equal(
+        values[-1], threedi_result.get_values_by_timestep_nr("s1", -1)
+    )
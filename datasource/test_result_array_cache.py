@@ -0,0 +1,66 @@
+from ThreeDiToolbox.datasource import result_array_cache
+
+import numpy as np
+import os
+import pytest
+
+
+@pytest.fixture()
+def array_cache(tmp_path):
+    old_settings = dict(result_array_cache._settings)
+    result_array_cache.configure(directory=tmp_path / "cache", max_size=10000)
+    yield
+    result_array_cache._settings.update(old_settings)
+
+
+@pytest.fixture()
+def netcdf_path(tmp_path):
+    path = str(tmp_path / "results_3di.nc")
+    with open(path, "w") as results:
+        results.write("doesnt matter")
+    return path
+
+
+def test_load_array_not_cached(array_cache, netcdf_path):
+    assert result_array_cache.load_array(netcdf_path, "s1") is None
+
+
+def test_save_and_load_array(array_cache, netcdf_path):
+    values = np.arange(12, dtype=np.float64).reshape(3, 4)
+    result_array_cache.save_array(netcdf_path, "s1", values)
+    cached = result_array_cache.load_array(netcdf_path, "s1")
+    assert isinstance(cached, np.memmap)
+    assert not cached.flags.writeable
+    np.testing.assert_equal(cached, values)
+    assert result_array_cache.load_array(netcdf_path, "q") is None
+
+
+def test_changed_file_is_not_served(array_cache, netcdf_path):
+    result_array_cache.save_array(netcdf_path, "s1", np.zeros(3))
+    stat = os.stat(netcdf_path)
+    os.utime(netcdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert result_array_cache.load_array(netcdf_path, "s1") is None
+
+
+def test_too_large_array_is_not_saved(array_cache, netcdf_path):
+    result_array_cache.save_array(netcdf_path, "s1", np.zeros(2000))
+    assert result_array_cache.cache_files() == []
+
+
+def test_evict_least_recently_used(array_cache, netcdf_path):
+    # each array is 4000 bytes (+ header), max_size is 10000
+    for i, variable in enumerate(["s1", "q", "u1"]):
+        result_array_cache.save_array(netcdf_path, variable, np.zeros(500))
+        # make sure the modification times differ, whatever the file system
+        for path in result_array_cache.cache_files():
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10 ** 9))
+    assert result_array_cache.load_array(netcdf_path, "s1") is None
+    assert result_array_cache.load_array(netcdf_path, "q") is not None
+    assert result_array_cache.load_array(netcdf_path, "u1") is not None
+
+
+def test_clear_array_cache(array_cache, netcdf_path):
+    result_array_cache.save_array(netcdf_path, "s1", np.zeros(3))
+    assert result_array_cache.clear_array_cache() == []
+    assert result_array_cache.cache_files() == []
@@ -0,0 +1,52 @@
+from ThreeDiToolbox.datasource import result_metadata
+
+import h5py
+import numpy as np
+import os
+import pytest
+
+
+@pytest.fixture()
+def netcdf_path(tmp_path):
+    result_metadata.clear_metadata_cache()
+    path = str(tmp_path / "results_3di.nc")
+    with h5py.File(path, "w") as results:
+        results["time"] = np.array([0.0, 300.0, 600.0])
+    return path
+
+
+def test_netcdf_timestamps(netcdf_path):
+    timestamps = result_metadata.netcdf_timestamps(netcdf_path)
+    assert timestamps.tolist() == [0.0, 300.0, 600.0]
+
+
+def test_netcdf_timestamps_read_only(netcdf_path):
+    timestamps = result_metadata.netcdf_timestamps(netcdf_path)
+    with pytest.raises(ValueError):
+        timestamps[0] = 60.0
+    timestamps = result_metadata.netcdf_timestamps(netcdf_path)
+    assert timestamps.tolist() == [0.0, 300.0, 600.0]
+
+
+def test_cached_metadata_loads_once(netcdf_path):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return "value"
+
+    assert result_metadata.cached_metadata(netcdf_path, "key", load) == "value"
+    assert result_metadata.cached_metadata(netcdf_path, "key", load) == "value"
+    assert len(calls) == 1
+
+
+def test_cached_metadata_reloads_changed_file(netcdf_path):
+    result_metadata.netcdf_timestamps(netcdf_path)
+    with h5py.File(netcdf_path, "a") as results:
+        del results["time"]
+        results["time"] = np.array([0.0, 60.0])
+    # make sure the modification time differs, whatever the file system
+    stat = os.stat(netcdf_path)
+    os.utime(netcdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    timestamps = result_metadata.netcdf_timestamps(netcdf_path)
+    assert timestamps.tolist() == [0.0, 60.0]
@@ -0,0 +1,76 @@
+from ThreeDiToolbox.datasource import result_timeseries_cache
+
+import mock
+import numpy as np
+import os
+import pytest
+
+
+# 7 timesteps, 5 objects (the first being the trash element)
+VALUES = np.arange(35, dtype=np.float64).reshape(7, 5)
+
+
+@pytest.fixture()
+def netcdf_path(tmp_path):
+    path = str(tmp_path / "results_3di.nc")
+    with open(path, "w") as results:
+        results.write("doesnt matter")
+    return path
+
+
+def write(netcdf_path, values=VALUES):
+    def read_block(start, stop):
+        return values[start:stop]
+
+    return list(
+        result_timeseries_cache.write_variable(
+            netcdf_path, "s1", read_block, len(values)
+        )
+    )
+
+
+def test_timeseries_cache_path():
+    path = os.path.join("results", "results_3di.nc")
+    expected = os.path.join("results", "results_3di.timeseries.h5")
+    assert result_timeseries_cache.timeseries_cache_path(path) == expected
+
+
+def test_has_variable_without_cache(netcdf_path):
+    assert not result_timeseries_cache.has_variable(netcdf_path, "s1")
+
+
+def test_write_and_read(netcdf_path):
+    with mock.patch.object(result_timeseries_cache, "BLOCK_TIMESTEPS", 3):
+        assert write(netcdf_path) == [3, 6, 7]
+    assert result_timeseries_cache.has_variable(netcdf_path, "s1")
+    assert not result_timeseries_cache.has_variable(netcdf_path, "q")
+    values = result_timeseries_cache.read_timeseries(netcdf_path, "s1", [3])
+    np.testing.assert_equal(values, VALUES[:, [3]])
+
+
+def test_read_unsorted_duplicate_ids(netcdf_path):
+    write(netcdf_path)
+    values = result_timeseries_cache.read_timeseries(netcdf_path, "s1", [4, 1, 4])
+    np.testing.assert_equal(values, VALUES[:, [4, 1, 4]])
+
+
+def test_read_unknown_id(netcdf_path):
+    write(netcdf_path)
+    assert result_timeseries_cache.read_timeseries(netcdf_path, "s1", [5]) is None
+
+
+def test_cancelled_write_is_not_used(netcdf_path):
+    with mock.patch.object(result_timeseries_cache, "BLOCK_TIMESTEPS", 3):
+        writer = result_timeseries_cache.write_variable(
+            netcdf_path, "s1", lambda start, stop: VALUES[start:stop], len(VALUES)
+        )
+        next(writer)
+        writer.close()
+    assert not result_timeseries_cache.has_variable(netcdf_path, "s1")
+
+
+def test_changed_netcdf_invalidates_cache(netcdf_path):
+    write(netcdf_path)
+    stat = os.stat(netcdf_path)
+    os.utime(netcdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not result_timeseries_cache.has_variable(netcdf_path, "s1")
@@ -1,11 +1,16 @@
 from cached_property import cached_property
 from threedigrid.admin.constants import NO_DATA_VALUE
+from ThreeDiToolbox.datasource import result_array_cache
+from ThreeDiToolbox.datasource import result_timeseries_cache
 from ThreeDiToolbox.datasource.base import BaseDataSource
 from ThreeDiToolbox.datasource.result_constants import LAYER_OBJECT_TYPE_MAPPING
 from ThreeDiToolbox.datasource.result_constants import SUBGRID_MAP_VARIABLES
+from ThreeDiToolbox.datasource.result_metadata import cached_metadata
+from ThreeDiToolbox.datasource.result_metadata import netcdf_timestamps
 from ThreeDiToolbox.utils.patched_threedigrid import GridH5Admin
 from ThreeDiToolbox.utils.patched_threedigrid import GridH5AggregateResultAdmin
 from ThreeDiToolbox.utils.patched_threedigrid import GridH5ResultAdmin
+from ThreeDiToolbox.utils.timing import timed
 
 import glob
 import h5py
@@ -16,6 +21,11 @@ import os
 
 logger = logging.getLogger(__name__)
 
+# Size of the hdf5 chunk cache (rdcc_nbytes) per opened result file
+CHUNK_CACHE_SIZE = 32 * 1024 * 1024
+# Approximate number of bytes read at once by iter_values_by_timestep
+READ_BLOCK_SIZE = 32 * 1024 * 1024
+
 
 def normalized_object_type(current_layer_name):
     """Get a normalized object type for internal purposes."""
@@ -27,6 +37,42 @@ def normalized_object_type(current_layer_name):
         return None
 
 
+def plan_chunk_reads(indices, chunk_length, length):
+    """Plan chunk-aligned reads of the given indices along a chunked dimension
+
+    Indices in the same or in consecutive chunks are read at once, so every
+    chunk is read at most once. The indices can be unsorted, negative (counted
+    from the end, like numpy) and contain duplicates.
+
+    :param indices: 1d array of indices
+    :param chunk_length: the chunk size along the dimension
+    :param length: the size of the dimension
+    :return: tuple of a list of (start, stop) ranges to read and a 1d array with
+        the position of every index in the concatenated ranges
+    :raises IndexError: if an index is out of range
+    """
+    indices = np.asarray(indices, dtype=int).ravel()
+    if len(indices) == 0:
+        return [], indices
+    if indices.min() < -length or indices.max() >= length:
+        raise IndexError(
+            "Index out of range for a dimension of length {}".format(length)
+        )
+    indices = indices % length
+    chunks = np.unique(indices // chunk_length)
+    # start a new read where chunks are skipped
+    groups = np.split(chunks, np.nonzero(np.diff(chunks) > 1)[0] + 1)
+    ranges = [
+        (int(group[0]) * chunk_length, min((int(group[-1]) + 1) * chunk_length, length))
+        for group in groups
+        if len(group)
+    ]
+    starts = np.array([start for start, _ in ranges], dtype=int)
+    offsets = np.cumsum([0] + [stop - start for start, stop in ranges])[:-1]
+    read = np.searchsorted(starts, indices, side="right") - 1
+    return ranges, offsets[read] + indices - starts[read]
+
+
 class ThreediResult(BaseDataSource):
     """Provides access to result data of a 3Di simulation
 
@@ -50,9 +96,11 @@ class ThreediResult(BaseDataSource):
 
     """
 
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, chunk_cache_size=CHUNK_CACHE_SIZE):
         self.file_path = file_path
+        self.chunk_cache_size = chunk_cache_size
         self._cache = {}
+        self._chunk_lengths = {}
 
     @cached_property
     def available_subgrid_map_vars(self):
@@ -125,17 +173,21 @@ class ThreediResult(BaseDataSource):
 
         If no parameter is given, returns the timestamps of the result-netcdf.
 
+        The timestamps are cached until the netcdf changes, see
+        :py:mod:`ThreeDiToolbox.datasource.result_metadata`.
+
         :return: 1d np.array
         """
-        # TODO: the property self.timestamps is cached but this method is not.
-        #  This might cause performance issues. Check if these timestamps are
-        #  often queried and cause performance issues.
         if parameter is None or parameter in [v[0] for v in SUBGRID_MAP_VARIABLES]:
-            return self.result_admin.nodes.timestamps
+            return netcdf_timestamps(self.file_path)
         else:
             ga = self.get_gridadmin(variable=parameter)
-            return ga.get_model_instance_by_field_name(parameter).get_timestamps(
-                parameter
+            return cached_metadata(
+                find_aggregation_netcdf(self.file_path),
+                ("time", parameter),
+                lambda: ga.get_model_instance_by_field_name(parameter).get_timestamps(
+                    parameter
+                ),
             )
 
     def get_gridadmin(self, variable=None):
@@ -171,6 +223,10 @@ class ThreediResult(BaseDataSource):
         If there is no values of the given variable, only the timestamps are
         returned, i.e. an array of shape (n, 1) with n being the timestamps.
 
+        Per-object time series are read from the node-major time series cache
+        when the variable has been written to it, see
+        ``build_timeseries_cache()``.
+
         :param nc_variable:
         :param node_id:
         :param content_pk:
@@ -178,16 +234,23 @@ class ThreediResult(BaseDataSource):
         :return: 2D array, first column being the timestamps
         """
         ga = self.get_gridadmin(nc_variable)
+        model_instance = ga.get_model_instance_by_field_name(nc_variable)
 
-        filtered_result = ga.get_model_instance_by_field_name(nc_variable).timeseries(
-            indexes=slice(None)
-        )
-        if node_id:
-            filtered_result = filtered_result.filter(id=node_id)
-        elif content_pk:
-            filtered_result = filtered_result.filter(content_pk=content_pk)
-
-        values = filtered_result.get_filtered_field_value(nc_variable)
+        with timed("threedi_result.get_timeseries") as measurement:
+            values = None
+            if node_id or content_pk:
+                values = self._cached_timeseries(
+                    nc_variable, model_instance, node_id, content_pk
+                )
+                measurement.cache_hit(values is not None)
+            if values is None:
+                filtered_result = model_instance.timeseries(indexes=slice(None))
+                if node_id:
+                    filtered_result = filtered_result.filter(id=node_id)
+                elif content_pk:
+                    filtered_result = filtered_result.filter(content_pk=content_pk)
+                values = filtered_result.get_filtered_field_value(nc_variable)
+            measurement.add_bytes(values.nbytes)
 
         if fill_value is not None:
             values[values == NO_DATA_VALUE] = fill_value
@@ -196,52 +259,64 @@ class ThreediResult(BaseDataSource):
         timestamps = timestamps.reshape(-1, 1)  # reshape (n,) to (n, 1)
         return np.hstack([timestamps, values])
 
-    # This method is similar as get_values_by_timestep_nr but does not cache
-    # values. Moreover, it tries to only query the minimum needed data needed.
-    # def get_values_by_timestep_nr_no_caching(
-    #     self, variable, timestamp_idx, node_ids=None
-    # ):
-    #     """Return an array of values of the given variable on the specified timestamp(s)
-    #
-    #     If an array of timestamps is given, a 2d numpy array is returned.
-    #     If index is specified, only the node_ids specified in the index will
-    #     be returned.
-    #
-    #     :param variable: (str) variable name, e.g. 's1', 'q_pump'
-    #     :param timestamp_idx: int or 1d numpy.array of indexes of timestamps
-    #     :param node_ids: 1d numpy.array of node_ids
-    #     :return: 1d/2d numpy.array
-    #     """
-    #     ga = self.get_gridadmin(variable)
-    #     model = ga.get_model_instance_by_field_name(variable)
-    #
-    #     time_slice = None
-    #     if isinstance(timestamp_idx, int):
-    #         time_slice = slice(timestamp_idx, timestamp_idx+1)
-    #         time_index_filter = 0
-    #     elif isinstance(timestamp_idx, np.ndarray):
-    #         # ga.timeseries unfortunately does not allow for index filter on
-    #         # aggregate results, only a slice filter. Thus we load a bit more
-    #         # in memory and apply the index filter at the end.
-    #         time_slice = slice(min(timestamp_idx), max(timestamp_idx) + 1)
-    #         if len(timestamp_idx) == 1:
-    #             time_index_filter = 0
-    #         else:
-    #             time_index_filter = timestamp_idx - min(timestamp_idx)
-    #     result_filter = model.timeseries(indexes=time_slice)
-    #
-    #     if node_ids is None:
-    #         result_filter = result_filter.filter(id__gt=0)
-    #     result = result_filter.get_filtered_field_value(variable)
-    #
-    #     if node_ids is not None:
-    #         # Unfortunately h5py/threedigrid indexing is not as fancy as
-    #         # numpy, i.e. we can't use duplicate indexes/unsorted indexes.
-    #         # Thus we load a bit more in memory as a numpy array and then apply
-    #         # the final indexing with numpy.
-    #         return result[time_index_filter][node_ids]
-    #     else:
-    #         return result[time_index_filter]
+    def _variable_netcdf(self, variable):
+        """Return the path of the netcdf that contains the variable"""
+        if self.get_gridadmin(variable) is self.result_admin:
+            return self.file_path
+        return find_aggregation_netcdf(self.file_path)
+
+    def _cached_timeseries(self, variable, model_instance, node_id, content_pk):
+        """Return the time series of node_id or content_pk from the node-major
+        time series cache, or None if the variable is not cached"""
+        try:
+            netcdf_path = self._variable_netcdf(variable)
+        except FileNotFoundError:
+            return None
+        if not result_timeseries_cache.has_variable(netcdf_path, variable):
+            return None
+        if node_id:
+            object_ids = [node_id]
+        else:
+            object_ids = model_instance.filter(content_pk=content_pk).id
+        return result_timeseries_cache.read_timeseries(
+            netcdf_path, variable, object_ids
+        )
+
+    def build_timeseries_cache(self, variables, progress_func=None):
+        """Write variables to the node-major time series cache
+
+        The cache is a sidecar file next to the (aggregate) result netcdf, see
+        :py:mod:`ThreeDiToolbox.datasource.result_timeseries_cache`. Variables
+        that are already cached and up to date are skipped.
+
+        :param variables: list of variable names, e.g. ['s1', 'q']
+        :param progress_func: optional callable(fraction); when it returns
+            True, writing is cancelled
+        :return: list of the variables that were written
+        """
+        written = []
+        for i, variable in enumerate(variables):
+            netcdf_path = self._variable_netcdf(variable)
+            if result_timeseries_cache.has_variable(netcdf_path, variable):
+                continue
+            ga = self.get_gridadmin(variable)
+            model_instance = ga.get_model_instance_by_field_name(variable)
+
+            def read_block(start, stop):
+                return model_instance.timeseries(
+                    indexes=slice(start, stop)
+                ).get_filtered_field_value(variable)
+
+            n_timesteps = len(self.get_timestamps(variable))
+            for done in result_timeseries_cache.write_variable(
+                netcdf_path, variable, read_block, n_timesteps
+            ):
+                if progress_func is not None and progress_func(
+                    (i + done / n_timesteps) / len(variables)
+                ):
+                    return written
+            written.append(variable)
+        return written
 
     def get_values_by_timestep_nr(
         self, variable, timestamp_idx, node_ids=None, use_cache=True
@@ -258,32 +333,139 @@ class ThreediResult(BaseDataSource):
         :param timestamp_idx: int or 1d numpy.array of indexes of timestamps
         :param node_ids: 1d numpy.array of node_ids or None in which case all
             nodes are returned.
-        :param use_cache: (bool)
+        :param use_cache: (bool) when False, and the variable is not cached
+            yet, only the chunks with the timestamps are read (see
+            ``plan_chunk_reads()``) and nothing is cached.
         :return: 1d/2d numpy.array
         """
-        values = self._nc_from_mem(variable)
-        if isinstance(timestamp_idx, int):
-            timestamp_idx = np.array([timestamp_idx])
+        single_timestamp = np.ndim(timestamp_idx) == 0
+        timestamp_idx = np.atleast_1d(timestamp_idx)
+
+        if use_cache or variable in self._cache:
+            values = self._nc_from_mem(variable)
+        else:
+            values, timestamp_idx = self._read_timesteps(variable, timestamp_idx)
 
         if node_ids is None:
             # The first element is a trash element which we don't want to return
             filtered_data = values[timestamp_idx, 1:]
         else:
             # node_ids should never be 0 thus the trash element gets filtered out.
-            filtered_data = values[timestamp_idx][:, node_ids]
+            # np.ix_ selects the rows and columns at once, without copying the
+            # complete rows first.
+            filtered_data = values[np.ix_(timestamp_idx, node_ids)]
 
-        if len(timestamp_idx) == 1:
+        if single_timestamp or len(timestamp_idx) == 1:
             # if only one timestamp is specified, an 1d array is returned
             return filtered_data[0]
         else:
             return filtered_data
 
+    def iter_values_by_timestep(self, variable, node_ids=None):
+        """Yield the values of the variable for every timestamp
+
+        Yields the same as ``get_values_by_timestep_nr(variable, i, node_ids)``
+        for every timestamp i, but the timestamps are read in blocks of whole
+        chunks of about READ_BLOCK_SIZE bytes, like ``use_cache=False``. That
+        is one threedigrid read per block instead of one per timestamp (each
+        read has a fixed overhead) and the variable is not cached.
+
+        :param variable: (str) variable name, e.g. 's1', 'q_pump'
+        :param node_ids: 1d numpy.array of node_ids or None in which case all
+            nodes are returned.
+        :return: generator of 1d numpy.arrays
+        """
+        n_timestamps = len(self.get_timestamps(variable))
+        chunk_length = self._time_chunk_length(variable)
+        chunk_nbytes = max(1, self._timestep_nbytes(variable) * chunk_length)
+        block_length = chunk_length * max(1, READ_BLOCK_SIZE // chunk_nbytes)
+        for start in range(0, n_timestamps, block_length):
+            timestamp_idx = np.arange(start, min(start + block_length, n_timestamps))
+            if variable in self._cache:
+                values, rows = self._cache[variable], timestamp_idx
+            else:
+                values, rows = self._read_timesteps(variable, timestamp_idx)
+            for row in rows:
+                if node_ids is None:
+                    # The first element is a trash element
+                    yield values[row, 1:]
+                else:
+                    yield values[row, node_ids]
+
+    def _time_chunk_length(self, variable):
+        """Return the number of timesteps per chunk of the variable in the netcdf
+
+        Composite variables (e.g. 1D and 2D) can consist of several datasets,
+        the largest chunk length is returned. Datasets that are not chunked
+        count as one timestep per chunk.
+        """
+        if variable not in self._chunk_lengths:
+            lengths = [1]
+            for dataset in self._netcdf_datasets(variable):
+                if dataset.chunks:
+                    lengths.append(dataset.chunks[0])
+            self._chunk_lengths[variable] = max(lengths)
+        return self._chunk_lengths[variable]
+
+    def _timestep_nbytes(self, variable):
+        """Return the size in bytes of one timestep of the variable in the netcdf"""
+        return sum(
+            dataset.dtype.itemsize * int(np.prod(dataset.shape[1:]))
+            for dataset in self._netcdf_datasets(variable)
+        )
+
+    def _netcdf_datasets(self, variable):
+        """Return the netcdf datasets of a (composite) variable"""
+        ga = self.get_gridadmin(variable)
+        model_instance = ga.get_model_instance_by_field_name(variable)
+        composite_fields = getattr(model_instance.Meta, "composite_fields", {})
+        return [
+            ga.netcdf_file[source_name]
+            for source_name in composite_fields.get(variable, [])
+            if source_name in ga.netcdf_file
+        ]
+
+    def _read_timesteps(self, variable, timestamp_idx):
+        """Read the timesteps of a variable with chunk-aligned reads
+
+        :return: tuple of a 2d np.array with the rows read and the row of every
+            timestamp_idx in that array
+        """
+        with timed("threedi_result.read_timesteps") as measurement:
+            ga = self.get_gridadmin(variable)
+            model_instance = ga.get_model_instance_by_field_name(variable)
+            ranges, rows = plan_chunk_reads(
+                timestamp_idx,
+                self._time_chunk_length(variable),
+                len(self.get_timestamps(variable)),
+            )
+            blocks = [
+                model_instance.timeseries(
+                    indexes=slice(start, stop)
+                ).get_filtered_field_value(variable)
+                for start, stop in ranges
+            ]
+            if blocks:
+                values = np.concatenate(blocks)
+            else:
+                # threedigrid prepends the trash element to the netcdf values
+                n_values = 1 + sum(
+                    dataset.shape[1] for dataset in self._netcdf_datasets(variable)
+                )
+                values = np.empty((0, n_values))
+            measurement.add_bytes(values.nbytes)
+        return values, rows
+
     def _nc_from_mem(self, variable):
         """Return 2d numpy array with all values of variable and cache it.
 
         Everyting of the variables is cached, both in time and space, i.e. all
         timesteps and all nodes of the variable.
 
+        The arrays are also written to a disk cache that outlives the QGIS
+        session, see :py:mod:`ThreeDiToolbox.datasource.result_array_cache`.
+        Arrays loaded from there are memory-mapped and read-only.
+
         TODO: Saving the variables in cache is currently necessary to limit
          the amount of (slow) IO with the netcdf results. However, this also
          causes many unnecessary values to be stored in memory. This can become
@@ -297,23 +479,35 @@ class ThreediResult(BaseDataSource):
         :return: 2d numpy array
         """
         if variable in self._cache:
-            values = self._cache[variable]
-        else:
-            logger.debug(
-                "Variable %s not yet in cache, fetching from result file", variable
-            )
-            ga = self.get_gridadmin(variable)
-            model_instance = ga.get_model_instance_by_field_name(variable)
-            unfiltered_timeseries = model_instance.timeseries(indexes=slice(None))
-            values = unfiltered_timeseries.get_filtered_field_value(variable)
-            logger.debug(
-                "Caching additional {:.3f} MB of data".format(
-                    values.nbytes / 1000 / 1000
+            return self._cache[variable]
+
+        with timed("threedi_result.read_variable") as measurement:
+            netcdf_path = self._variable_netcdf(variable)
+            values = result_array_cache.load_array(netcdf_path, variable)
+            measurement.cache_hit(values is not None)
+            if values is None:
+                logger.debug(
+                    "Variable %s not yet in cache, fetching from result file",
+                    variable,
                 )
-            )
-            self._cache[variable] = values
+                ga = self.get_gridadmin(variable)
+                model_instance = ga.get_model_instance_by_field_name(variable)
+                unfiltered_timeseries = model_instance.timeseries(indexes=slice(None))
+                values = unfiltered_timeseries.get_filtered_field_value(variable)
+                measurement.add_bytes(values.nbytes)
+                logger.debug(
+                    "Caching additional {:.3f} MB of data".format(
+                        values.nbytes / 1000 / 1000
+                    )
+                )
+                result_array_cache.save_array(netcdf_path, variable, values)
+        self._cache[variable] = values
         return values
 
+    def clear_cache(self):
+        """Forget the variables cached in memory (not the disk cache)"""
+        self._cache.clear()
+
     @cached_property
     def gridadmin(self):
         h5 = find_h5_file(self.file_path)
@@ -325,7 +519,9 @@ class ThreediResult(BaseDataSource):
         # TODO: there's no FileNotFound try/except here like for
         # aggregates. Richard says that a missing regular result file is just
         # as likely.
-        return GridH5ResultAdmin(h5, self.file_path)
+        result_admin = GridH5ResultAdmin(h5, self.file_path)
+        self._set_chunk_cache(result_admin, self.file_path)
+        return result_admin
 
     @cached_property
     def aggregate_result_admin(self):
@@ -336,12 +532,25 @@ class ThreediResult(BaseDataSource):
         except FileNotFoundError:
             logger.exception("Aggregate result not found")
             return None
-        return GridH5AggregateResultAdmin(h5, agg_path)
+        aggregate_result_admin = GridH5AggregateResultAdmin(h5, agg_path)
+        self._set_chunk_cache(aggregate_result_admin, agg_path)
+        return aggregate_result_admin
+
+    def _set_chunk_cache(self, result_admin, netcdf_file_path):
+        """Re-open the netcdf of a result admin with our hdf5 chunk cache size
+
+        threedigrid opens it with the h5py default of 1 MB, which is smaller
+        than a single chunk of many result files.
+        """
+        result_admin.netcdf_file.close()
+        result_admin.netcdf_file = h5py.File(
+            netcdf_file_path, "r", rdcc_nbytes=self.chunk_cache_size
+        )
 
     @cached_property
     def datasource(self):
         try:
-            return h5py.File(self.file_path, "r")
+            return h5py.File(self.file_path, "r", rdcc_nbytes=self.chunk_cache_size)
         except IOError:
             # TODO: a non-existing file raises an OSError, not an IOError!
             logger.exception("Datasource %s could not be opened", self.file_path)
@@ -363,7 +572,9 @@ class ThreediResult(BaseDataSource):
             return None
 
         logger.info("Opening aggregation netcdf: %s" % aggregation_netcdf_file)
-        return h5py.File(aggregation_netcdf_file, mode="r")
+        return h5py.File(
+            aggregation_netcdf_file, mode="r", rdcc_nbytes=self.chunk_cache_size
+        )
 
 
 def find_h5_file(netcdf_file_path):
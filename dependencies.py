@@ -13,6 +13,12 @@ installed and installs them if needed.
 :py:func:`check_importability()` double-checks if everything is importable. It also
 logs the locations.
 
+Both are skipped when nothing changed since the last complete verification:
+the :py:func:`verification_key()` (plugin version, python version, the
+constraints, ...) is written to a stamp file when ``check_importability()``
+succeeds. Remove the stamp file (:py:data:`VERIFICATION_STAMP`) to force a new
+verification.
+
 Note that we use *logging* in ``check_importability()`` as we want to have the
 result in the logfile. The rest of the module uses ``print()`` statements
 because it gets executed before any logging has been configured.
@@ -24,12 +30,15 @@ resticted. No qgis message boxes and so!
 from collections import namedtuple
 from pathlib import Path
 
+import hashlib
 import importlib
+import json
 import logging
 import os
 import pkg_resources
 import platform
 import re
+import shutil
 import subprocess
 import sys
 
@@ -64,6 +73,8 @@ SUPPORTED_HDF5_VERSIONS = ["1.10.4", "1.10.5"]
 INTERESTING_IMPORTS = ["numpy", "gdal", "pip", "setuptools"]
 
 OUR_DIR = Path(__file__).parent
+#: Stamp file with the verification_key() of the last complete verification.
+VERIFICATION_STAMP = OUR_DIR / ".dependencies_verified"
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +89,12 @@ def ensure_everything_installed():
         "Contents of our profile's python dir:\n    %s"
         % "\n    ".join(profile_python_names)
     )
+    if _verified_earlier():
+        print(
+            "Dependencies were verified earlier, see %s. Skipping the check."
+            % VERIFICATION_STAMP
+        )
+        return
     _ensure_prerequisite_is_installed()
     missing = _check_presence(DEPENDENCIES)
     if platform.system() == "Windows":
@@ -260,11 +277,107 @@ def check_importability():
         "Contents of our profile's python dir:\n    %s",
         "\n    ".join(profile_python_names),
     )
+    if _verified_earlier():
+        logger.info(
+            "Dependencies were verified earlier, not importing them now. "
+            "Remove %s to check them again.",
+            VERIFICATION_STAMP,
+        )
+        return
     for package in packages:
         imported_package = importlib.import_module(package)
         logger.info(
             "Import '%s' found at \n    '%s'", package, imported_package.__file__
         )
+    _write_verification_stamp()
+
+
+def verification_key():
+    """Return a dict of everything the verification of the dependencies
+    depends on.
+
+    If none of it changed since the last complete verification, there's no
+    need to check (or install) the dependencies again.
+
+    """
+    all_dependencies = DEPENDENCIES + WINDOWS_PLATFORM_DEPENDENCIES + [H5PY_DEPENDENCY]
+    constraints = "\n".join(
+        dependency.name + dependency.constraint for dependency in all_dependencies
+    )
+    version_file = OUR_DIR / "version.rst"
+    if version_file.exists():
+        plugin_version = version_file.read_text().strip()
+    else:
+        plugin_version = ""
+    try:
+        # A new qgis installation comes with a new interpreter (and HDF5).
+        executable_mtime = os.stat(sys.executable).st_mtime
+    except (OSError, ValueError):
+        executable_mtime = None
+    # Something installed into or removed from our profile's python dir.
+    profile_python_names = sorted(
+        item.name for item in _dependencies_target_dir().iterdir()
+    )
+    return {
+        "plugin_version": plugin_version,
+        "python_version": sys.version,
+        "platform": platform.system(),
+        "constraints": hashlib.sha256(constraints.encode("utf-8")).hexdigest(),
+        "executable": sys.executable,
+        "executable_mtime": executable_mtime,
+        "profile_python_dir": hashlib.sha256(
+            "\n".join(profile_python_names).encode("utf-8")
+        ).hexdigest(),
+        "h5py_marker": H5pyMarker.version(),
+        "hdf5": _hdf5_identity(),
+    }
+
+
+def _hdf5_identity():
+    """Return the path, size and mtime of the HDF5 files that come with Qgis
+
+    On Windows, h5py has to match the HDF5 version of Qgis (see
+    ``_ensure_h5py_installed()``). A Qgis update can replace HDF5 without
+    replacing the python interpreter, so h5stat.exe and the hdf5 dlls next
+    to it and next to the interpreter are part of the verification key.
+
+    """
+    if platform.system() != "Windows":
+        return []
+    h5stat = shutil.which("h5stat.exe")
+    candidates = []
+    directories = {Path(sys.executable).parent}
+    if h5stat:
+        candidates.append(Path(h5stat))
+        directories.add(Path(h5stat).parent)
+    for directory in sorted(directories):
+        candidates.extend(sorted(directory.glob("hdf5*.dll")))
+    identity = []
+    for path in candidates:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        # lists, not tuples: the key is compared with the json stamp
+        identity.append([str(path), stat.st_size, stat.st_mtime])
+    return identity
+
+
+def _verified_earlier():
+    """Return True if the stamp file matches the current verification_key()"""
+    try:
+        stamp = json.loads(VERIFICATION_STAMP.read_text())
+    except (OSError, ValueError):
+        return False
+    return stamp == verification_key()
+
+
+def _write_verification_stamp():
+    try:
+        VERIFICATION_STAMP.write_text(json.dumps(verification_key(), indent=2))
+    except OSError as e:
+        # Not fatal, we'll just verify everything again next time.
+        logger.warning("Could not write %s: %s", VERIFICATION_STAMP, e)
 
 
 def _uninstall_dependency(dependency):
@@ -3,13 +3,17 @@
 Miscellaneous tools.
 """
 from qgis.core import QgsProject
+from qgis.PyQt.QtCore import Qt
 from ThreeDiToolbox import PLUGIN_DIR
+from ThreeDiToolbox.datasource import result_array_cache
+from ThreeDiToolbox.datasource.result_metadata import clear_metadata_cache
 from ThreeDiToolbox.utils import qlogging
 from ThreeDiToolbox.utils.layer_from_netCDF import FLOWLINES_LAYER_NAME
 from ThreeDiToolbox.utils.layer_from_netCDF import NODES_LAYER_NAME
 from ThreeDiToolbox.utils.layer_from_netCDF import PUMPLINES_LAYER_NAME
 from ThreeDiToolbox.utils.user_messages import pop_up_info
 from ThreeDiToolbox.utils.user_messages import pop_up_question
+from ThreeDiToolbox.views.timing_panel import TimingDockWidget
 
 import logging
 import os
@@ -73,6 +77,46 @@ class ShowLogfile(object):
         pass
 
 
+class PerformanceTimings(object):
+    """Show the timings of the slow operations in a dock widget
+
+    See :py:mod:`ThreeDiToolbox.utils.timing`.
+    """
+
+    def __init__(self, iface):
+        self.iface = iface
+        self.icon_path = ":/plugins/ThreeDiToolbox/icons/icon_logfile.png"
+        self.menu_text = "Show performance timings"
+        self.dock_widgets = []
+        self.widget_nr = 0
+
+    def run(self):
+        if self.dock_widgets:
+            # There is one panel with the (global) timings.
+            self.dock_widgets[0].refresh()
+            self.dock_widgets[0].show()
+            self.dock_widgets[0].raise_()
+            return
+        self.widget_nr += 1
+        new_widget = TimingDockWidget(self.iface, nr=self.widget_nr)
+        self.dock_widgets.append(new_widget)
+        new_widget.closingWidget.connect(self.on_close_child_widget)
+        self.iface.addDockWidget(Qt.BottomDockWidgetArea, new_widget)
+        new_widget.show()
+
+    def on_close_child_widget(self, widget_nr):
+        """Cleanup necessary items here when the dockwidget is closed"""
+        for widget in self.dock_widgets:
+            if widget.nr == widget_nr:
+                widget.closingWidget.disconnect(self.on_close_child_widget)
+                self.dock_widgets.remove(widget)
+                break
+
+    def on_unload(self):
+        for widget in list(self.dock_widgets):
+            widget.close()
+
+
 class CacheClearer(object):
     """Tool to delete cache files."""
 
@@ -102,7 +146,8 @@ class CacheClearer(object):
         # Note: convert to set because duplicates are possible if the same
         # datasource is loaded multiple times
         cached = set(spatialite_filepaths)
-        if not cached:
+        cached_arrays = result_array_cache.cache_files()
+        if not cached and not cached_arrays:
             pop_up_info("No cached files found.")
             return
 
@@ -123,11 +168,14 @@ class CacheClearer(object):
         ]
         loaded_layer_ids = [layer.id() for layer in loaded_layers]
 
-        yes = pop_up_question(
-            "The following files will be deleted:\n"
-            + ",\n".join(cached)
-            + "\n\nContinue?"
-        )
+        question = "The following files will be deleted:\n" + ",\n".join(cached)
+        if cached_arrays:
+            question += "\n\n%s cached result arrays (%.1f MB) in %s" % (
+                len(cached_arrays),
+                result_array_cache.cache_size() / 1024 / 1024,
+                result_array_cache.cache_dir(),
+            )
+        yes = pop_up_question(question + "\n\nContinue?")
 
         if yes:
             try:
@@ -143,6 +191,14 @@ class CacheClearer(object):
                     logger.exception(msg)
                     pop_up_info(msg)
 
+            # The in-memory arrays of the results might be memory-mapped cache
+            # files, which can't be removed on windows while they are open.
+            for item in self.ts_datasources.rows:
+                item.threedi_result().clear_cache()
+            for cached_array in result_array_cache.clear_array_cache():
+                pop_up_info("Failed to delete %s." % cached_array)
+
+            clear_metadata_cache()
             pop_up_info(
                 "Cache cleared. You may need to restart QGIS and reload your data."
             )
@@ -0,0 +1,155 @@
+from qgis.core import QgsProcessing
+from qgis.core import QgsProcessingAlgorithm
+from qgis.core import QgsProcessingException
+from qgis.core import QgsProcessingParameterBoolean
+from qgis.core import QgsProcessingParameterEnum
+from qgis.core import QgsProcessingParameterFile
+from qgis.core import QgsProcessingParameterFolderDestination
+from qgis.core import QgsProcessingParameterMultipleLayers
+from qgis.core import QgsProcessingParameterNumber
+from qgis.core import QgsProcessingParameterString
+from qgis.PyQt.QtCore import QCoreApplication
+from ThreeDiToolbox.processing.dwf_calculation import DWF_FACTORS
+from ThreeDiToolbox.processing.dwf_calculation import get_dwf_factors_from_file
+from ThreeDiToolbox.processing.dwf_calculation import parse_dwf_scenarios
+from ThreeDiToolbox.processing.dwf_calculation import WEEKDAYS
+from ThreeDiToolbox.processing.dwf_calculation import write_dwf_laterals_batch
+
+import os
+
+
+class DWFBatchCalculatorAlgorithm(QgsProcessingAlgorithm):
+    """Calculate DWF laterals for several spatialites and simulation settings"""
+
+    OUTPUT = "OUTPUT"
+    INPUT = "INPUT"
+
+    def initAlgorithm(self, config):
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.INPUT,
+                self.tr("Input spatialites (.sqlite)"),
+                layerType=QgsProcessing.TypeFile,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                "scenarios",
+                self.tr(
+                    "Start time of day and duration, one per line (HH:MM:SS,seconds)"
+                ),
+                "00:00:00,86400",
+                multiLine=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFile(
+                "dwf_progress_file",
+                self.tr("DWF progress file (.csv)"),
+                extension="csv",
+                defaultValue=None,
+                optional=True,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                "weekly_pattern",
+                self.tr("DWF progress file contains a pattern per day of the week"),
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                "start_weekday",
+                self.tr("Start day of the week (for a weekly pattern)"),
+                options=[self.tr(weekday) for weekday in WEEKDAYS],
+                defaultValue=0,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                "workers",
+                self.tr("Number of worker processes"),
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=max(1, (os.cpu_count() or 1) - 1),
+                minValue=1,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterFolderDestination(
+                self.OUTPUT, self.tr("Output folder")
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        spatialite_paths = self.parameterAsFileList(parameters, self.INPUT, context)
+        scenarios_text = self.parameterAsString(parameters, "scenarios", context)
+        dwf_factor_input = self.parameterAsFile(
+            parameters, "dwf_progress_file", context
+        )
+        start_weekday = None
+        if self.parameterAsBool(parameters, "weekly_pattern", context):
+            start_weekday = self.parameterAsEnum(parameters, "start_weekday", context)
+        workers = self.parameterAsInt(parameters, "workers", context)
+        output_dir = self.parameterAsString(parameters, self.OUTPUT, context)
+        os.makedirs(output_dir, exist_ok=True)
+
+        if dwf_factor_input:
+            dwf_factors = get_dwf_factors_from_file(dwf_factor_input)
+        else:
+            dwf_factors = DWF_FACTORS
+
+        try:
+            scenarios = parse_dwf_scenarios(scenarios_text)
+            written = write_dwf_laterals_batch(
+                spatialite_paths,
+                scenarios,
+                dwf_factors,
+                output_dir,
+                start_weekday=start_weekday,
+                max_workers=workers,
+                feedback=feedback,
+            )
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+        for output_csv in written:
+            feedback.pushInfo(self.tr("Written {}").format(output_csv))
+
+        return {self.OUTPUT: output_dir}
+
+    def name(self):
+        return "DWFBatchCalculator"
+
+    def displayName(self):
+        return self.tr("DWF Calculator (batch)")
+
+    def group(self):
+        return self.tr("Dry weather flow")
+
+    def groupId(self):
+        return "dwf"
+
+    def shortHelpString(self):
+
+        help_string = """
+        Calculate dry weather flow on connection nodes for several model schematisations and simulation settings at once. Produces a formatted csv per schematisation and setting that can be used as a 1d lateral in the 3Di API Client.
+        Input spatialites: valid spatialites containing the schematisation of a 3Di model. \n
+        Start time of day and duration: one simulation per line, formatted as 'HH:MM:SS,seconds', e.g. '08:00:00,86400'. \n
+        DWF progress file, weekly pattern and start day of the week: see the DWF Calculator. \n
+        Number of worker processes: the csv files are written in parallel by this many processes. \n
+        Output folder: the csv files are named '<spatialite name>_<HHMMSS>_<duration>.csv'.
+        """
+
+        return self.tr(help_string)
+
+    def tr(self, string):
+        return QCoreApplication.translate("Processing", string)
+
+    def createInstance(self):
+        return DWFBatchCalculatorAlgorithm()
@@ -0,0 +1,452 @@
+"""Dry weather flow (DWF) calculation, used by the DWF processing algorithms
+
+Note: this module does not import qgis, so the batch calculation can run its
+jobs in worker processes.
+"""
+from collections import Counter
+from ThreeDiToolbox.datasource.result_metadata import file_signature
+from ThreeDiToolbox.processing.workers import process_pool
+
+import concurrent.futures
+import csv
+import datetime
+import logging
+import numpy as np
+import os
+import sqlite3
+
+
+logger = logging.getLogger(__name__)
+
+# Default values
+DWF_FACTORS = [
+    [0, 0.03],
+    [1, 0.015],
+    [2, 0.01],
+    [3, 0.01],
+    [4, 0.005],
+    [5, 0.005],
+    [6, 0.025],
+    [7, 0.080],
+    [8, 0.075],
+    [9, 0.06],
+    [10, 0.055],
+    [11, 0.05],
+    [12, 0.045],
+    [13, 0.04],
+    [14, 0.04],
+    [15, 0.035],
+    [16, 0.035],
+    [17, 0.04],
+    [18, 0.055],
+    [19, 0.08],
+    [20, 0.07],
+    [21, 0.055],
+    [22, 0.045],
+    [23, 0.04],
+]
+
+# DWF per person = 120 l/inhabitant / 1000 = 0.12 m3/inhabitant
+DWF_PER_PERSON = 0.12
+
+# Maximum number of dwf values (nodes x timesteps) computed at once
+DWF_CHUNK_VALUES = 1000000
+
+# Inhabitants aggregation per spatialite: {path: (file signature, dwf per node)}
+_dwf_per_node_cache = {}
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 24 * SECONDS_PER_HOUR
+
+WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def get_dwf_factors_from_file(file_path):
+    """Read a DWF progress file: rows of '<time of day or week>, <factor>'
+
+    Only the factors (second column) and their order are used, see
+    ``dwf_factor_schedule()``.
+    """
+    dwf_factors = []
+    with open(file_path) as csv_file:
+        reader = csv.reader(csv_file, delimiter=",")
+        for row in reader:
+            if not row:
+                continue
+            dwf_factors += [[row[0].strip(), float(row[1])]]
+
+    return dwf_factors
+
+
+def dwf_factor_schedule(start_time, duration, dwf_factors, start_weekday=None):
+    """Return the seconds at which the DWF factor changes and those factors
+
+    The factors in ``dwf_factors`` (pairs of [time, factor]) divide a day into
+    intervals of equal length: 24 factors is an hourly pattern, 96 factors a
+    quarter-hourly one. If ``start_weekday`` is given (0 is Monday) the factors
+    divide a week instead, so 7 * 24 factors give an hourly pattern per day of
+    the week, starting Monday 00:00.
+
+    The schedule starts at second 0, has an entry at every interval boundary
+    during the simulation and ends at ``duration``. It is computed directly
+    from the interval boundaries instead of stepping through every second.
+
+    :returns: tuple of two numpy arrays (seconds, factors)
+    """
+    starting_time = datetime.datetime.strptime(start_time, "%H:%M:%S")
+    start_offset = (
+        starting_time.hour * SECONDS_PER_HOUR
+        + starting_time.minute * 60
+        + starting_time.second
+    )
+    period = SECONDS_PER_DAY
+    if start_weekday is not None:
+        period = 7 * SECONDS_PER_DAY
+        start_offset += start_weekday * SECONDS_PER_DAY
+
+    factors = np.array([factor for _, factor in dwf_factors], dtype=np.float64)
+    if period % len(factors):
+        raise ValueError(
+            "{} DWF factors do not divide a {} into whole seconds".format(
+                len(factors), "week" if start_weekday is not None else "day"
+            )
+        )
+    interval = period // len(factors)
+
+    # First timestep at 0 seconds, then every interval boundary (the moment the
+    # factor changes) up to and including the duration
+    first_boundary = interval - start_offset % interval
+    boundaries = np.arange(first_boundary, duration + 1, interval, dtype=np.int64)
+    seconds = np.concatenate(([0], boundaries))
+    if duration > 0 and seconds[-1] != duration:
+        seconds = np.append(seconds, duration)
+
+    factor_index = ((start_offset + seconds) // interval) % len(factors)
+    return seconds, factors[factor_index]
+
+
+def start_time_and_duration_to_dwf_factors(
+    start_time, duration, dwf_factors, start_weekday=None
+):
+    """Return the DWF factor schedule as a list of [second, factor]
+
+    See ``dwf_factor_schedule()``.
+    """
+    seconds, factors = dwf_factor_schedule(
+        start_time, duration, dwf_factors, start_weekday=start_weekday
+    )
+    return [
+        [second, factor] for second, factor in zip(seconds.tolist(), factors.tolist())
+    ]
+
+
+def read_dwf_per_node(spatialite_path):
+
+    """Obtains the DWF per connection node per second a 3Di model sqlite-file."""
+
+    conn = sqlite3.connect(spatialite_path)
+    c = conn.cursor()
+
+    # Create empty list that holds total 24h dry weather flow per node
+    dwf_per_node_per_second = []
+
+    # Create a table that contains nr_of_inhabitants per connection_node and iterate over it
+    for row in c.execute(
+        """
+        WITH imp_surface_count AS
+            ( SELECT impsurf.id, impsurf.nr_of_inhabitants / COUNT(impmap.impervious_surface_id) AS nr_of_inhabitants
+             FROM v2_impervious_surface impsurf, v2_impervious_surface_map impmap
+             WHERE impsurf.nr_of_inhabitants IS NOT NULL AND impsurf.nr_of_inhabitants != 0
+             AND impsurf.id = impmap.impervious_surface_id GROUP BY impsurf.id),
+        inhibs_per_node AS (
+            SELECT impmap.impervious_surface_id, impsurfcount.nr_of_inhabitants, impmap.connection_node_id
+            FROM imp_surface_count impsurfcount, v2_impervious_surface_map impmap
+            WHERE impsurfcount.id = impmap.impervious_surface_id)
+        SELECT ipn.connection_node_id, SUM(ipn.nr_of_inhabitants)
+        FROM inhibs_per_node ipn GROUP BY ipn.connection_node_id
+        """
+    ):
+        dwf_per_node_per_second.append([row[0], row[1] * DWF_PER_PERSON / 3600])
+
+    conn.close()
+
+    return dwf_per_node_per_second
+
+
+def cached_dwf_per_node(spatialite_path):
+    """Return ``read_dwf_per_node()``, cached until the spatialite changes"""
+    path = os.path.abspath(str(spatialite_path))
+    signature = file_signature(path)
+    cached = _dwf_per_node_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    dwf_per_node = read_dwf_per_node(path)
+    _dwf_per_node_cache[path] = (signature, dwf_per_node)
+    return dwf_per_node
+
+
+def iter_dwf_laterals(dwf_per_node, seconds, factors, feedback=None):
+    """Yield (connection node id, timeseries) for every node
+
+    The timeseries is the lateral formatted as '<second>,<dwf>' lines. The dwf
+    values are the outer product of the dwf per node and the factor schedule,
+    computed for a chunk of nodes at a time so memory use stays flat, also for
+    many nodes and long durations.
+
+    :param dwf_per_node: list of [connection node id, dwf per second]
+    :param seconds: numpy array with the seconds of the factor schedule
+    :param factors: numpy array with the factor for each of those seconds
+    :param feedback: optional QgsProcessingFeedback for progress and canceling
+    """
+    seconds_str = [str(second) for second in seconds.tolist()]
+    chunk_size = max(1, DWF_CHUNK_VALUES // len(seconds_str))
+    nr_nodes = len(dwf_per_node)
+    for start in range(0, nr_nodes, chunk_size):
+        if feedback is not None:
+            if feedback.isCanceled():
+                return
+            feedback.setProgress(100 * start / nr_nodes)
+        chunk = dwf_per_node[start : start + chunk_size]
+        dwf = np.array([node_dwf for _, node_dwf in chunk], dtype=np.float64)
+        values = np.outer(dwf, factors).tolist()
+        for (node_id, _), node_values in zip(chunk, values):
+            timeseries = "\n".join(
+                [
+                    second + "," + str(value)
+                    for second, value in zip(seconds_str, node_values)
+                ]
+            )
+            yield node_id, timeseries
+
+
+def write_dwf_laterals_csv(
+    spatialite_filepath,
+    start_time,
+    duration,
+    dwf_factors,
+    output_csv_file,
+    start_weekday=None,
+    feedback=None,
+):
+    """Stream the DWF laterals of all connection nodes to a csv file
+
+    Every row is '<lateral id>,<connection node id>,<timeseries>', see
+    ``iter_dwf_laterals()``.
+
+    The csv is written under a temporary name and renamed when it is
+    complete, so a canceled calculation does not leave a truncated csv.
+
+    :returns: True if the csv has been written, False if it was canceled
+    """
+    return _write_dwf_laterals_csv(
+        cached_dwf_per_node(spatialite_filepath),
+        start_time,
+        duration,
+        dwf_factors,
+        output_csv_file,
+        start_weekday=start_weekday,
+        feedback=feedback,
+    )
+
+
+def _write_dwf_laterals_csv(
+    dwf_per_node,
+    start_time,
+    duration,
+    dwf_factors,
+    output_csv_file,
+    start_weekday=None,
+    feedback=None,
+):
+    seconds, factors = dwf_factor_schedule(
+        start_time, duration, dwf_factors, start_weekday=start_weekday
+    )
+    partial_csv_file = output_csv_file + ".part"
+    nr_written = 0
+    try:
+        with open(partial_csv_file, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            laterals = iter_dwf_laterals(
+                dwf_per_node, seconds, factors, feedback=feedback
+            )
+            for lat_id, (connection_node_id, timeseries) in enumerate(laterals):
+                writer.writerow([str(lat_id), str(connection_node_id), timeseries])
+                nr_written += 1
+        if nr_written < len(dwf_per_node):  # canceled
+            return False
+        os.replace(partial_csv_file, output_csv_file)
+        return True
+    finally:
+        if os.path.exists(partial_csv_file):
+            os.remove(partial_csv_file)
+
+
+def parse_dwf_scenarios(scenarios_text):
+    """Parse lines of '<start time of day (HH:MM:SS)>,<duration (seconds)>'
+
+    :returns: list of (start time, duration) tuples
+    """
+    scenarios = []
+    for line in scenarios_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            start_time, duration = [item.strip() for item in line.split(",")]
+            datetime.datetime.strptime(start_time, "%H:%M:%S")
+            duration = int(float(duration))
+        except ValueError:
+            raise ValueError(
+                "Invalid scenario '{}', expected '<HH:MM:SS>,<seconds>'".format(line)
+            )
+        scenarios.append((start_time, duration))
+    return scenarios
+
+
+def batch_output_stems(spatialite_paths):
+    """Return the start of the output csv names for every spatialite
+
+    That is the file name of the spatialite without extension. Spatialites
+    with the same file name (in different directories) get their number in
+    the list (1, 2, ...) appended, so their csv files don't overwrite each
+    other.
+    """
+    stems = [
+        os.path.splitext(os.path.basename(str(path)))[0] for path in spatialite_paths
+    ]
+    counts = Counter(stems)
+    stems = [
+        "{}_{}".format(stem, number) if counts[stem] > 1 else stem
+        for number, stem in enumerate(stems, start=1)
+    ]
+    if len(set(stems)) < len(stems):
+        raise ValueError(
+            "The spatialites give duplicate output names: {}".format(
+                ", ".join(str(path) for path in spatialite_paths)
+            )
+        )
+    return stems
+
+
+def batch_output_csv_name(stem, start_time, duration):
+    """Return the name of the output csv of one batch scenario
+
+    :param stem: see ``batch_output_stems()``
+    """
+    return "{}_{}_{}.csv".format(stem, start_time.replace(":", ""), duration)
+
+
+def write_dwf_laterals_batch(
+    spatialite_paths,
+    scenarios,
+    dwf_factors,
+    output_dir,
+    start_weekday=None,
+    max_workers=1,
+    feedback=None,
+):
+    """Write the DWF laterals csv of every spatialite and every scenario
+
+    The inhabitants per node are aggregated once per spatialite (see
+    ``cached_dwf_per_node()``), the csv files are written by ``max_workers``
+    worker processes.
+
+    :param scenarios: list of (start time, duration) tuples
+    :returns: list of the csv files that have been written
+    """
+    # fail before starting any job on invalid settings
+    for start_time, _ in scenarios:
+        dwf_factor_schedule(start_time, 0, dwf_factors, start_weekday=start_weekday)
+
+    stems = batch_output_stems(spatialite_paths)
+
+    jobs = []
+    for spatialite_path, stem in zip(spatialite_paths, stems):
+        dwf_per_node = cached_dwf_per_node(spatialite_path)
+        for start_time, duration in scenarios:
+            output_csv_file = os.path.join(
+                output_dir, batch_output_csv_name(stem, start_time, duration)
+            )
+            jobs.append(
+                (dwf_per_node, start_time, duration, dwf_factors, output_csv_file)
+            )
+
+    written = []
+    if max_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            if feedback is not None and feedback.isCanceled():
+                break
+            _write_dwf_laterals_csv(*job, start_weekday=start_weekday)
+            written.append(job[-1])
+            if feedback is not None:
+                feedback.setProgress(100 * len(written) / len(jobs))
+        return written
+
+    with process_pool(min(max_workers, len(jobs))) as pool:
+        futures = {
+            pool.submit(
+                _write_dwf_laterals_csv, *job, start_weekday=start_weekday
+            ): job[-1]
+            for job in jobs
+        }
+        for future in concurrent.futures.as_completed(futures):
+            future.result()  # re-raises exceptions of the worker
+            written.append(futures[future])
+            if feedback is not None:
+                if feedback.isCanceled():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                feedback.setProgress(100 * len(written) / len(jobs))
+    return written
+
+
+def generate_dwf_lateral_json(
+    spatialite_filepath, start_time, duration, dwf_factors, start_weekday=None
+):
+    """Return the DWF laterals of all connection nodes as a list of dicts
+
+    Note: this holds all laterals in memory, use ``write_dwf_laterals_csv()``
+    for large models.
+    """
+    dwf_on_each_node = cached_dwf_per_node(spatialite_filepath)
+    seconds, factors = dwf_factor_schedule(
+        start_time, duration, dwf_factors, start_weekday=start_weekday
+    )
+    return [
+        {
+            "offset": 0,
+            "interpolate": 0,
+            "values": timeseries,
+            "units": "m3/s",
+            "connection_node": connection_node_id,
+        }
+        for connection_node_id, timeseries in iter_dwf_laterals(
+            dwf_on_each_node, seconds, factors
+        )
+    ]
+
+
+def dwf_json_to_csv(dwf_list, output_csv_file):
+
+    with open(output_csv_file, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        for i, row in enumerate(dwf_list):
+            lat_id = i
+            connection_node_id = row["connection_node"]
+            timeseries = row["values"]
+            writer.writerow([str(lat_id), str(connection_node_id), timeseries])
+
+
+def str_to_seconds(time_str):
+    """Get Seconds from time."""
+    m, s = time_str.split(":")
+    return int(m) * 60 + int(s)
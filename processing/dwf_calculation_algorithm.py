@@ -32,6 +32,8 @@ __revision__ = "$Format:%H$"
 
 from qgis.core import QgsProcessingAlgorithm
 from qgis.core import QgsProcessingException
+from qgis.core import QgsProcessingParameterBoolean
+from qgis.core import QgsProcessingParameterEnum
 from qgis.core import QgsProcessingParameterFile
 from qgis.core import QgsProcessingParameterFileDestination
 from qgis.core import QgsProcessingParameterProviderConnection
@@ -39,156 +41,12 @@ from qgis.core import QgsProcessingParameterString
 from qgis.core import QgsProviderConnectionException
 from qgis.core import QgsProviderRegistry
 from qgis.PyQt.QtCore import QCoreApplication
+from ThreeDiToolbox.processing.dwf_calculation import DWF_FACTORS
+from ThreeDiToolbox.processing.dwf_calculation import get_dwf_factors_from_file
+from ThreeDiToolbox.processing.dwf_calculation import WEEKDAYS
+from ThreeDiToolbox.processing.dwf_calculation import write_dwf_laterals_csv
 
-import csv
-import datetime
 import logging
-import sqlite3
-
-
-# Default values
-DWF_FACTORS = [
-    [0, 0.03],
-    [1, 0.015],
-    [2, 0.01],
-    [3, 0.01],
-    [4, 0.005],
-    [5, 0.005],
-    [6, 0.025],
-    [7, 0.080],
-    [8, 0.075],
-    [9, 0.06],
-    [10, 0.055],
-    [11, 0.05],
-    [12, 0.045],
-    [13, 0.04],
-    [14, 0.04],
-    [15, 0.035],
-    [16, 0.035],
-    [17, 0.04],
-    [18, 0.055],
-    [19, 0.08],
-    [20, 0.07],
-    [21, 0.055],
-    [22, 0.045],
-    [23, 0.04],
-]
-
-# DWF per person = 120 l/inhabitant / 1000 = 0.12 m3/inhabitant
-DWF_PER_PERSON = 0.12
-
-
-def get_dwf_factors_from_file(file_path):
-
-    dwf_factors = []
-    with open(file_path) as csv_file:
-        reader = csv.reader(csv_file, delimiter=",")
-        for row in reader:
-            print(row)
-            dwf_factors += [[int(row[0]), float(row[1])]]
-
-    return dwf_factors
-
-
-def start_time_and_duration_to_dwf_factors(start_time, duration, dwf_factors):
-
-    starting_time = datetime.datetime.strptime(start_time, "%H:%M:%S")
-
-    # First timestep at 0 seconds
-    current_hour = starting_time.hour
-    dwf_factor_per_timestep = [[0, dwf_factors[starting_time.hour % 24][1]]]
-
-    for second in range(1, duration + 1):
-        time = starting_time + datetime.timedelta(seconds=second)
-        if time.hour != current_hour:
-            dwf_factor_per_timestep.append([second, dwf_factors[time.hour % 24][1]])
-        elif second == duration:
-            dwf_factor_per_timestep.append([second, dwf_factors[time.hour % 24][1]])
-
-        current_hour = time.hour
-
-    return dwf_factor_per_timestep
-
-
-def read_dwf_per_node(spatialite_path):
-
-    """Obtains the DWF per connection node per second a 3Di model sqlite-file."""
-
-    conn = sqlite3.connect(spatialite_path)
-    c = conn.cursor()
-
-    # Create empty list that holds total 24h dry weather flow per node
-    dwf_per_node_per_second = []
-
-    # Create a table that contains nr_of_inhabitants per connection_node and iterate over it
-    for row in c.execute(
-        """
-        WITH imp_surface_count AS
-            ( SELECT impsurf.id, impsurf.nr_of_inhabitants / COUNT(impmap.impervious_surface_id) AS nr_of_inhabitants
-             FROM v2_impervious_surface impsurf, v2_impervious_surface_map impmap
-             WHERE impsurf.nr_of_inhabitants IS NOT NULL AND impsurf.nr_of_inhabitants != 0
-             AND impsurf.id = impmap.impervious_surface_id GROUP BY impsurf.id),
-        inhibs_per_node AS (
-            SELECT impmap.impervious_surface_id, impsurfcount.nr_of_inhabitants, impmap.connection_node_id
-            FROM imp_surface_count impsurfcount, v2_impervious_surface_map impmap
-            WHERE impsurfcount.id = impmap.impervious_surface_id)
-        SELECT ipn.connection_node_id, SUM(ipn.nr_of_inhabitants)
-        FROM inhibs_per_node ipn GROUP BY ipn.connection_node_id
-        """
-    ):
-        dwf_per_node_per_second.append([row[0], row[1] * DWF_PER_PERSON / 3600])
-
-    conn.close()
-
-    return dwf_per_node_per_second
-
-
-def generate_dwf_lateral_json(spatialite_filepath, start_time, duration, dwf_factors):
-
-    dwf_on_each_node = read_dwf_per_node(spatialite_filepath)
-    dwf_factor_per_timestep = start_time_and_duration_to_dwf_factors(
-        start_time=start_time, duration=duration, dwf_factors=dwf_factors
-    )
-    # Initialize list that will hold JSON
-    dwf_list = []
-
-    # Generate JSON for each connection node
-    for dwf_node in dwf_on_each_node:
-        dwf_per_timestep = """"""
-        for row in dwf_factor_per_timestep:
-            dwf_per_timestep = (
-                dwf_per_timestep + str(row[0]) + "," + str(dwf_node[1] * row[1]) + "\n"
-            )
-
-        dwf_per_timestep = dwf_per_timestep[:-1]
-        dwf_list.append(
-            {
-                "offset": 0,
-                "interpolate": 0,
-                "values": dwf_per_timestep,
-                "units": "m3/s",
-                "connection_node": dwf_node[0],
-            }
-        )
-
-    return dwf_list
-
-
-def dwf_json_to_csv(dwf_list, output_csv_file):
-
-    with open(output_csv_file, "w", newline="") as csv_file:
-        writer = csv.writer(csv_file)
-        for i, row in enumerate(dwf_list):
-            lat_id = i
-            connection_node_id = row["connection_node"]
-            timeseries = row["values"]
-            writer.writerow([str(lat_id), str(connection_node_id), timeseries])
-
-
-def str_to_seconds(time_str):
-    """Get Seconds from time."""
-    m, s = time_str.split(":")
-    return int(m) * 60 + int(s)
 
 
 class DWFCalculatorAlgorithm(QgsProcessingAlgorithm):
@@ -234,6 +92,23 @@ class DWFCalculatorAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                "weekly_pattern",
+                self.tr("DWF progress file contains a pattern per day of the week"),
+                defaultValue=False,
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                "start_weekday",
+                self.tr("Start day of the week (for a weekly pattern)"),
+                options=[self.tr(weekday) for weekday in WEEKDAYS],
+                defaultValue=0,
+            )
+        )
+
         self.addParameter(
             QgsProcessingParameterFileDestination(
                 self.OUTPUT, self.tr("Output CSV"), "csv(*.csv)"
@@ -254,6 +129,9 @@ class DWFCalculatorAlgorithm(QgsProcessingAlgorithm):
         dwf_factor_input = self.parameterAsFile(
             parameters, "dwf_progress_file", context
         )
+        start_weekday = None
+        if self.parameterAsBool(parameters, "weekly_pattern", context):
+            start_weekday = self.parameterAsEnum(parameters, "start_weekday", context)
 
         try:
             md = QgsProviderRegistry.instance().providerMetadata("spatialite")
@@ -273,14 +151,21 @@ class DWFCalculatorAlgorithm(QgsProcessingAlgorithm):
         else:
             dwf_factors = DWF_FACTORS
 
-        dwf_list = generate_dwf_lateral_json(
-            spatialite_filepath=spatialite_filename,
-            start_time=start_time,
-            duration=int(duration),
-            dwf_factors=dwf_factors,
-        )
-
-        dwf_json_to_csv(dwf_list=dwf_list, output_csv_file=output_csv)
+        try:
+            written = write_dwf_laterals_csv(
+                spatialite_filepath=spatialite_filename,
+                start_time=start_time,
+                duration=int(duration),
+                dwf_factors=dwf_factors,
+                output_csv_file=output_csv,
+                start_weekday=start_weekday,
+                feedback=feedback,
+            )
+        except ValueError as e:
+            raise QgsProcessingException(str(e))
+        if not written:
+            feedback.pushInfo(self.tr("Cancelled, the csv is not written."))
+            return {}
 
         return {self.OUTPUT: output_csv}
 
@@ -330,7 +215,9 @@ class DWFCalculatorAlgorithm(QgsProcessingAlgorithm):
         '1, 0.015'\n
         ...
         '23, 0.04'\n
-        Defaults to a pattern specified by Rioned.
+        Defaults to a pattern specified by Rioned. The factors divide the day in intervals of equal length, so a file with 96 rows gives a pattern per quarter of an hour. \n
+        Weekly pattern: the factors in the DWF progress file divide a week (starting Monday 00:00) instead of a day, e.g. 168 rows for an hourly pattern per day of the week. \n
+        Start day of the week: the day of the week the simulation starts (only used for a weekly pattern). \n
         Output CSV: csv file to which the output 1d laterals are saved. This will be the input used by the API Client.
         """
 
@@ -1,8 +1,14 @@
 # See https://docs.qgis.org/3.10/en/docs/pyqgis_developer_cookbook/processing.html
 from qgis.core import QgsProcessingProvider
 from qgis.PyQt.QtGui import QIcon
+from ThreeDiToolbox.processing.dwf_batch_calculation_algorithm import (
+    DWFBatchCalculatorAlgorithm,
+)
 from ThreeDiToolbox.processing.dwf_calculation_algorithm import DWFCalculatorAlgorithm
 from ThreeDiToolbox.processing.threedidepth_algorithm import ThreediDepth
+from ThreeDiToolbox.processing.timeseries_cache_algorithm import (
+    TimeseriesCacheAlgorithm,
+)
 
 
 class ThreediProvider(QgsProcessingProvider):
@@ -11,6 +17,8 @@ class ThreediProvider(QgsProcessingProvider):
     def loadAlgorithms(self, *args, **kwargs):
         self.addAlgorithm(ThreediDepth())
         self.addAlgorithm(DWFCalculatorAlgorithm())
+        self.addAlgorithm(DWFBatchCalculatorAlgorithm())
+        self.addAlgorithm(TimeseriesCacheAlgorithm())
         # add additional algorithms here
         # self.addAlgorithm(MyOtherAlgorithm())
 
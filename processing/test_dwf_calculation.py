@@ -0,0 +1,177 @@
+from ThreeDiToolbox.processing import dwf_calculation
+from ThreeDiToolbox.processing.dwf_calculation import dwf_factor_schedule
+from ThreeDiToolbox.processing.dwf_calculation import DWF_FACTORS
+from ThreeDiToolbox.processing.dwf_calculation import DWF_PER_PERSON
+from ThreeDiToolbox.processing.dwf_calculation import parse_dwf_scenarios
+from ThreeDiToolbox.processing.dwf_calculation import (
+    start_time_and_duration_to_dwf_factors,
+)
+from ThreeDiToolbox.processing.dwf_calculation import write_dwf_laterals_batch
+from ThreeDiToolbox.processing.dwf_calculation import write_dwf_laterals_csv
+
+import csv
+import mock
+import numpy as np
+import os
+import pytest
+import sqlite3
+
+
+@pytest.fixture()
+def dwf_spatialite(tmp_path):
+    """Minimal (plain sqlite) schematisation with two impervious surfaces"""
+    path = tmp_path / "dwf.sqlite"
+    conn = sqlite3.connect(str(path))
+    conn.executescript(
+        """
+        CREATE TABLE v2_impervious_surface (id INTEGER, nr_of_inhabitants REAL);
+        CREATE TABLE v2_impervious_surface_map (
+            impervious_surface_id INTEGER, connection_node_id INTEGER
+        );
+        INSERT INTO v2_impervious_surface VALUES (1, 10), (2, 30), (3, 0);
+        INSERT INTO v2_impervious_surface_map VALUES (1, 100), (2, 100), (2, 200);
+        INSERT INTO v2_impervious_surface_map VALUES (3, 300);
+        """
+    )
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_dwf_factors_start_on_the_hour():
+    dwf_factors = start_time_and_duration_to_dwf_factors("00:00:00", 7200, DWF_FACTORS)
+    assert dwf_factors == [[0, 0.03], [3600, 0.015], [7200, 0.01]]
+
+
+def test_dwf_factors_start_halfway_an_hour():
+    dwf_factors = start_time_and_duration_to_dwf_factors("23:30:00", 5000, DWF_FACTORS)
+    assert dwf_factors == [[0, 0.04], [1800, 0.03], [5000, 0.03]]
+
+
+def test_dwf_factors_zero_duration():
+    dwf_factors = start_time_and_duration_to_dwf_factors("06:00:00", 0, DWF_FACTORS)
+    assert dwf_factors == [[0, 0.025]]
+
+
+def test_dwf_factors_long_simulation():
+    duration = 365 * 24 * 3600
+    seconds, factors = dwf_factor_schedule("00:00:00", duration, DWF_FACTORS)
+    assert len(seconds) == 365 * 24 + 1
+    assert seconds[-1] == duration
+    np.testing.assert_array_equal(np.diff(seconds), 3600)
+    assert factors[24] == DWF_FACTORS[0][1]
+
+
+def test_dwf_factors_sub_hourly_pattern():
+    quarter_hourly = [[i, i / 100] for i in range(96)]
+    seconds, factors = dwf_factor_schedule("00:10:00", 1800, quarter_hourly)
+    np.testing.assert_array_equal(seconds, [0, 300, 1200, 1800])
+    np.testing.assert_array_equal(factors, [0.0, 0.01, 0.02, 0.02])
+
+
+def test_dwf_factors_weekly_pattern():
+    hourly_per_weekday = [[i, i] for i in range(7 * 24)]
+    # Sunday 23:00, the pattern wraps to Monday 00:00
+    seconds, factors = dwf_factor_schedule(
+        "23:00:00", 7200, hourly_per_weekday, start_weekday=6
+    )
+    np.testing.assert_array_equal(seconds, [0, 3600, 7200])
+    np.testing.assert_array_equal(factors, [167, 0, 1])
+
+
+def test_dwf_factors_pattern_must_divide_the_day():
+    with pytest.raises(ValueError):
+        dwf_factor_schedule("00:00:00", 3600, [[i, 1.0] for i in range(7)])
+
+
+def test_write_dwf_laterals_csv(dwf_spatialite, tmp_path):
+    output_csv = str(tmp_path / "dwf.csv")
+    write_dwf_laterals_csv(dwf_spatialite, "00:00:00", 3600, DWF_FACTORS, output_csv)
+    with open(output_csv, newline="") as csv_file:
+        rows = list(csv.reader(csv_file))
+    # node 100: 10 + 30 / 2 inhabitants, node 200: 30 / 2 inhabitants
+    assert [row[:2] for row in rows] == [["0", "100"], ["1", "200"]]
+    dwf_node_100 = 25 * DWF_PER_PERSON / 3600
+    assert rows[0][2] == "0,{}\n3600,{}".format(
+        dwf_node_100 * 0.03, dwf_node_100 * 0.015
+    )
+
+
+def test_write_dwf_laterals_csv_canceled(dwf_spatialite, tmp_path):
+    output_csv = str(tmp_path / "dwf.csv")
+    feedback = mock.Mock()
+    feedback.isCanceled.return_value = True
+    written = write_dwf_laterals_csv(
+        dwf_spatialite, "00:00:00", 3600, DWF_FACTORS, output_csv, feedback=feedback
+    )
+    assert not written
+    assert os.listdir(str(tmp_path)) == ["dwf.sqlite"]
+
+
+def test_dwf_per_node_is_cached_until_the_spatialite_changes(dwf_spatialite):
+    first = dwf_calculation.cached_dwf_per_node(dwf_spatialite)
+    assert dwf_calculation.cached_dwf_per_node(dwf_spatialite) is first
+    conn = sqlite3.connect(dwf_spatialite)
+    conn.execute("UPDATE v2_impervious_surface SET nr_of_inhabitants = 20 WHERE id = 1")
+    conn.commit()
+    conn.close()
+    # make sure the modification time differs
+    stat = os.stat(dwf_spatialite)
+    os.utime(dwf_spatialite, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = dwf_calculation.cached_dwf_per_node(dwf_spatialite)
+    assert second is not first
+    assert second[0][1] == pytest.approx(35 * DWF_PER_PERSON / 3600)
+
+
+def test_parse_dwf_scenarios():
+    scenarios = parse_dwf_scenarios("00:00:00,86400\n\n 08:30:00, 3600 \n")
+    assert scenarios == [("00:00:00", 86400), ("08:30:00", 3600)]
+    with pytest.raises(ValueError):
+        parse_dwf_scenarios("08:30,3600")
+
+
+def test_write_dwf_laterals_batch(dwf_spatialite, tmp_path):
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    scenarios = [("00:00:00", 3600), ("12:00:00", 7200)]
+    written = write_dwf_laterals_batch(
+        [dwf_spatialite], scenarios, DWF_FACTORS, str(output_dir)
+    )
+    assert sorted(os.listdir(str(output_dir))) == [
+        "dwf_000000_3600.csv",
+        "dwf_120000_7200.csv",
+    ]
+    assert len(written) == 2
+    single_csv = str(tmp_path / "single.csv")
+    write_dwf_laterals_csv(dwf_spatialite, "12:00:00", 7200, DWF_FACTORS, single_csv)
+    with open(single_csv) as expected, open(
+        str(output_dir / "dwf_120000_7200.csv")
+    ) as batch:
+        assert batch.read() == expected.read()
+
+
+def test_batch_output_stems():
+    assert dwf_calculation.batch_output_stems(
+        ["a/dwf.sqlite", "b/dwf.sqlite", "c/other.sqlite"]
+    ) == ["dwf_1", "dwf_2", "other"]
+    with pytest.raises(ValueError):
+        dwf_calculation.batch_output_stems(["a/x.sqlite", "b/x.sqlite", "x_1.sqlite"])
+
+
+def test_write_dwf_laterals_batch_same_names(dwf_spatialite, tmp_path):
+    spatialite_paths = []
+    for directory in ("a", "b"):
+        (tmp_path / directory).mkdir()
+        path = tmp_path / directory / "dwf.sqlite"
+        path.write_bytes(open(dwf_spatialite, "rb").read())
+        spatialite_paths.append(str(path))
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    written = write_dwf_laterals_batch(
+        spatialite_paths, [("00:00:00", 3600)], DWF_FACTORS, str(output_dir)
+    )
+    assert sorted(os.listdir(str(output_dir))) == [
+        "dwf_1_000000_3600.csv",
+        "dwf_2_000000_3600.csv",
+    ]
+    assert len(written) == 2
@@ -0,0 +1,255 @@
+from osgeo import gdal
+from ThreeDiToolbox.processing.threedidepth_calculation import aggregate_block
+from ThreeDiToolbox.processing.threedidepth_calculation import AGGREGATE_DURATION
+from ThreeDiToolbox.processing.threedidepth_calculation import AGGREGATE_MAXIMUM
+from ThreeDiToolbox.processing.threedidepth_calculation import AGGREGATE_MINIMUM
+from ThreeDiToolbox.processing.threedidepth_calculation import AggregateConverter
+from ThreeDiToolbox.processing.threedidepth_calculation import (
+    calculate_waterdepth_parallel,
+)
+from ThreeDiToolbox.processing.threedidepth_calculation import dem_window
+from ThreeDiToolbox.processing.threedidepth_calculation import split_calculation_steps
+from ThreeDiToolbox.processing.threedidepth_calculation import WindowCalculator
+from ThreeDiToolbox.tests import synthetic_results
+
+import mock
+import numpy as np
+import pytest
+
+
+@pytest.fixture()
+def dem_path(tmp_path):
+    """100 x 50 pixels of 0.5m, upper left corner at (1000, 2000)"""
+    path = str(tmp_path / "dem.tif")
+    dataset = gdal.GetDriverByName("GTiff").Create(path, 100, 50, 1, gdal.GDT_Float32)
+    dataset.SetGeoTransform((1000, 0.5, 0, 2000, 0, -0.5))
+    dataset = None
+    return path
+
+
+def test_split_calculation_steps():
+    chunks = split_calculation_steps(list(range(10)), max_workers=2)
+    assert chunks == [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]
+
+
+def test_split_calculation_steps_less_steps_than_workers():
+    assert split_calculation_steps([5, 6], max_workers=4) == [[5], [6]]
+
+
+def test_dem_window(dem_path):
+    # x from 1010.2 to 1020: columns 20 up to 40, y from 1990 to 1995: rows 10 up to 20
+    assert dem_window(dem_path, (1010.2, 1990, 1020, 1995)) == (20, 10, 20, 10)
+
+
+def test_dem_window_clipped_to_dem(dem_path):
+    assert dem_window(dem_path, (900, 1900, 1010, 2100)) == (0, 0, 20, 50)
+
+
+def test_dem_window_outside_dem(dem_path):
+    with pytest.raises(ValueError):
+        dem_window(dem_path, (0, 0, 10, 10))
+
+
+def test_window_calculator():
+    calls = []
+
+    def calculator(indices, values, no_data_value):
+        calls.append(indices)
+        return values
+
+    window_calculator = WindowCalculator(calculator, window=(20, 10, 20, 10))
+    assert window_calculator(((0, 0), (5, 8)), "values", -9999) == "values"
+    assert calls == [((10, 20), (15, 28))]
+
+
+def test_aggregate_block_maximum():
+    no_data = -9999.0
+    values = np.zeros(4)  # dem
+    first = aggregate_block(
+        AGGREGATE_MAXIMUM, None, np.array([1.0, no_data, 2.0, no_data]), values, no_data
+    )
+    second = aggregate_block(
+        AGGREGATE_MAXIMUM,
+        first,
+        np.array([0.5, 3.0, no_data, no_data]),
+        values,
+        no_data,
+    )
+    assert second.tolist() == [1.0, 3.0, 2.0, no_data]
+
+
+def test_aggregate_block_minimum():
+    no_data = -9999.0
+    values = np.zeros(3)
+    first = aggregate_block(
+        AGGREGATE_MINIMUM, None, np.array([1.0, no_data, 2.0]), values, no_data
+    )
+    second = aggregate_block(
+        AGGREGATE_MINIMUM, first, np.array([0.5, 3.0, no_data]), values, no_data
+    )
+    assert second.tolist() == [0.5, 3.0, 2.0]
+
+
+def test_aggregate_block_duration():
+    no_data = -9999.0
+    values = np.array([0.0, 0.0, 0.0, no_data])
+    aggregate = None
+    for result in ([0.2, 0.05, no_data, no_data], [0.3, 0.2, no_data, no_data]):
+        aggregate = aggregate_block(
+            AGGREGATE_DURATION,
+            aggregate,
+            np.array(result),
+            values,
+            no_data,
+            duration=300.0,
+            threshold=0.1,
+        )
+    assert aggregate.tolist() == [600.0, 300.0, 0.0, no_data]
+
+
+@pytest.fixture()
+def tiled_dem_path(tmp_path):
+    """40 x 20 pixels in blocks of 16 x 16, dem level 0, no data in column 0"""
+    path = str(tmp_path / "tiled_dem.tif")
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        path,
+        40,
+        20,
+        1,
+        gdal.GDT_Float32,
+        options=["tiled=yes", "blockxsize=16", "blockysize=16"],
+    )
+    dataset.SetGeoTransform((1000, 0.5, 0, 2000, 0, -0.5))
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(-9999.0)
+    dem = np.zeros((20, 40), dtype=np.float32)
+    dem[:, 0] = -9999.0
+    band.WriteArray(dem)
+    dataset = None
+    return path
+
+
+def level_calculator(level):
+    """Return a calculator with a water depth of level on the whole dem"""
+
+    def calculator(indices, values, no_data_value):
+        return np.where(values == no_data_value, no_data_value, values + level)
+
+    return calculator
+
+
+@pytest.mark.parametrize(
+    "aggregation,expected", [(AGGREGATE_MAXIMUM, 3.0), (AGGREGATE_MINIMUM, 0.5)]
+)
+def test_aggregate_converter(tiled_dem_path, tmp_path, aggregation, expected):
+    target_path = str(tmp_path / "aggregate.tif")
+    with AggregateConverter(tiled_dem_path, target_path, aggregation) as converter:
+        for step, level in enumerate([1.0, 3.0, 0.5]):
+            converter.aggregate_using(level_calculator(level), first=step == 0)
+
+    # only the dem and the (compressed) target are left
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "aggregate.tif",
+        "tiled_dem.tif",
+    ]
+    dataset = gdal.Open(target_path)
+    assert dataset.GetMetadata("IMAGE_STRUCTURE")["COMPRESSION"] == "DEFLATE"
+    assert dataset.GetRasterBand(1).GetBlockSize() == [16, 16]
+    result = dataset.ReadAsArray()
+    assert result.shape == (20, 40)
+    assert (result[:, 0] == -9999.0).all()
+    assert (result[:, 1:] == expected).all()
+
+
+def test_aggregate_converter_duration(tiled_dem_path, tmp_path):
+    target_path = str(tmp_path / "duration.tif")
+    with AggregateConverter(
+        tiled_dem_path, target_path, AGGREGATE_DURATION, threshold=0.8
+    ) as converter:
+        for step, level in enumerate([1.0, 3.0, 0.5]):
+            converter.aggregate_using(
+                level_calculator(level), first=step == 0, duration=60.0
+            )
+    result = gdal.Open(target_path).ReadAsArray()
+    assert (result[:, 0] == -9999.0).all()
+    assert (result[:, 1:] == 120.0).all()
+
+
+def test_aggregate_converter_error_leaves_no_files(tiled_dem_path, tmp_path):
+    target_path = str(tmp_path / "aggregate.tif")
+    with pytest.raises(ZeroDivisionError):
+        with AggregateConverter(tiled_dem_path, target_path, AGGREGATE_MAXIMUM):
+            1 / 0
+    assert [path.name for path in tmp_path.iterdir()] == ["tiled_dem.tif"]
+
+
+@pytest.fixture()
+def synthetic_model(tmp_path):
+    """Gridadmin, results and dem of a synthetic model of 4 x 3 cells
+
+    Returns the gridadmin path, results_3di path and dem path. The dem value
+    is the column number.
+    """
+    model_dir = tmp_path / "model"
+    results_3di_path = synthetic_results.write_synthetic_results(
+        model_dir, nx=4, ny=3, timesteps=6
+    )
+    dem_path = str(model_dir / "dem.tif")
+    dataset = gdal.GetDriverByName("GTiff").Create(
+        dem_path, 16, 12, 1, gdal.GDT_Float32
+    )
+    x0, y0 = synthetic_results.ORIGIN
+    pixel_size = synthetic_results.PIXEL_SIZE
+    dataset.SetGeoTransform((x0, pixel_size, 0, y0 + 12 * pixel_size, 0, -pixel_size))
+    band = dataset.GetRasterBand(1)
+    band.SetNoDataValue(-9999.0)
+    band.WriteArray(np.tile(np.arange(16, dtype=np.float32), (12, 1)))
+    dataset = None
+    return str(model_dir / "gridadmin.h5"), results_3di_path, dem_path
+
+
+def test_calculate_waterdepth_parallel(synthetic_model, tmp_path):
+    gridadmin_path, results_3di_path, dem_path = synthetic_model
+    waterdepth_path = str(tmp_path / "waterdepth.tif")
+    written = calculate_waterdepth_parallel(
+        gridadmin_path=gridadmin_path,
+        results_3di_path=results_3di_path,
+        dem_path=dem_path,
+        waterdepth_path=waterdepth_path,
+        calculation_steps=[0, 2, 3, 5],
+        mode="copy",
+        max_workers=2,
+    )
+    assert written == [0, 2, 3, 5]
+    dataset = gdal.Open(waterdepth_path)
+    assert dataset.RasterCount == 4
+    dem = gdal.Open(dem_path).ReadAsArray()
+    for band_nr in range(1, 5):
+        assert (dataset.GetRasterBand(band_nr).ReadAsArray() == dem).all()
+    # the temporary chunk files are removed
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "model",
+        "waterdepth.tif",
+    ]
+
+
+def test_calculate_waterdepth_parallel_cancelled(synthetic_model, tmp_path):
+    gridadmin_path, results_3di_path, dem_path = synthetic_model
+    waterdepth_path = str(tmp_path / "waterdepth.tif")
+    feedback = mock.Mock()
+    feedback.isCanceled.return_value = True
+    # one worker: the chunks [0], [2], [3] and [5] are calculated in order,
+    # cancelling after the first one
+    written = calculate_waterdepth_parallel(
+        gridadmin_path=gridadmin_path,
+        results_3di_path=results_3di_path,
+        dem_path=dem_path,
+        waterdepth_path=waterdepth_path,
+        calculation_steps=[0, 2, 3, 5],
+        mode="copy",
+        max_workers=1,
+        feedback=feedback,
+    )
+    assert written == [0]
+    # no empty bands for the cancelled steps
+    assert gdal.Open(waterdepth_path).RasterCount == 1
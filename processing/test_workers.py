@@ -0,0 +1,21 @@
+from ThreeDiToolbox.processing.workers import process_pool
+
+import multiprocessing
+import os
+
+
+def _process_name():
+    return multiprocessing.current_process().name
+
+
+def test_process_pool():
+    with process_pool(1) as pool:
+        assert pool.submit(os.getpid).result() != os.getpid()
+
+
+def test_workers_are_not_the_main_process():
+    # The package skips the dependency check in processes that are not the
+    # main process, see ThreeDiToolbox/__init__.py.
+    assert _process_name() == "MainProcess"
+    with process_pool(1) as pool:
+        assert pool.submit(_process_name).result() != "MainProcess"
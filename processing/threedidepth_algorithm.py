@@ -18,21 +18,34 @@ from qgis.core import QgsFeedback
 from qgis.core import QgsProcessingAlgorithm
 from qgis.core import QgsProcessingParameterBoolean
 from qgis.core import QgsProcessingParameterEnum
+from qgis.core import QgsProcessingParameterExtent
 from qgis.core import QgsProcessingParameterFile
 from qgis.core import QgsProcessingParameterNumber
 from qgis.core import QgsProcessingParameterRasterDestination
 from qgis.core import QgsProcessingParameterRasterLayer
 from qgis.PyQt import uic
 from qgis.PyQt.QtCore import QCoreApplication
-from threedidepth.calculate import calculate_waterdepth
 from threedidepth.calculate import MODE_CONSTANT
 from threedidepth.calculate import MODE_CONSTANT_S1
 from threedidepth.calculate import MODE_LINEAR
 from threedidepth.calculate import MODE_LIZARD
 from threedidepth.calculate import MODE_LIZARD_S1
+from ThreeDiToolbox.datasource.result_metadata import netcdf_timestamps
+from ThreeDiToolbox.processing.threedidepth_calculation import AGGREGATE_DURATION
+from ThreeDiToolbox.processing.threedidepth_calculation import AGGREGATE_MAXIMUM
+from ThreeDiToolbox.processing.threedidepth_calculation import AGGREGATE_MINIMUM
+from ThreeDiToolbox.processing.threedidepth_calculation import (
+    calculate_waterdepth_aggregate,
+)
+from ThreeDiToolbox.processing.threedidepth_calculation import (
+    calculate_waterdepth_parallel,
+)
+from ThreeDiToolbox.processing.threedidepth_calculation import (
+    calculate_waterdepth_window,
+)
+from ThreeDiToolbox.processing.threedidepth_calculation import dem_window
 from ThreeDiToolbox.utils.user_messages import pop_up_info
 
-import h5py
 import logging
 import os
 
@@ -40,6 +53,7 @@ import os
 logger = logging.getLogger(__name__)
 pluginPath = os.path.split(os.path.dirname(__file__))[0]
 Mode = namedtuple("Mode", ["name", "description"])
+Aggregation = namedtuple("Aggregation", ["name", "description"])
 
 
 class ProcessingParameterNetcdfNumber(QgsProcessingParameterNumber):
@@ -144,9 +158,7 @@ class TimeSliderWidget(BASE, WIDGET):
             return
 
         try:
-            with h5py.File(file_path, "r") as results:
-                timestamps = results["time"].value
-                self.set_timestamps(timestamps)
+            self.set_timestamps(netcdf_timestamps(file_path))
         except Exception as e:
             logger.exception(e)
             pop_up_info(
@@ -194,6 +206,13 @@ class ThreediDepth(QgsProcessingAlgorithm):
         Mode(MODE_CONSTANT_S1, "Non-interpolated water level"),
     ]
 
+    AGGREGATIONS = [
+        Aggregation(None, "None (a band per timestep)"),
+        Aggregation(AGGREGATE_MAXIMUM, "Maximum over the timesteps"),
+        Aggregation(AGGREGATE_MINIMUM, "Minimum over the timesteps"),
+        Aggregation(AGGREGATE_DURATION, "Duration (s) above the threshold"),
+    ]
+
     GRIDADMIN_INPUT = "GRIDADMIN_INPUT"
     RESULTS_3DI_INPUT = "RESULTS_3DI_INPUT"
     DEM_INPUT = "DEM_INPUT"
@@ -201,6 +220,10 @@ class ThreediDepth(QgsProcessingAlgorithm):
     CALCULATION_STEP_INPUT = "CALCULATION_STEP_INPUT"
     AS_NETCDF_INPUT = "AS_NETCDF_INPUT"
     CALCULATION_STEP_END_INPUT = "CALCULATION_STEP_END_INPUT"
+    WORKERS_INPUT = "WORKERS_INPUT"
+    EXTENT_INPUT = "EXTENT_INPUT"
+    AGGREGATION_INPUT = "AGGREGATION_INPUT"
+    THRESHOLD_INPUT = "THRESHOLD_INPUT"
     WATER_DEPTH_OUTPUT = "WATER_DEPTH_OUTPUT"
 
     def tr(self, string):
@@ -234,7 +257,9 @@ class ThreediDepth(QgsProcessingAlgorithm):
     def shortHelpString(self):
         """Returns a localised short helper string for the algorithm"""
         return self.tr(
-            "Calculate water depth or water level raster for specified timestep"
+            "Calculate water depth or water level raster for specified timestep. "
+            "For multiple timesteps, the maximum, minimum or duration above a "
+            "threshold can be calculated into a single band raster instead."
         )
 
     def initAlgorithm(self, config=None):
@@ -290,6 +315,47 @@ class ThreediDepth(QgsProcessingAlgorithm):
                 defaultValue=False,
             )
         )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                name=self.AGGREGATION_INPUT,
+                description=self.tr(
+                    "Combine multiple timesteps into a single band raster"
+                ),
+                options=[a.description for a in self.AGGREGATIONS],
+                defaultValue=0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.THRESHOLD_INPUT,
+                description=self.tr(
+                    "Threshold water depth or water level for the duration"
+                ),
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0.0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterExtent(
+                name=self.EXTENT_INPUT,
+                description=self.tr(
+                    "Only calculate this extent (leave empty for the whole DEM)"
+                ),
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                name=self.WORKERS_INPUT,
+                description=self.tr(
+                    "Number of worker processes (for multiple timesteps)"
+                ),
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=1,
+                minValue=1,
+                maxValue=os.cpu_count() or 1,
+            )
+        )
 
         self.addParameter(
             QgsProcessingParameterRasterDestination(
@@ -304,9 +370,8 @@ class ThreediDepth(QgsProcessingAlgorithm):
         waterdepth_output_file = self.parameterAsOutputLayer(
             parameters, self.WATER_DEPTH_OUTPUT, context
         )
-        dem_filename = self.parameterAsRasterLayer(
-            parameters, self.DEM_INPUT, context
-        ).source()
+        dem_layer = self.parameterAsRasterLayer(parameters, self.DEM_INPUT, context)
+        dem_filename = dem_layer.source()
         mode_index = self.parameterAsEnum(parameters, self.MODE_INPUT, context)
 
         endstep = parameters[self.CALCULATION_STEP_END_INPUT]
@@ -321,14 +386,90 @@ class ThreediDepth(QgsProcessingAlgorithm):
         else:
             timesteps = [parameters[self.CALCULATION_STEP_INPUT]]
 
+        window = None
+        if parameters.get(self.EXTENT_INPUT):
+            extent = self.parameterAsExtent(
+                parameters, self.EXTENT_INPUT, context, crs=dem_layer.crs()
+            )
+            try:
+                window = dem_window(
+                    dem_filename,
+                    (
+                        extent.xMinimum(),
+                        extent.yMinimum(),
+                        extent.xMaximum(),
+                        extent.yMaximum(),
+                    ),
+                )
+            except ValueError as e:
+                feedback.reportError(str(e), fatalError=True)
+                return {}
+
+        aggregation_index = self.parameterAsEnum(
+            parameters, self.AGGREGATION_INPUT, context
+        )
+        aggregation = self.AGGREGATIONS[aggregation_index].name
+        if aggregation is not None:
+            if parameters[self.AS_NETCDF_INPUT]:
+                feedback.reportError(
+                    "Combined timesteps can only be exported as a GeoTIFF.",
+                    fatalError=True,
+                )
+                return {}
+            try:
+                calculate_waterdepth_aggregate(
+                    gridadmin_path=parameters[self.GRIDADMIN_INPUT],
+                    results_3di_path=parameters[self.RESULTS_3DI_INPUT],
+                    dem_path=dem_filename,
+                    waterdepth_path=waterdepth_output_file,
+                    calculation_steps=timesteps,
+                    mode=self.MODES[mode_index].name,
+                    aggregation=aggregation,
+                    threshold=self.parameterAsDouble(
+                        parameters, self.THRESHOLD_INPUT, context
+                    ),
+                    window=window,
+                    progress_func=Progress(feedback),
+                )
+            except CancelError:
+                # The aggregate of part of the timesteps (possibly of part of
+                # a timestep) is not a meaningful intermediate product, so it
+                # is not written.
+                feedback.pushInfo("Cancelled, the combined timesteps are not written.")
+                return {}
+            return {self.WATER_DEPTH_OUTPUT: waterdepth_output_file}
+
+        workers = self.parameterAsInt(parameters, self.WORKERS_INPUT, context)
+        if workers > 1 and len(timesteps) > 1:
+            written = calculate_waterdepth_parallel(
+                gridadmin_path=parameters[self.GRIDADMIN_INPUT],
+                results_3di_path=parameters[self.RESULTS_3DI_INPUT],
+                dem_path=dem_filename,
+                waterdepth_path=waterdepth_output_file,
+                calculation_steps=timesteps,
+                mode=self.MODES[mode_index].name,
+                window=window,
+                netcdf=parameters[self.AS_NETCDF_INPUT],
+                max_workers=workers,
+                feedback=feedback,
+            )
+            if len(written) < len(timesteps):
+                feedback.pushInfo(
+                    "Cancelled: {} of {} timesteps have been written".format(
+                        len(written), len(timesteps)
+                    )
+                )
+            return {self.WATER_DEPTH_OUTPUT: waterdepth_output_file}
+
         try:
-            calculate_waterdepth(
+            calculate_waterdepth_window(
                 gridadmin_path=parameters[self.GRIDADMIN_INPUT],
                 results_3di_path=parameters[self.RESULTS_3DI_INPUT],
                 dem_path=dem_filename,
                 waterdepth_path=waterdepth_output_file,
                 calculation_steps=timesteps,
                 mode=self.MODES[mode_index].name,
+                window=window,
                 progress_func=Progress(feedback),
                 netcdf=parameters[self.AS_NETCDF_INPUT],
             )
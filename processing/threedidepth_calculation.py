@@ -0,0 +1,549 @@
+"""Water depth calculation in worker processes, used by the ThreediDepth algorithm
+
+Note: this module does not import qgis, so the calculation steps can be
+computed in worker processes.
+"""
+from osgeo import gdal
+from threedidepth.calculate import calculate_waterdepth
+from threedidepth.calculate import calculator_classes
+from threedidepth.calculate import GeoTIFFConverter
+from threedidepth.calculate import NetcdfConverter
+from threedidepth.calculate import ProgressClass
+from threedidepth.fixes import fix_gridadmin
+from ThreeDiToolbox.datasource.result_metadata import netcdf_timestamps
+from ThreeDiToolbox.processing.workers import process_pool
+
+import concurrent.futures
+import logging
+import math
+import numpy as np
+import os
+import tempfile
+
+
+logger = logging.getLogger(__name__)
+
+AGGREGATE_MAXIMUM = "maximum"
+AGGREGATE_MINIMUM = "minimum"
+AGGREGATE_DURATION = "duration"
+
+# Number of chunks per worker, more chunks give smoother progress and a
+# quicker response to cancelling, fewer chunks less overhead
+CHUNKS_PER_WORKER = 4
+
+
+def split_calculation_steps(calculation_steps, max_workers):
+    """Return the calculation steps as a list of consecutive chunks"""
+    nr_of_chunks = min(len(calculation_steps), max_workers * CHUNKS_PER_WORKER)
+    chunk_size = -(-len(calculation_steps) // max(nr_of_chunks, 1))
+    return [
+        calculation_steps[i : i + chunk_size]
+        for i in range(0, len(calculation_steps), chunk_size)
+    ]
+
+
+def dem_window(dem_path, extent):
+    """Return the pixel window (xoff, yoff, xsize, ysize) of the dem covering extent
+
+    The window is aligned to the dem pixels and clipped to the dem.
+
+    :param extent: (xmin, ymin, xmax, ymax) in the dem's coordinate system
+    """
+    dataset = gdal.Open(dem_path, gdal.GA_ReadOnly)
+    x0, dx, _, y0, _, dy = dataset.GetGeoTransform()
+    xsize, ysize = dataset.RasterXSize, dataset.RasterYSize
+    dataset = None
+
+    xmin, ymin, xmax, ymax = extent
+    # note: dy is negative, so the top of the extent is the first row
+    col_start = max(math.floor((xmin - x0) / dx), 0)
+    col_end = min(math.ceil((xmax - x0) / dx), xsize)
+    row_start = max(math.floor((ymax - y0) / dy), 0)
+    row_end = min(math.ceil((ymin - y0) / dy), ysize)
+    if col_end <= col_start or row_end <= row_start:
+        raise ValueError("The extent does not overlap the DEM")
+    return col_start, row_start, col_end - col_start, row_end - row_start
+
+
+def cropped_dem(dem_path, window, vrt_path):
+    """Write a VRT of the window of the dem and return its path"""
+    dataset = gdal.Translate(vrt_path, dem_path, format="VRT", srcWin=list(window))
+    del dataset  # closing the dataset writes the VRT
+    return vrt_path
+
+
+class WindowCalculator:
+    """Calculator (see ``threedidepth.calculate``) for a window of the dem
+
+    The converter iterates over the cropped dem, while the threedidepth
+    calculator expects indices in the full dem (the gridadmin's pixel
+    coordinates), so the indices are shifted by the window offset.
+    """
+
+    def __init__(self, calculator, window):
+        self.calculator = calculator
+        self.xoff, self.yoff = window[:2]
+
+    def __call__(self, indices, values, no_data_value):
+        (i1, j1), (i2, j2) = indices
+        indices = (i1 + self.yoff, j1 + self.xoff), (i2 + self.yoff, j2 + self.xoff)
+        return self.calculator(
+            indices=indices, values=values, no_data_value=no_data_value
+        )
+
+
+def calculate_waterdepth_window(
+    gridadmin_path,
+    results_3di_path,
+    dem_path,
+    waterdepth_path,
+    calculation_steps,
+    mode,
+    window=None,
+    netcdf=False,
+    progress_func=None,
+):
+    """Calculate the water depth like ``calculate_waterdepth()``, for a dem window
+
+    Only the dem pixels in the window are read and calculated and the output
+    raster has the size and position of the window. Without a window this
+    is the same as ``calculate_waterdepth()``.
+
+    :param window: (xoff, yoff, xsize, ysize) pixel window, see ``dem_window()``
+    """
+    if window is None:
+        return calculate_waterdepth(
+            gridadmin_path=gridadmin_path,
+            results_3di_path=results_3di_path,
+            dem_path=dem_path,
+            waterdepth_path=waterdepth_path,
+            calculation_steps=calculation_steps,
+            mode=mode,
+            progress_func=progress_func,
+            netcdf=netcdf,
+        )
+
+    try:
+        CalculatorClass = calculator_classes[mode]
+    except KeyError:
+        raise ValueError("Unknown mode: '%s'" % mode)
+    fix_gridadmin(gridadmin_path)
+
+    dataset = gdal.Open(dem_path, gdal.GA_ReadOnly)
+    dem_shape = dataset.RasterYSize, dataset.RasterXSize
+    dem_geo_transform = dataset.GetGeoTransform()
+    dataset = None
+
+    progress_class = ProgressClass(
+        calculation_steps=calculation_steps, progress_func=progress_func
+    )
+    output_dir = os.path.dirname(os.path.abspath(waterdepth_path))
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        vrt_path = cropped_dem(dem_path, window, os.path.join(tmp_dir, "dem.vrt"))
+        converter = _converter(
+            vrt_path,
+            waterdepth_path,
+            gridadmin_path,
+            results_3di_path,
+            calculation_steps,
+            netcdf,
+            progress_func=None if progress_func is None else progress_class,
+        )
+        with converter:
+            for band, calculation_step in progress_class:
+                calculator = CalculatorClass(
+                    gridadmin_path=gridadmin_path,
+                    results_3di_path=results_3di_path,
+                    calculation_step=calculation_step,
+                    dem_shape=dem_shape,
+                    dem_geo_transform=dem_geo_transform,
+                )
+                with calculator:
+                    converter.convert_using(
+                        calculator=WindowCalculator(calculator, window), band=band
+                    )
+
+
+def _converter(
+    source_path,
+    target_path,
+    gridadmin_path,
+    results_3di_path,
+    calculation_steps,
+    netcdf,
+    progress_func=None,
+):
+    """Return the threedidepth GeoTIFF or NetCDF converter"""
+    if netcdf:
+        return NetcdfConverter(
+            source_path=source_path,
+            target_path=target_path,
+            gridadmin_path=gridadmin_path,
+            results_3di_path=results_3di_path,
+            calculation_steps=calculation_steps,
+            progress_func=progress_func,
+        )
+    return GeoTIFFConverter(
+        source_path=source_path,
+        target_path=target_path,
+        band_count=len(calculation_steps),
+        progress_func=progress_func,
+    )
+
+
+class BandCopier:
+    """Calculator (see ``threedidepth.calculate``) copying a band of a raster
+
+    The raster has the same size as the (cropped) dem, so the indices passed
+    by the converter can be used as is.
+    """
+
+    def __init__(self, band):
+        self.band = band
+
+    def __call__(self, indices, values, no_data_value):
+        (i1, j1), (i2, j2) = indices
+        return self.band.ReadAsArray(
+            xoff=j1, yoff=i1, win_xsize=j2 - j1, win_ysize=i2 - i1
+        )
+
+
+def calculate_waterdepth_parallel(
+    gridadmin_path,
+    results_3di_path,
+    dem_path,
+    waterdepth_path,
+    calculation_steps,
+    mode,
+    window=None,
+    netcdf=False,
+    max_workers=1,
+    feedback=None,
+):
+    """Calculate the water depth of several calculation steps in worker processes
+
+    The calculation steps are split in chunks, each chunk is calculated by
+    ``calculate_waterdepth_window()`` in a worker process into a temporary
+    GeoTIFF next to the output (the dem is only read). Afterwards the bands
+    are copied into the GeoTIFF or NetCDF at ``waterdepth_path``.
+
+    When the feedback is cancelled, the pending chunks are cancelled and the
+    output only contains the bands of the chunks that are already done.
+
+    :param calculation_steps: list of calculation steps, one band per step
+    :param mode: one of the threedidepth ``MODE_*`` constants
+    :param window: optional (xoff, yoff, xsize, ysize) pixel window of the dem
+    :param feedback: optional QgsFeedback for progress and cancelling
+    :returns: the calculation steps that have been written
+    """
+    # fix once beforehand, the workers can't write the gridadmin concurrently
+    fix_gridadmin(gridadmin_path)
+
+    chunks = split_calculation_steps(calculation_steps, max_workers)
+    output_dir = os.path.dirname(os.path.abspath(waterdepth_path))
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        chunk_paths = {}
+        with process_pool(min(max_workers, len(chunks))) as pool:
+            futures = {}
+            for chunk_index, chunk in enumerate(chunks):
+                chunk_path = os.path.join(tmp_dir, "chunk_{}.tif".format(chunk_index))
+                future = pool.submit(
+                    calculate_waterdepth_window,
+                    gridadmin_path=gridadmin_path,
+                    results_3di_path=results_3di_path,
+                    dem_path=dem_path,
+                    waterdepth_path=chunk_path,
+                    calculation_steps=chunk,
+                    mode=mode,
+                    window=window,
+                )
+                futures[future] = (chunk_index, chunk_path)
+
+            nr_of_steps_done = 0
+            for future in concurrent.futures.as_completed(futures):
+                future.result()  # re-raises exceptions of the worker
+                chunk_index, chunk_path = futures[future]
+                chunk_paths[chunk_index] = chunk_path
+                nr_of_steps_done += len(chunks[chunk_index])
+                if feedback is not None:
+                    if feedback.isCanceled():
+                        for pending in futures:
+                            pending.cancel()
+                        break
+                    feedback.setProgress(
+                        100 * nr_of_steps_done / len(calculation_steps)
+                    )
+
+        if feedback is not None:
+            feedback.setProgressText("Writing {}".format(waterdepth_path))
+        if window is not None:
+            dem_path = cropped_dem(dem_path, window, os.path.join(tmp_dir, "dem.vrt"))
+        return _merge_chunks(
+            chunks,
+            chunk_paths,
+            gridadmin_path,
+            results_3di_path,
+            dem_path,
+            waterdepth_path,
+            netcdf,
+        )
+
+
+def _merge_chunks(
+    chunks,
+    chunk_paths,
+    gridadmin_path,
+    results_3di_path,
+    dem_path,
+    waterdepth_path,
+    netcdf,
+):
+    """Copy the bands of the chunk GeoTIFFs into one GeoTIFF or NetCDF
+
+    Only the finished chunks are copied: after cancelling, the output has a
+    band per calculation step that has been calculated, no empty bands.
+
+    :param chunk_paths: {chunk index: chunk GeoTIFF} of the finished chunks
+    :returns: the calculation steps that have been written
+    """
+    finished = [
+        (chunk, chunk_paths[chunk_index])
+        for chunk_index, chunk in enumerate(chunks)
+        if chunk_index in chunk_paths
+    ]
+    written = [step for chunk, _ in finished for step in chunk]
+    if not written:
+        return written
+    converter = _converter(
+        dem_path,
+        waterdepth_path,
+        gridadmin_path,
+        results_3di_path,
+        written,
+        netcdf,
+    )
+
+    with converter:
+        band_offset = 0
+        for chunk, chunk_path in finished:
+            dataset = gdal.Open(chunk_path, gdal.GA_ReadOnly)
+            for band_index in range(len(chunk)):
+                calculator = BandCopier(dataset.GetRasterBand(band_index + 1))
+                converter.convert_using(
+                    calculator=calculator, band=band_offset + band_index
+                )
+            dataset = None
+            band_offset += len(chunk)
+    return written
+
+
+def step_durations(results_3di_path, calculation_steps):
+    """Return the duration (s) each calculation step represents
+
+    A step lasts until the next step, the last step lasts as long as the one
+    before it.
+    """
+    timestamps = netcdf_timestamps(results_3di_path)[calculation_steps]
+    if len(timestamps) < 2:
+        return np.zeros(len(timestamps))
+    durations = np.diff(timestamps)
+    return np.append(durations, durations[-1])
+
+
+def aggregate_block(
+    aggregation, previous, result, values, no_data_value, duration=0.0, threshold=0.0
+):
+    """Return the running aggregate of a block, updated with one step's result
+
+    For the maximum and minimum, 'no data' in the result (e.g. a dry pixel)
+    is ignored. The duration is the total time the result is above the
+    threshold, it is 'no data' where the dem is.
+
+    :param previous: aggregate so far or None for the first step
+    :param result: result array of the calculator for this step
+    :param values: dem array of the block
+    """
+    active = result != no_data_value
+    if aggregation == AGGREGATE_DURATION:
+        if previous is None:
+            previous = np.where(values == no_data_value, no_data_value, 0)
+            previous = previous.astype(result.dtype)
+        above = active & (result > threshold) & (previous != no_data_value)
+        previous[above] += duration
+        return previous
+
+    if previous is None:
+        return result.copy()
+    if aggregation == AGGREGATE_MAXIMUM:
+        update = active & ((previous == no_data_value) | (result > previous))
+    elif aggregation == AGGREGATE_MINIMUM:
+        update = active & ((previous == no_data_value) | (result < previous))
+    else:
+        raise ValueError("Unknown aggregation: '%s'" % aggregation)
+    return np.where(update, result, previous)
+
+
+class AggregateConverter(GeoTIFFConverter):
+    """Converter combining the results of all calculation steps in one band
+
+    The running aggregate is kept in an uncompressed scratch GeoTIFF next to
+    the target: per step, every block is calculated, combined with the block
+    of the scratch GeoTIFF and written back. So only one block is in memory,
+    whatever the number of steps, and the calculator of a step is only used
+    for one pass over the raster. Blocks of a compressed GeoTIFF can't be
+    rewritten in place (every write appends a block), so the target is only
+    compressed once, when the converter is closed.
+    """
+
+    def __init__(self, source_path, target_path, aggregation, threshold=0.0, **kwargs):
+        kwargs["band_count"] = 1
+        super().__init__(source_path, target_path, **kwargs)
+        self.aggregation = aggregation
+        self.threshold = threshold
+        self.scratch_path = None
+
+    def creation_options(self, compress):
+        """Return the GeoTIFF creation options, the same as GeoTIFFConverter's"""
+        block_x_size, block_y_size = self.block_size
+        options = ["blockysize=%s" % block_y_size]
+        if compress:
+            options.append("compress=deflate")
+        if block_x_size != self.raster_x_size:
+            options += ["tiled=yes", "blockxsize=%s" % block_x_size]
+        return options
+
+    def __enter__(self):
+        self.source = gdal.Open(self.source_path, gdal.GA_ReadOnly)
+        fd, self.scratch_path = tempfile.mkstemp(
+            suffix=".tif", dir=os.path.dirname(os.path.abspath(self.target_path))
+        )
+        os.close(fd)
+        self.target = gdal.GetDriverByName("gtiff").Create(
+            self.scratch_path,
+            self.raster_x_size,
+            self.raster_y_size,
+            self.band_count,
+            self.source.GetRasterBand(1).DataType,
+            options=self.creation_options(compress=False),
+        )
+        self.target.SetProjection(self.projection)
+        self.target.SetGeoTransform(self.geo_transform)
+        self.target.GetRasterBand(1).SetNoDataValue(self.no_data_value)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                # the returned dataset isn't kept, so it is closed (written)
+                # right away
+                gdal.Translate(
+                    self.target_path,
+                    self.target,
+                    creationOptions=self.creation_options(compress=True),
+                )
+        finally:
+            super().__exit__(exc_type, exc_value, traceback)
+            os.remove(self.scratch_path)
+            self.scratch_path = None
+
+    def aggregate_using(self, calculator, first, duration=0.0):
+        """Combine the results of the calculator with the aggregate so far
+
+        :param first: whether this is the first calculation step
+        :param duration: duration (s) of the calculation step
+        """
+        no_data_value = self.no_data_value
+        band = self.target.GetRasterBand(1)
+        for (xoff, xsize), (yoff, ysize) in self.partition():
+            values = self.source.ReadAsArray(
+                xoff=xoff, yoff=yoff, xsize=xsize, ysize=ysize
+            )
+            indices = (yoff, xoff), (yoff + ysize, xoff + xsize)
+            result = calculator(
+                indices=indices, values=values, no_data_value=no_data_value
+            )
+            previous = None
+            if not first:
+                previous = band.ReadAsArray(
+                    xoff=xoff, yoff=yoff, win_xsize=xsize, win_ysize=ysize
+                )
+            aggregate = aggregate_block(
+                self.aggregation,
+                previous,
+                result,
+                values,
+                no_data_value,
+                duration=duration,
+                threshold=self.threshold,
+            )
+            band.WriteArray(array=aggregate, xoff=xoff, yoff=yoff)
+
+
+def calculate_waterdepth_aggregate(
+    gridadmin_path,
+    results_3di_path,
+    dem_path,
+    waterdepth_path,
+    calculation_steps,
+    mode,
+    aggregation,
+    threshold=0.0,
+    window=None,
+    progress_func=None,
+):
+    """Calculate the maximum, minimum or duration above a threshold of all steps
+
+    The steps are calculated one after another, block by block, and combined
+    into a single band GeoTIFF (see ``AggregateConverter``), so no raster per
+    step is written.
+
+    :param aggregation: one of the ``AGGREGATE_*`` constants
+    :param threshold: water depth or level for ``AGGREGATE_DURATION``
+    :param window: optional (xoff, yoff, xsize, ysize) pixel window of the dem
+    """
+    try:
+        CalculatorClass = calculator_classes[mode]
+    except KeyError:
+        raise ValueError("Unknown mode: '%s'" % mode)
+    fix_gridadmin(gridadmin_path)
+
+    dataset = gdal.Open(dem_path, gdal.GA_ReadOnly)
+    dem_shape = dataset.RasterYSize, dataset.RasterXSize
+    dem_geo_transform = dataset.GetGeoTransform()
+    dataset = None
+
+    durations = step_durations(results_3di_path, calculation_steps)
+    progress_class = ProgressClass(
+        calculation_steps=calculation_steps, progress_func=progress_func
+    )
+    output_dir = os.path.dirname(os.path.abspath(waterdepth_path))
+    with tempfile.TemporaryDirectory(dir=output_dir) as tmp_dir:
+        source_path = dem_path
+        if window is not None:
+            source_path = cropped_dem(
+                dem_path, window, os.path.join(tmp_dir, "dem.vrt")
+            )
+        converter = AggregateConverter(
+            source_path,
+            waterdepth_path,
+            aggregation,
+            threshold=threshold,
+            progress_func=None if progress_func is None else progress_class,
+        )
+        with converter:
+            for band, calculation_step in progress_class:
+                calculator = CalculatorClass(
+                    gridadmin_path=gridadmin_path,
+                    results_3di_path=results_3di_path,
+                    calculation_step=calculation_step,
+                    dem_shape=dem_shape,
+                    dem_geo_transform=dem_geo_transform,
+                )
+                with calculator:
+                    converter.aggregate_using(
+                        calculator
+                        if window is None
+                        else WindowCalculator(calculator, window),
+                        first=band == 0,
+                        duration=durations[band],
+                    )
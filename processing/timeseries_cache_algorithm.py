@@ -0,0 +1,80 @@
+from qgis.core import QgsProcessingAlgorithm
+from qgis.core import QgsProcessingException
+from qgis.core import QgsProcessingParameterFile
+from qgis.core import QgsProcessingParameterString
+from qgis.PyQt.QtCore import QCoreApplication
+from ThreeDiToolbox.datasource.threedi_results import ThreediResult
+
+
+class TimeseriesCacheAlgorithm(QgsProcessingAlgorithm):
+    """Write result variables node-major to a sidecar file
+
+    The graph tool and the sideview read per-object time series from it.
+    """
+
+    INPUT = "INPUT"
+    VARIABLES = "VARIABLES"
+
+    def initAlgorithm(self, config):
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.INPUT,
+                self.tr("3Di simulation output (.nc)"),
+                extension="nc",
+            )
+        )
+
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.VARIABLES,
+                self.tr("Variables, comma separated"),
+                "s1,q,u1",
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        results_3di_path = self.parameterAsFile(parameters, self.INPUT, context)
+        variables_text = self.parameterAsString(parameters, self.VARIABLES, context)
+        variables = [v.strip() for v in variables_text.split(",") if v.strip()]
+
+        threedi_result = ThreediResult(file_path=results_3di_path)
+        for variable in variables:
+            if variable not in threedi_result.available_vars:
+                raise QgsProcessingException(
+                    self.tr("Unknown variable: {}").format(variable)
+                )
+
+        def progress_func(fraction):
+            feedback.setProgress(100 * fraction)
+            return feedback.isCanceled()
+
+        written = threedi_result.build_timeseries_cache(variables, progress_func)
+        for variable in written:
+            feedback.pushInfo(self.tr("Cached {}").format(variable))
+        return {}
+
+    def name(self):
+        return "TimeseriesCache"
+
+    def displayName(self):
+        return self.tr("Time series cache")
+
+    def group(self):
+        return self.tr("Post-process results")
+
+    def groupId(self):
+        return "postprocessing"
+
+    def shortHelpString(self):
+        help_string = """
+        Write result variables per object to a sidecar file next to the 3Di simulation output ('<name>.timeseries.h5'). The graph tool and the sideview read the time series of single nodes and lines from it, which is much faster for large results. \n
+        3Di simulation output: the results_3di.nc; variables of the aggregate_results_3di.nc next to it can be cached as well. \n
+        Variables: e.g. 's1,q,u1' or 'q_cum'. Variables that are already cached are skipped; the cache is ignored when the simulation output changes.
+        """
+        return self.tr(help_string)
+
+    def tr(self, string):
+        return QCoreApplication.translate("Processing", string)
+
+    def createInstance(self):
+        return TimeseriesCacheAlgorithm()
@@ -0,0 +1,28 @@
+"""Worker processes for the processing algorithms
+
+Note: the jobs submitted to these pools are pickled and run in a fresh python
+process, so they should live in modules that do not import qgis. The workers
+import the ThreeDiToolbox package, which skips the dependency check outside
+Qgis' main process.
+"""
+from ThreeDiToolbox import dependencies
+
+import concurrent.futures
+import logging
+import multiprocessing
+
+
+logger = logging.getLogger(__name__)
+
+
+def process_pool(max_workers):
+    """Return a process pool executor that also works from within Qgis"""
+    context = multiprocessing.get_context("spawn")
+    try:
+        # Under Windows/Mac sys.executable is the Qgis start-up script
+        context.set_executable(dependencies._get_python_interpreter())
+    except EnvironmentError:
+        logger.exception("Cannot determine the python interpreter, using the default")
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=context
+    )
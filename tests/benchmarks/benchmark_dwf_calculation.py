@@ -0,0 +1,42 @@
+from ThreeDiToolbox.processing.dwf_calculation import DWF_FACTORS
+from ThreeDiToolbox.processing.dwf_calculation import read_dwf_per_node
+from ThreeDiToolbox.processing.dwf_calculation import write_dwf_laterals_batch
+from ThreeDiToolbox.processing.dwf_calculation import write_dwf_laterals_csv
+
+import pytest
+
+
+def test_read_dwf_per_node(benchmark, synthetic_spatialite_path):
+    dwf_per_node = benchmark(read_dwf_per_node, synthetic_spatialite_path)
+    assert dwf_per_node
+
+
+@pytest.mark.parametrize("duration", [24 * 3600, 7 * 24 * 3600])
+def test_write_dwf_laterals_csv(
+    benchmark, tmp_path, synthetic_spatialite_path, duration
+):
+    output_csv_file = str(tmp_path / "dwf.csv")
+    benchmark(
+        write_dwf_laterals_csv,
+        synthetic_spatialite_path,
+        "00:00:00",
+        duration,
+        DWF_FACTORS,
+        output_csv_file,
+    )
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_write_dwf_laterals_batch(
+    benchmark, tmp_path, synthetic_spatialite_path, max_workers
+):
+    scenarios = [("00:00:00", 24 * 3600), ("06:00:00", 24 * 3600), ("12:00:00", 3600)]
+    written = benchmark(
+        write_dwf_laterals_batch,
+        [synthetic_spatialite_path],
+        scenarios,
+        DWF_FACTORS,
+        str(tmp_path),
+        max_workers=max_workers,
+    )
+    assert len(written) == len(scenarios)
@@ -0,0 +1,27 @@
+from ThreeDiToolbox.utils.layer_from_netCDF import get_or_create_cell_layer
+from ThreeDiToolbox.utils.layer_from_netCDF import get_or_create_flowline_layer
+from ThreeDiToolbox.utils.layer_from_netCDF import get_or_create_node_layer
+from ThreeDiToolbox.utils.layer_from_netCDF import get_or_create_pumpline_layer
+
+import itertools
+import pytest
+
+
+@pytest.mark.parametrize(
+    "get_or_create_layer",
+    [
+        get_or_create_flowline_layer,
+        get_or_create_node_layer,
+        get_or_create_cell_layer,
+        get_or_create_pumpline_layer,
+    ],
+)
+def test_export_layer(benchmark, tmp_path, synthetic_result, get_or_create_layer):
+    """Export the gridadmin to a new gridadmin.sqlite, with the OGR exporters"""
+    counter = itertools.count()
+
+    def new_output_path():
+        path = str(tmp_path / "gridadmin_{}.sqlite".format(next(counter)))
+        return (synthetic_result, path), {}
+
+    benchmark.pedantic(get_or_create_layer, setup=new_output_path, rounds=3)
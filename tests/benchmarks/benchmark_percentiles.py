@@ -0,0 +1,39 @@
+from ThreeDiToolbox.tool_animation.map_animator import threedi_result_percentiles
+from ThreeDiToolbox.utils.styler import ANIMATION_LAYERS_NR_LEGEND_CLASSES
+
+import pytest
+
+
+# the class bounds of the animation legend, see MapAnimator
+PERCENTILES = list(range(0, 100, int(100 / ANIMATION_LAYERS_NR_LEGEND_CLASSES))) + [100]
+
+
+@pytest.mark.parametrize("groundwater", [False, True])
+@pytest.mark.parametrize(
+    "variable, absolute, lower_threshold, relative_to_t0",
+    [
+        ("s1", False, float("-Inf"), False),
+        ("s1", False, float("-Inf"), True),
+        ("q", True, 0.0, False),
+    ],
+)
+def test_threedi_result_percentiles(
+    benchmark,
+    synthetic_result,
+    groundwater,
+    variable,
+    absolute,
+    lower_threshold,
+    relative_to_t0,
+):
+    result = benchmark(
+        threedi_result_percentiles,
+        gr=synthetic_result.result_admin,
+        groundwater=groundwater,
+        variable=variable,
+        percentile=PERCENTILES,
+        absolute=absolute,
+        lower_threshold=lower_threshold,
+        relative_to_t0=relative_to_t0,
+    )
+    assert len(result) == len(PERCENTILES)
@@ -0,0 +1,19 @@
+"""Start of QGIS with the plugin: importing the plugin in a fresh interpreter"""
+import os
+import subprocess
+import sys
+
+
+def import_in_new_interpreter(module_name):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    subprocess.run([sys.executable, "-c", "import " + module_name], env=env, check=True)
+
+
+def test_import_plugin(benchmark):
+    """Import the plugin, like QGIS does in ``classFactory()``
+
+    The tools are not imported yet, see ``utils/lazy_tool.py``.
+    """
+    benchmark.pedantic(
+        import_in_new_interpreter, args=("ThreeDiToolbox.threedi_plugin",), rounds=5
+    )
@@ -0,0 +1,106 @@
+from ThreeDiToolbox.datasource import result_array_cache
+from ThreeDiToolbox.datasource import result_timeseries_cache
+from ThreeDiToolbox.datasource.threedi_results import ThreediResult
+
+import numpy as np
+import os
+import pytest
+
+
+@pytest.fixture()
+def timeseries_cache(synthetic_result):
+    """Fixture: the synthetic result with s1 in the time series cache"""
+    assert synthetic_result.build_timeseries_cache(["s1"]) == ["s1"]
+    yield synthetic_result
+    os.remove(result_timeseries_cache.timeseries_cache_path(synthetic_result.file_path))
+
+
+def test_read_variable_from_netcdf(benchmark, synthetic_results_3di_path):
+    """Decode a complete variable from the netcdf (nothing cached)"""
+
+    def read():
+        ThreediResult(synthetic_results_3di_path).get_values_by_timestep_nr("s1", 0)
+
+    benchmark.pedantic(read, setup=result_array_cache.clear_array_cache, rounds=5)
+
+
+def test_read_variable_from_disk_cache(benchmark, synthetic_results_3di_path):
+    """Load a complete variable from the disk cache of a previous session"""
+    ThreediResult(synthetic_results_3di_path).get_values_by_timestep_nr("s1", 0)
+
+    def read():
+        ThreediResult(synthetic_results_3di_path).get_values_by_timestep_nr("s1", 0)
+
+    benchmark(read)
+
+
+def test_values_by_timestep_in_memory(benchmark, synthetic_result):
+    """Read every timestep of some nodes, the way the water balance does"""
+    node_ids = np.arange(1, synthetic_result.gridadmin.nodes.count, 7)
+    n_timesteps = len(synthetic_result.get_timestamps("vol_current"))
+    synthetic_result.get_values_by_timestep_nr("vol_current", 0, node_ids)
+
+    def read():
+        for timestep in range(n_timesteps):
+            synthetic_result.get_values_by_timestep_nr(
+                "vol_current", timestep, node_ids
+            )
+
+    benchmark(read)
+
+
+def test_values_by_timestep_without_cache(benchmark, synthetic_result):
+    """Read a few timesteps without decoding (and caching) the whole variable"""
+    n_timesteps = len(synthetic_result.timestamps)
+    timestamp_idx = np.array([0, n_timesteps // 2, n_timesteps - 1])
+    benchmark(
+        synthetic_result.get_values_by_timestep_nr, "q", timestamp_idx, use_cache=False
+    )
+
+
+def test_statistics_loop(benchmark, synthetic_result):
+    """Read every timestep once, the way the statistics tool does for the
+    flowlines: q, u1 and s1 of the start and end nodes per timestep"""
+    lines = synthetic_result.gridadmin.lines
+    start_idx, end_idx = lines.line_nodes[1:].T
+
+    def read():
+        values = zip(
+            synthetic_result.timestamps,
+            synthetic_result.iter_values_by_timestep("q"),
+            synthetic_result.iter_values_by_timestep("u1"),
+            synthetic_result.iter_values_by_timestep("s1", node_ids=start_idx),
+            synthetic_result.iter_values_by_timestep("s1", node_ids=end_idx),
+        )
+        for timestamp, q, v, h_start, h_end in values:
+            np.maximum(q, v)
+            np.absolute(h_start - h_end)
+
+    benchmark.pedantic(read, rounds=3)
+
+
+def test_timeseries_of_one_node(benchmark, synthetic_result):
+    """The time series of a single node, as read by the graph tool"""
+    benchmark(synthetic_result.get_timeseries, "s1", node_id=1)
+
+
+def test_timeseries_of_one_node_from_timeseries_cache(benchmark, timeseries_cache):
+    benchmark(timeseries_cache.get_timeseries, "s1", node_id=1)
+
+
+def test_build_timeseries_cache(benchmark, synthetic_result):
+    cache_path = result_timeseries_cache.timeseries_cache_path(
+        synthetic_result.file_path
+    )
+
+    def remove_cache():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+    benchmark.pedantic(
+        synthetic_result.build_timeseries_cache,
+        args=(["q"],),
+        setup=remove_cache,
+        rounds=3,
+    )
+    remove_cache()
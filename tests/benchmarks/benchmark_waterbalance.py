@@ -0,0 +1,103 @@
+from ThreeDiToolbox.tests.synthetic_results import KCU_1D
+from ThreeDiToolbox.tests.synthetic_results import KCU_1D2D
+from ThreeDiToolbox.tests.synthetic_results import KCU_2D
+from ThreeDiToolbox.tests.synthetic_results import KCU_2D_GROUNDWATER
+from ThreeDiToolbox.tests.synthetic_results import KCU_2D_VERTICAL
+from ThreeDiToolbox.tests.utilities import ensure_qgis_app_is_initialized
+from ThreeDiToolbox.tool_water_balance.tools.waterbalance import WaterBalanceCalculation
+
+import numpy as np
+import pytest
+
+
+def left_half_selection(model):
+    """Return the (link_ids, pump_ids, node_ids) of the left half of the model
+
+    The same dictionaries as ``WaterBalanceCalculation`` derives from a
+    polygon (see ``get_incoming_and_outcoming_link_ids()`` and
+    ``get_nodes()``), for a polygon around the left half of the 2D cells.
+    """
+    ids_2d, ids_groundwater, ids_1d = model.node_ids()
+    left = np.arange(model.n2dtot) % model.nx < model.nx // 2
+    inside_1d = left[model.nodes_1d_cells()]
+    inside = set(ids_2d[left]) | set(ids_1d[inside_1d])
+    if model.groundwater:
+        inside |= set(ids_groundwater[left])
+
+    link_ids = {
+        "1d_in": [],
+        "1d_out": [],
+        "1d_bound_in": [],
+        "1d_bound_out": [],
+        "2d_in": [],
+        "2d_out": [],
+        "2d_bound_in": [],
+        "2d_bound_out": [],
+        "1d__1d_2d_flow": [],
+        "2d__1d_2d_flow": [],
+        "1d_2d_exch": [],
+        "2d_groundwater_in": [],
+        "2d_groundwater_out": [],
+        "2d_vertical_infiltration": [],
+    }
+    categories = {KCU_1D: "1d", KCU_2D: "2d", KCU_2D_GROUNDWATER: "2d_groundwater"}
+    kcu_2d, node_a_2d, node_b_2d = model.lines_2d()
+    kcu_1d, node_a_1d, node_b_1d = model.lines_1d()
+    kcu = np.hstack([kcu_2d, kcu_1d])
+    node_a = np.hstack([node_a_2d, node_a_1d])
+    node_b = np.hstack([node_b_2d, node_b_1d])
+    for line_id, line_kcu, a, b in zip(range(1, len(kcu) + 1), kcu, node_a, node_b):
+        a_inside = a in inside
+        b_inside = b in inside
+        if line_kcu == KCU_2D_VERTICAL:
+            if a_inside:
+                link_ids["2d_vertical_infiltration"].append(line_id)
+        elif line_kcu == KCU_1D2D:
+            # node a is the 2D node, node b the 1D node
+            if a_inside and b_inside:
+                link_ids["1d_2d_exch"].append(line_id)
+            elif b_inside:
+                link_ids["1d__1d_2d_flow"].append(line_id)
+            elif a_inside:
+                link_ids["2d__1d_2d_flow"].append(line_id)
+        elif b_inside and not a_inside:
+            link_ids[categories[line_kcu] + "_in"].append(line_id)
+        elif a_inside and not b_inside:
+            link_ids[categories[line_kcu] + "_out"].append(line_id)
+
+    pump_ids = {"in": [], "out": []}
+    for pump_id in range(1, model.pumps + 1):
+        # pump i pumps from 1D node i to 1D node i + 1
+        node1_inside = ids_1d[pump_id - 1] in inside
+        node2_inside = ids_1d[pump_id] in inside
+        if node2_inside and not node1_inside:
+            pump_ids["in"].append(pump_id)
+        elif node1_inside and not node2_inside:
+            pump_ids["out"].append(pump_id)
+
+    node_ids = {
+        "1d": ids_1d[inside_1d].tolist(),
+        "2d": ids_2d[left].tolist(),
+        "2d_groundwater": ids_groundwater[left].tolist() if model.groundwater else [],
+    }
+    return link_ids, pump_ids, node_ids
+
+
+@pytest.fixture()
+def wb_calculation(synthetic_ts_datasources):
+    ensure_qgis_app_is_initialized()
+    return WaterBalanceCalculation(synthetic_ts_datasources)
+
+
+def test_get_aggregated_flows(benchmark, wb_calculation, synthetic_model):
+    """The water balance of the left half of the model
+
+    The first call reads the variables from the netcdf, the benchmark measures
+    the calculation on the cached variables (e.g. a changed polygon).
+    """
+    link_ids, pump_ids, node_ids = left_half_selection(synthetic_model)
+    ts, total_time = wb_calculation.get_aggregated_flows(
+        link_ids, pump_ids, node_ids, None
+    )
+    assert total_time.shape[0] == len(ts)
+    benchmark(wb_calculation.get_aggregated_flows, link_ids, pump_ids, node_ids, None)
@@ -0,0 +1,107 @@
+"""Fixtures for the benchmarks: synthetic results of a configurable size
+
+The benchmarks are named ``benchmark_*.py``, so a normal test run doesn't
+collect them. Run them with ``make benchmark``, which stores every run in
+``.benchmarks/`` and compares it with the previous one.
+
+The size of the synthetic model is set with the ``THREEDI_BENCHMARK_SIZE``
+environment variable, one of the ``SIZES`` below ('small' by default). The
+files are written once per session with a fixed seed, so runs of the same size
+are comparable.
+"""
+from ThreeDiToolbox.datasource import result_array_cache
+from ThreeDiToolbox.tests.synthetic_results import SyntheticModel
+from ThreeDiToolbox.tests.synthetic_results import write_impervious_surfaces
+from ThreeDiToolbox.tests.synthetic_results import write_synthetic_results
+
+import os
+import pytest
+
+
+SIZES = {
+    "small": dict(nx=50, ny=50, nodes_1d=200, timesteps=50, groundwater=True, pumps=10),
+    "medium": dict(
+        nx=150, ny=150, nodes_1d=2000, timesteps=150, groundwater=True, pumps=50
+    ),
+    "large": dict(
+        nx=300, ny=300, nodes_1d=10000, timesteps=300, groundwater=True, pumps=200
+    ),
+}
+
+
+def benchmark_size():
+    size = os.environ.get("THREEDI_BENCHMARK_SIZE", "small")
+    if size not in SIZES:
+        raise ValueError(
+            "Unknown THREEDI_BENCHMARK_SIZE {}, use one of {}".format(
+                size, ", ".join(SIZES)
+            )
+        )
+    return size
+
+
+@pytest.fixture(scope="session")
+def synthetic_model():
+    """Fixture: the SyntheticModel (layout) of the synthetic results"""
+    size = dict(SIZES[benchmark_size()])
+    del size["timesteps"]
+    return SyntheticModel(**size)
+
+
+@pytest.fixture(scope="session")
+def synthetic_results_3di_path(tmp_path_factory):
+    """Fixture: path of the synthetic results_3di.nc
+
+    The gridadmin.h5 and aggregate_results_3di.nc are next to it.
+    """
+    directory = tmp_path_factory.mktemp("synthetic_" + benchmark_size())
+    return write_synthetic_results(directory, **SIZES[benchmark_size()])
+
+
+@pytest.fixture(scope="session")
+def synthetic_spatialite_path(tmp_path_factory, synthetic_model):
+    """Fixture: path of a (plain sqlite) schematisation for the DWF calculation"""
+    path = tmp_path_factory.mktemp("synthetic_dwf") / "model.sqlite"
+    write_impervious_surfaces(path, synthetic_model)
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def array_cache(tmp_path):
+    """Fixture: an empty disk cache of result arrays for every benchmark
+
+    Benchmarks of cached reads warm the cache themselves.
+    """
+    old_settings = dict(result_array_cache._settings)
+    result_array_cache.configure(directory=tmp_path / "array_cache")
+    yield
+    result_array_cache._settings.update(old_settings)
+
+
+@pytest.fixture()
+def synthetic_result(synthetic_results_3di_path):
+    """Fixture: a new ThreediResult of the synthetic results"""
+    # Late import, otherwise we get circular import errors.
+    from ThreeDiToolbox.datasource.threedi_results import ThreediResult
+
+    return ThreediResult(file_path=synthetic_results_3di_path)
+
+
+@pytest.fixture()
+def synthetic_ts_datasources(synthetic_results_3di_path):
+    """Fixture: ts_datasources with the synthetic result (see main conftest.py)"""
+    # Late import, otherwise we get circular import errors.
+    from ThreeDiToolbox.tool_result_selection.models import TimeseriesDatasourceModel
+
+    result = TimeseriesDatasourceModel()
+    result.insertRows(
+        [
+            {
+                "active": False,
+                "name": "synthetic results",
+                "file_path": synthetic_results_3di_path,
+                "type": "netcdf-groundwater",
+            }
+        ]
+    )
+    return result
@@ -0,0 +1,638 @@
+"""Synthetic 3Di results of configurable size, for benchmarks
+
+``write_synthetic_results()`` writes a gridadmin.h5, a results_3di.nc and an
+aggregate_results_3di.nc that threedigrid (and thus ``ThreediResult``) can
+read, without running a simulation. The values are random, but the layout
+follows the threedicore output:
+
+- nodes: 2D surface cells (a regular grid of nx * ny cells), optionally the
+  same cells again as groundwater nodes, then the 1D connection nodes (a
+  diagonal through the grid);
+- lines: 2D lines in x direction, 2D lines in y direction, optionally the
+  vertical (surface-groundwater) lines and the groundwater lines, then the 1D
+  lines between the consecutive 1D nodes and a 1D2D line per 1D node;
+- pumps: between consecutive 1D nodes.
+
+Every array has a 'trash' element at index 0, like the real files.
+
+Note: this module does not import qgis.
+"""
+import h5py
+import numpy as np
+import os
+import sqlite3
+
+
+EPSG_CODE = "28992"
+ORIGIN = (100000.0, 400000.0)
+CELL_SIZE = 20.0
+#: DEM pixel size of the pixel_coords of the cells (4 x 4 pixels per cell).
+PIXEL_SIZE = CELL_SIZE / 4
+SIMULATION_START = "seconds since 2021-01-01 00:00:00"
+NO_DATA_VALUE = -9999.0
+
+NODE_2D = 1
+NODE_2D_GROUNDWATER = 2
+NODE_1D = 3
+
+KCU_1D = 1
+KCU_1D2D = 52
+KCU_2D = 100
+KCU_2D_VERTICAL = 150
+KCU_2D_GROUNDWATER = -150
+
+
+class SyntheticModel(object):
+    """Node and line layout of a synthetic model
+
+    :param nx: number of 2D cells in x direction
+    :param ny: number of 2D cells in y direction
+    :param nodes_1d: number of 1D connection nodes
+    :param groundwater: add a groundwater layer under the 2D cells
+    :param pumps: number of pumps (between 1D nodes)
+    """
+
+    def __init__(self, nx=10, ny=10, nodes_1d=0, groundwater=False, pumps=0):
+        if pumps and pumps >= nodes_1d:
+            raise ValueError("A pump needs two 1D nodes, add more 1D nodes")
+        self.nx = nx
+        self.ny = ny
+        self.nodes_1d = nodes_1d
+        self.groundwater = groundwater
+        self.pumps = pumps
+
+        self.n2dtot = nx * ny
+        self.ngrtot = self.n2dtot if groundwater else 0
+        self.liutot = (nx - 1) * ny
+        self.livtot = nx * (ny - 1)
+        self.l2dtot = self.liutot + self.livtot
+        self.lvertot = self.n2dtot if groundwater else 0
+        self.lgrtot = self.l2dtot + self.lvertot
+        self.lgutot = self.l2dtot if groundwater else 0
+        self.l1dtot = max(nodes_1d - 1, 0)
+        self.l1d2dtot = nodes_1d
+
+    @property
+    def nodes_2d_all(self):
+        """Number of nodes in the Mesh2D variables (surface + groundwater)"""
+        return self.n2dtot + self.ngrtot
+
+    @property
+    def node_count(self):
+        return self.nodes_2d_all + self.nodes_1d
+
+    @property
+    def lines_2d_all(self):
+        """Number of lines in the Mesh2D variables"""
+        return self.lgrtot + self.lgutot
+
+    @property
+    def lines_1d_all(self):
+        """Number of lines in the Mesh1D variables (1D and 1D2D)"""
+        return self.l1dtot + self.l1d2dtot
+
+    @property
+    def line_count(self):
+        return self.lines_2d_all + self.lines_1d_all
+
+    def meta(self):
+        return {
+            "n2dtot": self.n2dtot,
+            "ngrtot": self.ngrtot,
+            "n1dtot": self.nodes_1d,
+            "n2dobc": 0,
+            "ngr2bd": 0,
+            "n1dobc": 0,
+            "liutot": self.liutot,
+            "livtot": self.livtot,
+            "l2dtot": self.l2dtot,
+            "lgrtot": self.lgrtot,
+            "lgutot": self.lgutot,
+            "l1dtot": self.l1dtot,
+            "l1d2dtot": self.l1d2dtot,
+            "nodall": self.node_count,
+            "lintot": self.line_count,
+        }
+
+    def cell_index(self, i, j):
+        """Zero based index of the 2D cell in column i, row j"""
+        return j * self.nx + i
+
+    def cell_coords(self):
+        """Return (xmin, ymin, xmax, ymax) of the 2D cells, shape (4, n2dtot)"""
+        i, j = np.meshgrid(np.arange(self.nx), np.arange(self.ny))
+        xmin = ORIGIN[0] + i.ravel() * CELL_SIZE
+        ymin = ORIGIN[1] + j.ravel() * CELL_SIZE
+        return np.vstack([xmin, ymin, xmin + CELL_SIZE, ymin + CELL_SIZE])
+
+    def nodes_1d_cells(self):
+        """Zero based index of the 2D cell of every 1D node"""
+        if self.nodes_1d == 0:
+            return np.array([], dtype=int)
+        steps = np.linspace(0, 1, self.nodes_1d, endpoint=False)
+        i = (steps * self.nx).astype(int)
+        j = (steps * self.ny).astype(int)
+        return self.cell_index(i, j)
+
+    def node_ids(self):
+        """Return the ids of the 2D nodes, the groundwater nodes and the 1D nodes"""
+        ids = np.arange(1, self.node_count + 1)
+        return (
+            ids[: self.n2dtot],
+            ids[self.n2dtot : self.nodes_2d_all],
+            ids[self.nodes_2d_all :],
+        )
+
+    def lines_2d(self):
+        """Return (kcu, node a, node b) of the 2D lines, in line id order"""
+        ids_2d, ids_groundwater, _ = self.node_ids()
+        grid = ids_2d.reshape(self.ny, self.nx)
+        x_lines = (grid[:, :-1].ravel(), grid[:, 1:].ravel())
+        y_lines = (grid[:-1, :].ravel(), grid[1:, :].ravel())
+        kcu = [np.full(self.liutot + self.livtot, KCU_2D)]
+        node_a = [x_lines[0], y_lines[0]]
+        node_b = [x_lines[1], y_lines[1]]
+        if self.groundwater:
+            offset = self.n2dtot
+            kcu.append(np.full(self.lvertot, KCU_2D_VERTICAL))
+            node_a.append(ids_2d)
+            node_b.append(ids_groundwater)
+            kcu.append(np.full(self.lgutot, KCU_2D_GROUNDWATER))
+            node_a.extend([x_lines[0] + offset, y_lines[0] + offset])
+            node_b.extend([x_lines[1] + offset, y_lines[1] + offset])
+        return np.hstack(kcu), np.hstack(node_a), np.hstack(node_b)
+
+    def lines_1d(self):
+        """Return (kcu, node a, node b) of the 1D and 1D2D lines"""
+        ids_2d, _, ids_1d = self.node_ids()
+        kcu = np.hstack(
+            [np.full(self.l1dtot, KCU_1D), np.full(self.l1d2dtot, KCU_1D2D)]
+        )
+        node_a = np.hstack([ids_1d[:-1], ids_2d[self.nodes_1d_cells()]])
+        node_b = np.hstack([ids_1d[1:], ids_1d])
+        return kcu, node_a.astype(int), node_b.astype(int)
+
+
+def _with_trash(values, fill=0):
+    """Prepend the trash element to the last axis of values"""
+    values = np.asarray(values)
+    trash = np.full(values.shape[:-1] + (1,), fill, dtype=values.dtype)
+    return np.concatenate([trash, values], axis=-1)
+
+
+def write_gridadmin(path, model):
+    """Write the gridadmin.h5 of a SyntheticModel"""
+    ids_2d, ids_groundwater, ids_1d = model.node_ids()
+    cell_coords = model.cell_coords()
+    centers = np.vstack(
+        [
+            (cell_coords[0] + cell_coords[2]) / 2,
+            (cell_coords[1] + cell_coords[3]) / 2,
+        ]
+    )
+    # 1D nodes lie in the lower left quarter of their cell
+    coords_1d = cell_coords[:2, model.nodes_1d_cells()] + CELL_SIZE / 4
+    no_cell = np.full((4, model.nodes_1d), NO_DATA_VALUE)
+
+    node_type = np.hstack(
+        [
+            np.full(model.n2dtot, NODE_2D),
+            np.full(model.ngrtot, NODE_2D_GROUNDWATER),
+            np.full(model.nodes_1d, NODE_1D),
+        ]
+    )
+    groundwater_cells = cell_coords if model.groundwater else np.empty((4, 0))
+    groundwater_centers = centers if model.groundwater else np.empty((2, 0))
+    coordinates = np.hstack([centers, groundwater_centers, coords_1d])
+    z_coordinate = np.hstack(
+        [
+            np.linspace(-1.0, 1.0, model.n2dtot),
+            np.linspace(-11.0, -9.0, model.ngrtot),
+            np.full(model.nodes_1d, -2.0),
+        ]
+    )
+
+    kcu_2d, node_a_2d, node_b_2d = model.lines_2d()
+    kcu_1d, node_a_1d, node_b_1d = model.lines_1d()
+    kcu = np.hstack([kcu_2d, kcu_1d])
+    line = np.vstack(
+        [np.hstack([node_a_2d, node_a_1d]), np.hstack([node_b_2d, node_b_1d])]
+    )
+    # trash element of coordinates is at index 0, node ids are 1 based
+    all_coordinates = _with_trash(coordinates, fill=NO_DATA_VALUE)
+    line_coords = np.vstack([all_coordinates[:, line[0]], all_coordinates[:, line[1]]])
+    content_type = np.array(
+        [b""] * len(kcu_2d) + [b"v2_pipe"] * model.l1dtot + [b""] * model.l1d2dtot
+    )
+    content_pk = np.hstack(
+        [
+            np.zeros(len(kcu_2d), dtype=int),
+            np.arange(1, model.l1dtot + 1),
+            np.zeros(model.l1d2dtot, dtype=int),
+        ]
+    )
+
+    with h5py.File(path, "w") as gridadmin:
+        gridadmin.attrs["epsg_code"] = EPSG_CODE
+        gridadmin.attrs["model_name"] = "synthetic"
+        gridadmin.attrs["model_slug"] = "synthetic-{}x{}".format(model.nx, model.ny)
+        gridadmin.attrs["revision_hash"] = "0" * 40
+        gridadmin.attrs["revision_nr"] = 1
+        gridadmin.attrs["threedicore_version"] = "synthetic"
+        gridadmin.attrs["threedi_version"] = "synthetic"
+        gridadmin.attrs["has_1d"] = int(model.nodes_1d > 0)
+        gridadmin.attrs["has_2d"] = 1
+        gridadmin.attrs["has_groundwater"] = int(model.groundwater)
+        gridadmin.attrs["has_groundwater_flow"] = int(model.groundwater)
+        gridadmin.attrs["has_pumpstations"] = int(model.pumps > 0)
+        gridadmin.attrs["has_breaches"] = 0
+        gridadmin.attrs["has_interception"] = 0
+        gridadmin.attrs["has_simple_infiltration"] = 1
+        gridadmin.attrs["extent_2d"] = [
+            cell_coords[0].min(),
+            cell_coords[1].min(),
+            cell_coords[2].max(),
+            cell_coords[3].max(),
+        ]
+        if model.nodes_1d:
+            gridadmin.attrs["extent_1d"] = [
+                coords_1d[0].min(),
+                coords_1d[1].min(),
+                coords_1d[0].max(),
+                coords_1d[1].max(),
+            ]
+
+        meta = gridadmin.create_group("meta")
+        for key, value in model.meta().items():
+            meta.create_dataset(key, data=value)
+
+        nodes = gridadmin.create_group("nodes")
+        nodes.create_dataset("id", data=np.arange(model.node_count + 1))
+        nodes.create_dataset("node_type", data=_with_trash(node_type))
+        nodes.create_dataset("coordinates", data=all_coordinates)
+        nodes.create_dataset(
+            "cell_coords",
+            data=_with_trash(
+                np.hstack([cell_coords, groundwater_cells, no_cell]), fill=NO_DATA_VALUE
+            ),
+        )
+        # the cells in DEM pixels, counted from the lower left corner
+        pixel_coords = np.round(
+            (cell_coords - np.array([ORIGIN * 2]).T) / PIXEL_SIZE
+        ).astype(int)
+        groundwater_pixels = pixel_coords if model.groundwater else np.empty((4, 0))
+        nodes.create_dataset(
+            "pixel_coords",
+            data=_with_trash(
+                np.hstack([pixel_coords, groundwater_pixels, no_cell]).astype(int),
+                fill=int(NO_DATA_VALUE),
+            ),
+        )
+        nodes.create_dataset("z_coordinate", data=_with_trash(z_coordinate))
+        nodes.create_dataset(
+            "content_pk",
+            data=_with_trash(
+                np.hstack(
+                    [
+                        np.zeros(model.nodes_2d_all, dtype=int),
+                        np.arange(1, model.nodes_1d + 1),
+                    ]
+                )
+            ),
+        )
+        nodes.create_dataset(
+            "seq_id",
+            data=_with_trash(
+                np.hstack(
+                    [
+                        np.arange(1, model.n2dtot + 1),
+                        np.arange(1, model.ngrtot + 1),
+                        np.arange(1, model.nodes_1d + 1),
+                    ]
+                )
+            ),
+        )
+        nodes.create_dataset(
+            "zoom_category", data=_with_trash(np.full(model.node_count, 4))
+        )
+        nodes.create_dataset(
+            "is_manhole", data=_with_trash(np.zeros(model.node_count, dtype=int))
+        )
+        nodes.create_dataset(
+            "sumax", data=_with_trash(np.full(model.node_count, CELL_SIZE ** 2))
+        )
+        nodes.create_dataset(
+            "calculation_type",
+            data=_with_trash(np.full(model.node_count, -9999, dtype=int)),
+        )
+
+        lines = gridadmin.create_group("lines")
+        lines.create_dataset("id", data=np.arange(model.line_count + 1))
+        lines.create_dataset("kcu", data=_with_trash(kcu, fill=-9999))
+        lines.create_dataset("lik", data=_with_trash(np.zeros(len(kcu), dtype=int)))
+        lines.create_dataset("line", data=_with_trash(line))
+        lines.create_dataset(
+            "line_coords", data=_with_trash(line_coords, fill=NO_DATA_VALUE)
+        )
+        lines.create_dataset("content_pk", data=_with_trash(content_pk))
+        lines.create_dataset("content_type", data=_with_trash(content_type))
+        lines.create_dataset("zoom_category", data=_with_trash(np.full(len(kcu), 4)))
+
+        if model.pumps:
+            pumps = gridadmin.create_group("pumps")
+            node1_id = ids_1d[: model.pumps]
+            node2_id = ids_1d[1 : model.pumps + 1]
+            pumps.create_dataset("id", data=np.arange(model.pumps + 1))
+            pumps.create_dataset("content_pk", data=np.arange(model.pumps + 1))
+            pumps.create_dataset("node1_id", data=_with_trash(node1_id, fill=-9999))
+            pumps.create_dataset("node2_id", data=_with_trash(node2_id, fill=-9999))
+            pumps.create_dataset(
+                "capacity", data=_with_trash(np.full(model.pumps, 0.1))
+            )
+            pumps.create_dataset(
+                "start_level", data=_with_trash(np.full(model.pumps, -1.0))
+            )
+            pumps.create_dataset(
+                "lower_stop_level", data=_with_trash(np.full(model.pumps, -1.5))
+            )
+            pumps.create_dataset(
+                "bottom_level", data=_with_trash(np.full(model.pumps, -3.0))
+            )
+            pumps.create_dataset(
+                "coordinates",
+                data=_with_trash(all_coordinates[:, node1_id], fill=NO_DATA_VALUE),
+            )
+            pumps.create_dataset(
+                "node_coordinates",
+                data=_with_trash(
+                    np.vstack(
+                        [all_coordinates[:, node1_id], all_coordinates[:, node2_id]]
+                    ),
+                    fill=NO_DATA_VALUE,
+                ),
+            )
+            pumps.create_dataset(
+                "zoom_category", data=_with_trash(np.full(model.pumps, 4))
+            )
+
+
+# Number of timesteps generated and written at once, keeps memory use flat
+BLOCK_TIMESTEPS = 20
+
+# (name, low, high, has 1D values, units, long name) of the results_3di.nc
+NODE_VARIABLES = [
+    ("s1", -1.0, 2.0, True, "m", "waterlevel"),
+    ("vol", 0.0, 400.0, True, "m3", "volume"),
+    ("su", 0.0, 1.0, True, "", "wet surface"),
+    ("rain", 0.0, 1e-3, True, "m3/s", "rain intensity"),
+    ("q_lat", -1e-3, 1e-3, True, "m3/s", "lateral discharge"),
+    ("ucx", -1.0, 1.0, False, "m/s", "flow velocity in x direction"),
+    ("ucy", -1.0, 1.0, False, "m/s", "flow velocity in y direction"),
+    ("infiltration_rate_simple", 0.0, 1e-3, False, "m3/s", "infiltration rate"),
+]
+LINE_VARIABLES = [
+    ("q", -1.0, 1.0, True, "m3/s", "discharge"),
+    ("u1", -2.0, 2.0, True, "m/s", "flow velocity"),
+    ("au", 0.0, 10.0, True, "m2", "wet cross-sectional area"),
+]
+
+# (name, low, high, cumulative) of the aggregate_results_3di.nc. Cumulative
+# variables are the cumulative sum of values between low and high.
+AGGREGATE_NODE_VARIABLES = [
+    ("s1_max", -1.0, 2.0, False),
+    ("vol_current", 0.0, 400.0, False),
+    ("rain_cum", 0.0, 0.3, True),
+    ("q_lat_cum", -0.3, 0.3, True),
+    ("infiltration_rate_simple_cum", 0.0, 0.3, True),
+]
+AGGREGATE_GROUNDWATER_VARIABLES = [("leak_cum", -0.3, 0.3, True)]
+AGGREGATE_LINE_VARIABLES = [
+    ("q_cum_positive", 0.0, 300.0, True),
+    ("q_cum_negative", -300.0, 0.0, True),
+    ("u1_max", 0.0, 2.0, False),
+]
+AGGREGATE_PUMP_VARIABLES = [("q_pump_cum", 0.0, 30.0, True)]
+
+
+def _create_variable(netcdf, name, timesteps, count, units="", long_name=""):
+    """Create a (timesteps, objects) variable, one chunk per timestep"""
+    variable = netcdf.create_dataset(
+        name,
+        shape=(timesteps, count),
+        dtype=np.float64,
+        chunks=(1, count) if timesteps and count else None,
+        maxshape=(None, count),
+    )
+    variable.attrs["units"] = units
+    variable.attrs["long_name"] = long_name
+    variable.attrs["standard_name"] = long_name.replace(" ", "_")
+    return variable
+
+
+def _write_mesh_ids(netcdf, model):
+    ids_2d, ids_groundwater, ids_1d = model.node_ids()
+    netcdf.create_dataset("Mesh2DNode_id", data=np.hstack([ids_2d, ids_groundwater]))
+    netcdf.create_dataset("Mesh1DNode_id", data=ids_1d)
+    line_ids = np.arange(1, model.line_count + 1)
+    netcdf.create_dataset("Mesh2DLine_id", data=line_ids[: model.lines_2d_all])
+    netcdf.create_dataset("Mesh1DLine_id", data=line_ids[model.lines_2d_all :])
+    if model.pumps:
+        netcdf.create_dataset("Mesh1DPump_id", data=np.arange(1, model.pumps + 1))
+
+
+def _blocks(timesteps):
+    for start in range(0, timesteps, BLOCK_TIMESTEPS):
+        yield start, min(start + BLOCK_TIMESTEPS, timesteps)
+
+
+def write_results(path, model, timesteps, output_interval=300.0, seed=0):
+    """Write the results_3di.nc of a SyntheticModel"""
+    random = np.random.RandomState(seed)
+    with h5py.File(path, "w") as netcdf:
+        netcdf.attrs["threedicore_version"] = "synthetic"
+        time = netcdf.create_dataset(
+            "time", data=np.arange(timesteps, dtype=np.float64) * output_interval
+        )
+        time.attrs["units"] = SIMULATION_START
+        _write_mesh_ids(netcdf, model)
+
+        for variables, count, split in [
+            (NODE_VARIABLES, model.node_count, model.nodes_2d_all),
+            (LINE_VARIABLES, model.line_count, model.lines_2d_all),
+        ]:
+            for name, low, high, has_1d, units, long_name in variables:
+                mesh_2d = _create_variable(
+                    netcdf, "Mesh2D_" + name, timesteps, split, units, long_name
+                )
+                if has_1d:
+                    mesh_1d = _create_variable(
+                        netcdf,
+                        "Mesh1D_" + name,
+                        timesteps,
+                        count - split,
+                        units,
+                        long_name,
+                    )
+                for start, stop in _blocks(timesteps):
+                    values = random.uniform(low, high, size=(stop - start, count))
+                    if name == "s1":
+                        # dry nodes have no water level
+                        values[values < -0.5] = NO_DATA_VALUE
+                    mesh_2d[start:stop] = values[:, :split]
+                    if has_1d:
+                        mesh_1d[start:stop] = values[:, split:]
+
+        if model.pumps:
+            q_pump = _create_variable(
+                netcdf,
+                "Mesh1D_q_pump",
+                timesteps,
+                model.pumps,
+                "m3/s",
+                "pump discharge",
+            )
+            for start, stop in _blocks(timesteps):
+                q_pump[start:stop] = random.uniform(
+                    0.0, 0.1, (stop - start, model.pumps)
+                )
+
+
+def _mesh_variables(netcdf, name, timesteps, count, split, units=""):
+    """Create the Mesh2D and Mesh1D variable of objects [0:split] and [split:]
+
+    :return: list of (variable, first, last) where variable holds [first:last]
+    """
+    variables = []
+    if split:
+        variables.append(
+            (
+                _create_variable(netcdf, "Mesh2D_" + name, timesteps, split, units),
+                0,
+                split,
+            )
+        )
+    variables.append(
+        (
+            _create_variable(netcdf, "Mesh1D_" + name, timesteps, count - split, units),
+            split,
+            count,
+        )
+    )
+    return variables
+
+
+def write_aggregate_results(path, model, timesteps, output_interval=300.0, seed=0):
+    """Write the aggregate_results_3di.nc of a SyntheticModel
+
+    Cumulative variables are increasing (or decreasing) over time, like the
+    real ones. q_cum is the sum of q_cum_positive and q_cum_negative.
+    """
+    random = np.random.RandomState(seed + 1)
+    node_variables = list(AGGREGATE_NODE_VARIABLES)
+    if model.groundwater:
+        node_variables += AGGREGATE_GROUNDWATER_VARIABLES
+    groups = [
+        (node_variables, model.node_count, model.nodes_2d_all),
+        (AGGREGATE_LINE_VARIABLES, model.line_count, model.lines_2d_all),
+    ]
+    if model.pumps:
+        groups.append((AGGREGATE_PUMP_VARIABLES, model.pumps, 0))
+
+    with h5py.File(path, "w") as netcdf:
+        netcdf.attrs["threedicore_version"] = "synthetic"
+        _write_mesh_ids(netcdf, model)
+        time = np.arange(timesteps, dtype=np.float64) * output_interval
+        for variables, count, split in groups:
+            for name, low, high, cumulative in variables:
+                netcdf.create_dataset("time_" + name, data=time)
+                mesh_variables = _mesh_variables(netcdf, name, timesteps, count, split)
+                total = np.zeros(count)
+                for start, stop in _blocks(timesteps):
+                    values = random.uniform(low, high, size=(stop - start, count))
+                    if cumulative:
+                        values = total + np.cumsum(values, axis=0)
+                        total = values[-1]
+                    for variable, first, last in mesh_variables:
+                        variable[start:stop] = values[:, first:last]
+
+        netcdf.create_dataset("time_q_cum", data=time)
+        for prefix, count in [
+            ("Mesh2D_", model.lines_2d_all),
+            ("Mesh1D_", model.lines_1d_all),
+        ]:
+            q_cum = _create_variable(netcdf, prefix + "q_cum", timesteps, count)
+            for start, stop in _blocks(timesteps):
+                q_cum[start:stop] = (
+                    netcdf[prefix + "q_cum_positive"][start:stop]
+                    + netcdf[prefix + "q_cum_negative"][start:stop]
+                )
+
+
+def write_impervious_surfaces(path, model, inhabitants=10):
+    """Write a (plain sqlite) schematisation with an impervious surface per
+    1D node, for the DWF calculation
+
+    Every surface drains to its own connection node, the content_pk of the
+    1D node.
+    """
+    connection_node_ids = range(1, model.nodes_1d + 1)
+    conn = sqlite3.connect(str(path))
+    conn.executescript(
+        """
+        CREATE TABLE v2_impervious_surface (id INTEGER, nr_of_inhabitants REAL);
+        CREATE TABLE v2_impervious_surface_map (
+            impervious_surface_id INTEGER, connection_node_id INTEGER
+        );
+        """
+    )
+    conn.executemany(
+        "INSERT INTO v2_impervious_surface VALUES (?, ?)",
+        [(node_id, inhabitants) for node_id in connection_node_ids],
+    )
+    conn.executemany(
+        "INSERT INTO v2_impervious_surface_map VALUES (?, ?)",
+        [(node_id, node_id) for node_id in connection_node_ids],
+    )
+    conn.commit()
+    conn.close()
+
+
+def write_synthetic_results(
+    directory,
+    nx=10,
+    ny=10,
+    nodes_1d=0,
+    timesteps=10,
+    groundwater=False,
+    pumps=0,
+    aggregate_timesteps=None,
+    seed=0,
+):
+    """Write a gridadmin.h5, results_3di.nc and aggregate_results_3di.nc
+
+    See ``SyntheticModel`` for the size parameters.
+
+    :param directory: output directory, created when missing
+    :param timesteps: number of timesteps of the results_3di.nc
+    :param aggregate_timesteps: number of timesteps of the aggregated
+        variables, by default the same as ``timesteps``
+    :param seed: seed of the random values, the same seed gives the same files
+    :return: path of the results_3di.nc
+    """
+    directory = str(directory)
+    os.makedirs(directory, exist_ok=True)
+    model = SyntheticModel(
+        nx=nx, ny=ny, nodes_1d=nodes_1d, groundwater=groundwater, pumps=pumps
+    )
+    if aggregate_timesteps is None:
+        aggregate_timesteps = timesteps
+    write_gridadmin(os.path.join(directory, "gridadmin.h5"), model)
+    results_3di_path = os.path.join(directory, "results_3di.nc")
+    write_results(results_3di_path, model, timesteps, seed=seed)
+    write_aggregate_results(
+        os.path.join(directory, "aggregate_results_3di.nc"),
+        model,
+        aggregate_timesteps,
+        seed=seed,
+    )
+    return results_3di_path
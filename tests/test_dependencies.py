@@ -12,6 +12,14 @@ dependency_with_wrong_version = dependencies.Dependency("numpy", "numpy", "==197
 missing_dependency = dependencies.Dependency("reinout", "reinout", "")
 
 
+@pytest.fixture(autouse=True)
+def verification_stamp(tmp_path, monkeypatch):
+    """Keep the tests' verification stamp out of the plugin dir"""
+    stamp = tmp_path / "dependencies_verified"
+    monkeypatch.setattr(dependencies, "VERIFICATION_STAMP", stamp)
+    return stamp
+
+
 def test_check_importability():
     # Everything should just be importable.
     dependencies.check_importability()
@@ -128,3 +136,68 @@ def test_ensure_prerequisite_is_installed2():
     with pytest.raises(RuntimeError):
         # "prerequisite=" is there only for easy testing, the default is "pip")
         dependencies._ensure_prerequisite_is_installed(prerequisite="reinout")
+
+
+def test_verification_key():
+    key = dependencies.verification_key()
+    assert key == dependencies.verification_key()
+    assert key["python_version"]
+    assert key["plugin_version"]
+
+
+def test_hdf5_identity_outside_windows(monkeypatch):
+    monkeypatch.setattr(dependencies.platform, "system", lambda: "Linux")
+    assert dependencies._hdf5_identity() == []
+
+
+def test_updated_hdf5_needs_verification(verification_stamp, monkeypatch, tmp_path):
+    qgis_bin = tmp_path / "bin"
+    qgis_bin.mkdir()
+    (qgis_bin / "h5stat.exe").write_text("h5stat")
+    hdf5_dll = qgis_bin / "hdf5.dll"
+    hdf5_dll.write_text("hdf5 1.10.4")
+    monkeypatch.setattr(dependencies.platform, "system", lambda: "Windows")
+    monkeypatch.setattr(
+        dependencies.shutil, "which", lambda name: str(qgis_bin / "h5stat.exe")
+    )
+    identity = dependencies._hdf5_identity()
+    assert [Path(path).name for path, size, mtime in identity] == [
+        "h5stat.exe",
+        "hdf5.dll",
+    ]
+
+    dependencies._write_verification_stamp()
+    assert dependencies._verified_earlier()
+    # Qgis update: another HDF5, but the same python
+    hdf5_dll.write_text("hdf5 1.10.5 with more bytes")
+    assert not dependencies._verified_earlier()
+
+
+def test_check_importability_writes_stamp(verification_stamp):
+    assert not dependencies._verified_earlier()
+    dependencies.check_importability()
+    assert verification_stamp.exists()
+    assert dependencies._verified_earlier()
+
+
+def test_verified_earlier_skips_the_check(verification_stamp):
+    dependencies._write_verification_stamp()
+    with mock.patch.object(dependencies, "_check_presence") as patched:
+        dependencies.ensure_everything_installed()
+        assert not patched.called
+    with mock.patch.object(dependencies.importlib, "import_module") as patched:
+        dependencies.check_importability()
+        assert not patched.called
+
+
+def test_changed_constraints_need_verification(verification_stamp, monkeypatch):
+    dependencies._write_verification_stamp()
+    monkeypatch.setattr(
+        dependencies, "DEPENDENCIES", dependencies.DEPENDENCIES + [missing_dependency]
+    )
+    assert not dependencies._verified_earlier()
+
+
+def test_corrupt_stamp_needs_verification(verification_stamp):
+    verification_stamp.write_text("not json")
+    assert not dependencies._verified_earlier()
@@ -0,0 +1,69 @@
+from ThreeDiToolbox.utils.lazy_tool import LazyTool
+
+import pytest
+
+
+class DummyTool(object):
+    instances = 0
+
+    def __init__(self, iface, ts_datasources):
+        DummyTool.instances += 1
+        self.iface = iface
+        self.ts_datasources = ts_datasources
+        self.icon_path = "icon.png"
+        self.menu_text = "Dummy"
+        self.active = True
+        self.unloaded = False
+
+    def run(self):
+        return "ran"
+
+    def on_unload(self):
+        self.unloaded = True
+
+
+@pytest.fixture()
+def lazy_tool():
+    DummyTool.instances = 0
+    return LazyTool(
+        "ThreeDiToolbox.tests.test_lazy_tool:DummyTool",
+        "icon.png",
+        "Dummy",
+        "iface",
+        "ts_datasources",
+        defaults={"active": False},
+    )
+
+
+def test_not_loaded_on_creation(lazy_tool):
+    assert not lazy_tool.loaded
+    assert lazy_tool.icon_path == "icon.png"
+    assert lazy_tool.menu_text == "Dummy"
+    assert DummyTool.instances == 0
+
+
+def test_defaults_and_unknown_attributes(lazy_tool):
+    assert lazy_tool.active is False
+    # E.g. the ProjectStateMixin checks for set_state on every tool.
+    assert not hasattr(lazy_tool, "set_state")
+    assert not lazy_tool.loaded
+
+
+def test_run_loads_the_tool_once(lazy_tool):
+    lazy_tool.action_icon = "action"
+    assert lazy_tool.run() == "ran"
+    assert lazy_tool.run() == "ran"
+    assert DummyTool.instances == 1
+    assert lazy_tool.tool.iface == "iface"
+    assert lazy_tool.tool.ts_datasources == "ts_datasources"
+    assert lazy_tool.tool.action_icon == "action"
+    # Attributes come from the tool now.
+    assert lazy_tool.active is True
+
+
+def test_on_unload(lazy_tool):
+    lazy_tool.on_unload()  # Doesn't load the tool.
+    assert not lazy_tool.loaded
+    lazy_tool.run()
+    lazy_tool.on_unload()
+    assert lazy_tool.tool.unloaded
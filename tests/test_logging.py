@@ -1,5 +1,6 @@
 from ThreeDiToolbox.utils.qlogging import logfile_path
 from ThreeDiToolbox.utils.qlogging import setup_logging
+from ThreeDiToolbox.utils.qlogging import timing_summary_path
 
 import logging
 
@@ -26,6 +27,10 @@ def test_logfile_path():
     assert "threedi-qgis-log.txt" in logfile_path()
 
 
+def test_timing_summary_path():
+    assert "threedi-qgis-timings.txt" in timing_summary_path()
+
+
 def test_loglevel():
     """Python's default log level is WARN. We want to see more."""
     _cleanup_all_handlers()
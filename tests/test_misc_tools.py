@@ -27,6 +27,18 @@ def test_about():
     show_about_action.on_unload()  # Doesn't do anything, used for coverage.
 
 
+def test_performance_timings():
+    iface = mock.Mock()
+    timings_action = misc_tools.PerformanceTimings(iface)
+    timings_action.run()
+    assert iface.addDockWidget.called
+    assert len(timings_action.dock_widgets) == 1
+    timings_action.run()  # Shows the same panel again.
+    assert len(timings_action.dock_widgets) == 1
+    timings_action.on_unload()
+    assert timings_action.dock_widgets == []
+
+
 def test_cache_clearer(ts_datasources):
     iface = mock.Mock()
     show_cache_clearer_action = misc_tools.CacheClearer(iface, ts_datasources)
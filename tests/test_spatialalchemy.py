@@ -3,6 +3,7 @@ from sqlalchemy import Column
 from sqlalchemy import Integer
 from sqlalchemy import String
 from sqlalchemy.ext.declarative import declarative_base
+from ThreeDiToolbox.utils import threedi_database
 from ThreeDiToolbox.utils.threedi_database import ThreediDatabase
 
 import logging
@@ -75,6 +76,45 @@ class TestSpatialAlchemyWithSpatialite(unittest.TestCase):
         geo_table = self.session.query(GeoTable).limit(1)[0]
         self.assertIsNotNone(geo_table.geom)
 
+    def test_engine_is_shared(self):
+        other_db = ThreediDatabase({"db_path": self.file_path}, echo=True)
+        self.assertIs(other_db.get_engine(), self.engine)
+        self.assertIsNot(other_db.get_engine(get_seperate_engine=True), self.engine)
+
+    def test_spatialite_pragmas(self):
+        with self.engine.connect() as connection:
+            journal_mode = connection.execute("PRAGMA journal_mode").scalar()
+            synchronous = connection.execute("PRAGMA synchronous").scalar()
+            spatialite_version = connection.execute(
+                "SELECT spatialite_version()"
+            ).scalar()
+        # the journal mode and synchronous setting aren't changed
+        self.assertEqual(journal_mode, "delete")
+        self.assertEqual(synchronous, 2)  # FULL
+        self.assertIsNotNone(spatialite_version)
+
+    def test_dispose_all_engines(self):
+        threedi_database.dispose_all_engines()
+        other_db = ThreediDatabase({"db_path": self.file_path}, echo=True)
+        self.assertIsNot(other_db.get_engine(), self.engine)
+
     def tearDown(self):
         self.session.close_all()
+        threedi_database.dispose_all_engines()
         os.remove(self.file_path)
+
+
+def test_engine_key_depends_on_password():
+    settings = {
+        "host": "localhost",
+        "port": 5432,
+        "database": "model",
+        "username": "user",
+        "password": "secret",
+    }
+    key = threedi_database.engine_key("postgres", settings)
+    other_key = threedi_database.engine_key(
+        "postgres", dict(settings, password="other secret")
+    )
+    assert key != other_key
+    assert "secret" not in key
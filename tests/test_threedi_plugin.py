@@ -1,6 +1,39 @@
 from ThreeDiToolbox import threedi_plugin
 
+import os
+import subprocess
+import sys
+
+
+# Modules of the tools that are loaded on first use, see utils/lazy_tool.py.
+LAZY_MODULES = [
+    "geoalchemy2",
+    "lizard_connector",
+    "pyqtgraph",
+    "ThreeDiToolbox.tool_commands.command_box",
+    "ThreeDiToolbox.tool_graph.graph",
+    "ThreeDiToolbox.tool_result_selection.result_selection_view",
+    "ThreeDiToolbox.tool_sideview.sideview",
+    "ThreeDiToolbox.tool_statistics",
+    "ThreeDiToolbox.tool_water_balance",
+]
+
 
 def test_smoke():
     # We just import it. There used to be some import errors
     assert threedi_plugin
+
+
+def test_tools_are_not_imported_on_startup():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    code = "import sys, ThreeDiToolbox.threedi_plugin; print(' '.join(sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    ).stdout
+    imported = output.split()
+    for module_name in LAZY_MODULES:
+        assert module_name not in imported
@@ -0,0 +1,81 @@
+from ThreeDiToolbox.utils import timing
+
+import pytest
+
+
+@pytest.fixture()
+def enabled_timing():
+    old_settings = dict(timing._settings)
+    timing.reset()
+    timing.enable()
+    yield
+    timing._settings.update(old_settings)
+    timing.reset()
+
+
+def test_disabled_timing_records_nothing():
+    timing.reset()
+    assert not timing.is_enabled()
+    with timing.timed("something") as measurement:
+        measurement.add_bytes(100)
+    assert timing.statistics() == {}
+
+
+def test_timed_context_manager(enabled_timing):
+    with timing.timed("read") as measurement:
+        measurement.add_bytes(100)
+        measurement.cache_hit()
+        measurement.cache_hit(False)
+    with timing.timed("read") as measurement:
+        measurement.add_bytes(50)
+        measurement.cache_hit()
+    stats = timing.statistics()["read"]
+    assert stats.count == 2
+    assert stats.nbytes == 150
+    assert stats.cache_hits == 2
+    assert stats.cache_misses == 1
+    assert stats.total >= stats.max >= 0
+    assert sum(stats.histogram) == 2
+
+
+def test_timed_decorator(enabled_timing):
+    @timing.timed("double")
+    def double(value):
+        return value * 2
+
+    assert double(2) == 4
+    assert double(3) == 6
+    assert timing.statistics()["double"].count == 2
+
+
+def test_exceptions_are_timed_and_raised(enabled_timing):
+    with pytest.raises(ValueError):
+        with timing.timed("failing"):
+            raise ValueError("oops")
+    assert timing.statistics()["failing"].count == 1
+
+
+def test_histogram_bins(enabled_timing):
+    for duration in [0.0005, 0.005, 0.5, 50]:
+        measurement = timing.Measurement()
+        measurement.duration = duration
+        timing.record("op", measurement)
+    assert timing.statistics()["op"].histogram == [1, 1, 0, 1, 0, 1]
+
+
+def test_summary(enabled_timing):
+    assert "No operations timed yet" in timing.summary()
+    with timing.timed("export") as measurement:
+        measurement.add_bytes(2 * 1000 * 1000)
+    summary = timing.summary()
+    assert "export" in summary
+    assert "runs: 1" in summary
+    assert "read: 2.000 MB" in summary
+    assert "< 1 ms" in summary
+
+
+def test_write_summary(enabled_timing, tmp_path):
+    with timing.timed("export"):
+        pass
+    path = timing.write_summary(str(tmp_path / "timings.txt"))
+    assert "export" in open(path).read()
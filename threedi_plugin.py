@@ -4,25 +4,25 @@ from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
 from qgis.PyQt.QtWidgets import QLCDNumber
 from ThreeDiToolbox import resources
+from ThreeDiToolbox.datasource import result_array_cache
 from ThreeDiToolbox.misc_tools import About
 from ThreeDiToolbox.misc_tools import CacheClearer
+from ThreeDiToolbox.misc_tools import PerformanceTimings
 from ThreeDiToolbox.misc_tools import ShowLogfile
 from ThreeDiToolbox.processing.provider import ThreediProvider
 from ThreeDiToolbox.tool_animation.map_animator import MapAnimator
-from ThreeDiToolbox.tool_commands.command_box import CommandBox
-from ThreeDiToolbox.tool_graph.graph import ThreeDiGraph
 from ThreeDiToolbox.tool_result_selection.models import TimeseriesDatasourceModel
 from ThreeDiToolbox.tool_result_selection.result_selection import ThreeDiResultSelection
-from ThreeDiToolbox.tool_sideview.sideview import ThreeDiSideView
-from ThreeDiToolbox.tool_statistics import StatisticsTool
-from ThreeDiToolbox.tool_water_balance import WaterBalanceTool
 from ThreeDiToolbox.utils import color
 from ThreeDiToolbox.utils import styler
 from ThreeDiToolbox.utils.layer_tree_manager import LayerTreeManager
+from ThreeDiToolbox.utils.lazy_tool import LazyTool
 from ThreeDiToolbox.utils.qprojects import ProjectStateMixin
+from ThreeDiToolbox.utils.threedi_database import dispose_all_engines
 from ThreeDiToolbox.views.timeslider import TimesliderWidget
 
 import logging
+import os
 
 
 logger = logging.getLogger(__name__)
@@ -74,12 +74,49 @@ class ThreeDiPlugin(QObject, ProjectStateMixin):
         self.about_tool = About(iface)
         self.cache_clearer = CacheClearer(iface, self.ts_datasources)
         self.result_selection_tool = ThreeDiResultSelection(iface, self.ts_datasources)
-        self.toolbox_tool = CommandBox(iface, self.ts_datasources)
-        self.graph_tool = ThreeDiGraph(iface, self.ts_datasources, self)
-        self.sideview_tool = ThreeDiSideView(iface, self)
-        self.stats_tool = StatisticsTool(iface, self.ts_datasources)
-        self.water_balance_tool = WaterBalanceTool(iface, self.ts_datasources)
+        # The following tools import pyqtgraph, SQLAlchemy models and such:
+        # they are only loaded when they're first used, see
+        # ``utils/lazy_tool.py``. Keep the icon_path and menu_text in sync with
+        # the tools themselves.
+        self.toolbox_tool = LazyTool(
+            "ThreeDiToolbox.tool_commands.command_box:CommandBox",
+            ":/plugins/ThreeDiToolbox/icons/icon_command.png",
+            "Commands for working with 3Di models",
+            iface,
+            self.ts_datasources,
+        )
+        self.graph_tool = LazyTool(
+            "ThreeDiToolbox.tool_graph.graph:ThreeDiGraph",
+            ":/plugins/ThreeDiToolbox/icons/icon_graph.png",
+            "Show 3Di results in Graph",
+            iface,
+            self.ts_datasources,
+            self,
+        )
+        self.sideview_tool = LazyTool(
+            "ThreeDiToolbox.tool_sideview.sideview:ThreeDiSideView",
+            ":/plugins/ThreeDiToolbox/icons/icon_route.png",
+            "Show sideview of 3Di model with results",
+            iface,
+            self,
+            defaults={"active": False},
+        )
+        self.stats_tool = LazyTool(
+            "ThreeDiToolbox.tool_statistics:StatisticsTool",
+            ":/plugins/ThreeDiToolbox/icons/icon_statistical_analysis.png",
+            "Statistical Tool",
+            iface,
+            self.ts_datasources,
+        )
+        self.water_balance_tool = LazyTool(
+            "ThreeDiToolbox.tool_water_balance:WaterBalanceTool",
+            ":/plugins/ThreeDiToolbox/icons/weight-scale.png",
+            "Water Balance Tool",
+            iface,
+            self.ts_datasources,
+        )
         self.logfile_tool = ShowLogfile(iface)
+        self.timings_tool = PerformanceTimings(iface)
 
         self.tools = [
             self.about_tool,
@@ -91,6 +128,7 @@ class ThreeDiPlugin(QObject, ProjectStateMixin):
             self.stats_tool,
             self.water_balance_tool,
             self.logfile_tool,
+            self.timings_tool,
         ]
 
         self.active_ts_datasource = None
@@ -106,6 +144,13 @@ class ThreeDiPlugin(QObject, ProjectStateMixin):
         # Processing Toolbox scripts
         self.provider = None
 
+        # Keep the decoded result arrays between QGIS sessions
+        result_array_cache.configure(
+            directory=os.path.join(
+                QgsApplication.qgisSettingsDirPath(), "threedi_result_cache"
+            )
+        )
+
         # Styling
         for color_ramp in color.COLOR_RAMPS:
             styler.add_color_ramp(color_ramp)
@@ -294,6 +339,7 @@ class ThreeDiPlugin(QObject, ProjectStateMixin):
                 tool.on_unload()
 
         self.layer_manager.on_unload()
+        dispose_all_engines()
 
         self.timeslider_widget.valueChanged.disconnect(self.on_slider_change)
 
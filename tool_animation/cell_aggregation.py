@@ -0,0 +1,123 @@
+"""Coarser versions of the 2D cell grid for the animation at small scales
+
+The 2D cells of a 3Di model form a quadtree: a cell of refinement level ``k``
+measures ``2 ** k`` times the smallest cell and is aligned to the grid of its
+level. Merging the cells into square blocks of ``2 ** n`` smallest cells
+(aligned to the same origin) therefore gives the quadtree one or more levels
+up: small cells are merged, cells that are as large as a block or larger stay
+as they are.
+
+The origin of the quadtree is the lower left corner of the model (the DEM),
+which is not the corner of the active cells when the DEM has a nodata margin.
+:py:func:`grid_origin` derives it from the pixel coordinates of the cells.
+
+:py:func:`aggregate_cells` assigns each cell to its block and returns the
+bounds of the blocks, :py:func:`aggregate_values` computes the maximum or the
+(area-weighted) mean of the cell values per block.
+
+Note: this module does not import qgis.
+
+"""
+import numpy as np
+
+
+MAX = "max"
+MEAN = "mean"
+METHODS = (MAX, MEAN)
+
+
+def grid_origin(cell_bounds, pixel_bounds):
+    """Return the (x, y) of the lower left corner of the quadtree
+
+    args:
+        cell_bounds (np.array): shape (n, 4), the xmin, ymin, xmax, ymax of
+            the cells (``cell_coords`` in the gridadmin)
+        pixel_bounds (np.array): shape (n, 4), the same in DEM pixels,
+            counted from the lower left corner (``pixel_coords``)
+
+    returns:
+        tuple (x, y), or None if there are no cells (e.g. only the trash
+        element or 1D nodes)
+    """
+    cell_bounds = np.asarray(cell_bounds, dtype=float)
+    pixel_bounds = np.asarray(pixel_bounds, dtype=float)
+    valid = pixel_bounds[:, 2] > pixel_bounds[:, 0]
+    if not valid.any():
+        return None
+    cell = cell_bounds[valid][0]
+    pixels = pixel_bounds[valid][0]
+    pixel_size = (cell[2] - cell[0]) / (pixels[2] - pixels[0])
+    return cell[0] - pixels[0] * pixel_size, cell[1] - pixels[1] * pixel_size
+
+
+def aggregate_cells(cell_bounds, block_size, origin=None):
+    """Merge the cells into square blocks
+
+    A cell belongs to the block that contains its centre. The bounds of a
+    block are the bounds of its cells, so a cell that is larger than a block
+    becomes a block of its own.
+
+    args:
+        cell_bounds (np.array): shape (n, 4), the xmin, ymin, xmax, ymax of
+            the cells
+        block_size (float): width and height of the blocks
+        origin (tuple): (x, y) of the block grid, see :py:func:`grid_origin`,
+            default: the lower left corner of the cells
+
+    returns:
+        tuple of the block number (0 to the number of blocks) of each cell
+        and the bounds of the blocks (shape (number of blocks, 4))
+    """
+    cell_bounds = np.asarray(cell_bounds, dtype=float)
+    if origin is None:
+        origin = cell_bounds[:, 0].min(), cell_bounds[:, 1].min()
+    centre_x = (cell_bounds[:, 0] + cell_bounds[:, 2]) / 2
+    centre_y = (cell_bounds[:, 1] + cell_bounds[:, 3]) / 2
+    column = np.floor((centre_x - origin[0]) / block_size).astype(np.int64)
+    row = np.floor((centre_y - origin[1]) / block_size).astype(np.int64)
+    block_keys = np.stack([row, column], axis=1)
+    _, groups = np.unique(block_keys, axis=0, return_inverse=True)
+    groups = groups.ravel()
+    n_blocks = groups.max() + 1 if len(groups) else 0
+
+    block_bounds = np.empty((n_blocks, 4))
+    block_bounds[:, :2] = np.inf
+    block_bounds[:, 2:] = -np.inf
+    np.minimum.at(block_bounds[:, 0], groups, cell_bounds[:, 0])
+    np.minimum.at(block_bounds[:, 1], groups, cell_bounds[:, 1])
+    np.maximum.at(block_bounds[:, 2], groups, cell_bounds[:, 2])
+    np.maximum.at(block_bounds[:, 3], groups, cell_bounds[:, 3])
+    return groups, block_bounds
+
+
+def aggregate_values(values, groups, n_blocks, method=MAX, weights=None):
+    """Return the maximum or mean of the cell values per block
+
+    NaN values (e.g. the water level of dry cells) are ignored, a block
+    without any value gets NaN.
+
+    args:
+        values (np.array): a value per cell
+        groups (np.array): the block number per cell, see
+            :py:func:`aggregate_cells`
+        n_blocks (int): the number of blocks
+        method (str): ``"max"`` or ``"mean"``
+        weights (np.array): the weights of the cells for the mean (e.g. the
+            cell areas), default: equal weights
+    """
+    values = np.asarray(values, dtype=float)
+    if method == MAX:
+        result = np.full(n_blocks, np.nan)
+        np.fmax.at(result, groups, values)
+        return result
+    if method == MEAN:
+        if weights is None:
+            weights = np.ones_like(values)
+        weights = np.where(np.isnan(values), 0.0, weights)
+        totals = np.bincount(
+            groups, weights=np.nan_to_num(values) * weights, minlength=n_blocks
+        )
+        total_weights = np.bincount(groups, weights=weights, minlength=n_blocks)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(total_weights > 0, totals / total_weights, np.nan)
+    raise ValueError("Unknown aggregation method %s, use one of %s" % (method, METHODS))
@@ -1,13 +1,22 @@
 # TODO: calculate seperate class_bounds for groundwater
 # TODO: add listeners to result selection switch (ask if ok)
 
+from collections import namedtuple
 from math import isnan
 from qgis.core import NULL
+from qgis.core import QgsCoordinateTransform
+from qgis.core import QgsCsException
+from qgis.core import QgsFeature
+from qgis.core import QgsFeatureRequest
 from qgis.core import QgsField
+from qgis.core import QgsGeometry
 from qgis.core import QgsLayerTreeGroup
 from qgis.core import QgsProject
+from qgis.core import QgsRectangle
+from qgis.core import QgsSpatialIndex
 from qgis.core import QgsVectorLayer
 from qgis.core import QgsWkbTypes
+from qgis.PyQt.QtCore import QTimer
 from qgis.PyQt.QtCore import QVariant
 from qgis.PyQt.QtWidgets import QCheckBox
 from qgis.PyQt.QtWidgets import QComboBox
@@ -23,8 +32,10 @@ from ThreeDiToolbox.datasource.result_constants import H_TYPES
 from ThreeDiToolbox.datasource.result_constants import NEGATIVE_POSSIBLE
 from ThreeDiToolbox.datasource.result_constants import Q_TYPES
 from ThreeDiToolbox.datasource.result_constants import WATERLEVEL
+from ThreeDiToolbox.tool_animation import cell_aggregation
 from ThreeDiToolbox.utils import styler
 from ThreeDiToolbox.utils.styler import ANIMATION_LAYERS_NR_LEGEND_CLASSES
+from ThreeDiToolbox.utils.timing import timed
 from ThreeDiToolbox.utils.user_messages import StatusProgressBar
 from ThreeDiToolbox.utils.utils import generate_parameter_config
 from typing import Iterable
@@ -38,6 +49,35 @@ import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Milliseconds to wait for more map extent changes (panning, zooming) before
+# the animation layers are updated for the new extent.
+EXTENT_CHANGE_DELAY = 250
+
+# Cell layers with at least this many cells get coarser versions (levels of
+# detail) for small map scales: blocks of LOD_BLOCK_FACTORS x LOD_BLOCK_FACTORS
+# of the smallest cells, which are quadtree merges of the cells.
+LOD_MIN_CELLS = 50000
+LOD_BLOCK_FACTORS = (4, 16, 64)
+# A level of detail is shown until its smallest cells or blocks get smaller
+# than LOD_MIN_PIXELS pixels, then the next, coarser level is shown.
+LOD_MIN_PIXELS = 2
+# The size of a pixel in meters that QGIS assumes for the map scale (0.28 mm).
+PIXEL_SIZE = 0.00028
+
+#: The cells that are merged into the blocks (features) of a level of detail.
+LodAggregation = namedtuple(
+    "LodAggregation", ["cell_ids", "groups", "areas", "n_blocks", "factor"]
+)
+
+
+def lod_scale(size):
+    """Return the map scale (denominator) at which size meters measure
+    LOD_MIN_PIXELS pixels
+
+    Note: 3Di models have a projected crs in meters.
+    """
+    return size / (LOD_MIN_PIXELS * PIXEL_SIZE)
+
 
 class PercentileError(ValueError):
     """Raised when calculation of percentiles resulted in NaN"""
@@ -172,7 +212,26 @@ class MapAnimator(QWidget):
         self._line_layer_groundwater = None
         self._node_layer_groundwater = None
         self._cell_layer_groundwater = None
+
+        # By layer id: the feature ids (np.array) and spatial index of the
+        # animation layers, see feature_ids_to_update().
+        self._feature_ids = {}
+        self._spatial_indexes = {}
+        # By layer id: (parameter, timestep, relative, extent) of the last
+        # update, extent is None if all features were updated.
+        self._last_updates = {}
+        # The levels of detail of the cell layers: by cell layer id the ids of
+        # the coarser layers, by layer id the LodAggregation and the
+        # (minimum, maximum) scale at which the layer is shown.
+        self._lod_layers = {}
+        self._lod_aggregations = {}
+        self._lod_scales = {}
+        self.extent_timer = QTimer(self)
+        self.extent_timer.setSingleShot(True)
+        self.extent_timer.setInterval(EXTENT_CHANGE_DELAY)
+        self.extent_timer.timeout.connect(self.on_map_extent_changed)
         self.setup_ui()
+        self._active = False
         self.active = False
         self.setEnabled(False)
 
@@ -211,8 +270,14 @@ class MapAnimator(QWidget):
                 self.root_tool.timeslider_widget.valueChanged.emit(0)
                 progress_bar.increase_progress(100, "Ready")
                 self._active = True
+                self.iface.mapCanvas().extentsChanged.connect(self.extent_timer.start)
 
         else:
+            if self._active:
+                self.iface.mapCanvas().extentsChanged.disconnect(
+                    self.extent_timer.start
+                )
+                self.extent_timer.stop()
             self.line_parameter_combo_box.clear()
             self.node_parameter_combo_box.clear()
             self.remove_animation_layers()
@@ -223,6 +288,8 @@ class MapAnimator(QWidget):
         self.node_parameter_combo_box.setEnabled(activate)
         self.difference_checkbox.setEnabled(activate)
         self.difference_label.setEnabled(activate)
+        self.visible_only_checkbox.setEnabled(activate)
+        self.lod_method_combo_box.setEnabled(activate)
         self.root_tool.lcd.setEnabled(activate)
         self.root_tool.timeslider_widget.setEnabled(activate)
 
@@ -350,20 +417,22 @@ class MapAnimator(QWidget):
                     self.current_node_parameter["parameters"],
                 )
                 # cells
-                styler.style_animation_node_difference(
-                    self.cell_layer,
-                    self.node_parameter_class_bounds,
-                    self.current_node_parameter["parameters"],
-                    cells=True,
-                )
-                if has_groundwater:
-                    # cells
+                for layer in self.with_lod_layers(self.cell_layer):
                     styler.style_animation_node_difference(
-                        self.cell_layer_groundwater,
-                        self.groundwater_node_parameter_class_bounds,
+                        layer,
+                        self.node_parameter_class_bounds,
                         self.current_node_parameter["parameters"],
                         cells=True,
                     )
+                if has_groundwater:
+                    # cells
+                    for layer in self.with_lod_layers(self.cell_layer_groundwater):
+                        styler.style_animation_node_difference(
+                            layer,
+                            self.groundwater_node_parameter_class_bounds,
+                            self.current_node_parameter["parameters"],
+                            cells=True,
+                        )
             else:
                 # nodes
                 styler.style_animation_node_current(
@@ -372,20 +441,23 @@ class MapAnimator(QWidget):
                     self.current_node_parameter["parameters"],
                 )
                 # cells
-                styler.style_animation_node_current(
-                    self.cell_layer,
-                    self.node_parameter_class_bounds,
-                    self.current_node_parameter["parameters"],
-                    cells=True,
-                )
-                if has_groundwater:
-                    # cells
+                for layer in self.with_lod_layers(self.cell_layer):
                     styler.style_animation_node_current(
-                        self.cell_layer_groundwater,
-                        self.groundwater_node_parameter_class_bounds,
+                        layer,
+                        self.node_parameter_class_bounds,
                         self.current_node_parameter["parameters"],
                         cells=True,
                     )
+                if has_groundwater:
+                    # cells
+                    for layer in self.with_lod_layers(self.cell_layer_groundwater):
+                        styler.style_animation_node_current(
+                            layer,
+                            self.groundwater_node_parameter_class_bounds,
+                            self.current_node_parameter["parameters"],
+                            cells=True,
+                        )
+            self.apply_lod_scales()
 
     def on_datasource_change(self):
         self.setEnabled(self.root_tool.ts_datasources.rowCount() > 0)
@@ -426,6 +498,21 @@ class MapAnimator(QWidget):
         self.update_results(update_nodes=True, update_lines=False)
         self.style_layers(style_nodes=True, style_lines=False)
 
+    def on_visible_only_checkbox_state_change(self):
+        # Unchecked: the features outside the map extent are updated now.
+        self.update_results(update_nodes=True, update_lines=True)
+
+    def on_lod_method_change(self):
+        self.update_results(update_nodes=True, update_lines=False)
+
+    def on_map_extent_changed(self):
+        """Update the features that came into view, if only the visible
+        features are updated, and the level of detail that is shown at the
+        new scale"""
+        if self.visible_only_checkbox.isChecked() or self._lod_scales:
+            self.update_results(update_nodes=True, update_lines=True)
+
+    @timed("animation.update_class_bounds")
     def update_class_bounds(self, update_nodes: bool, update_lines: bool):
         gr = (
             self.root_tool.timeslider_widget.active_ts_datasource.threedi_result().result_admin
@@ -746,6 +833,17 @@ class MapAnimator(QWidget):
                 only_2d=True,  # doesn't matter in fact, source layer already containts only 2d
             )
 
+        # coarser cells for small scales, for large models
+        data = result_admin.cells.only("cell_coords", "pixel_coords").data
+        origin = cell_aggregation.grid_origin(
+            data["cell_coords"].T, data["pixel_coords"].T
+        )
+        cell_lod_layers = self.prepare_lod_layers(cell_layer, origin)
+        if result_admin.has_groundwater:
+            cell_lod_layers_groundwater = self.prepare_lod_layers(
+                cell_layer_groundwater, origin
+            )
+
         self.style_layers(style_lines=True, style_nodes=True)
 
         root = QgsProject.instance().layerTreeRoot()
@@ -767,9 +865,13 @@ class MapAnimator(QWidget):
         QgsProject.instance().addMapLayer(line_layer_2d, False)
         QgsProject.instance().addMapLayer(node_layer, False)
         QgsProject.instance().addMapLayer(cell_layer, False)
+        for lod_layer in cell_lod_layers:
+            QgsProject.instance().addMapLayer(lod_layer, False)
         if result_admin.has_groundwater:
             QgsProject.instance().addMapLayer(line_layer_groundwater, False)
             QgsProject.instance().addMapLayer(cell_layer_groundwater, False)
+            for lod_layer in cell_lod_layers_groundwater:
+                QgsProject.instance().addMapLayer(lod_layer, False)
 
         # 1D group
         subgroup_1d.insertLayer(0, line_layer_1d)
@@ -779,6 +881,8 @@ class MapAnimator(QWidget):
         self.subgroup_1d = subgroup_1d
 
         # 2D group
+        for lod_layer in reversed(cell_lod_layers):
+            subgroup_2d.insertLayer(0, lod_layer)
         subgroup_2d.insertLayer(0, cell_layer)
         self.cell_layer = cell_layer
         subgroup_2d.insertLayer(0, line_layer_2d)
@@ -787,6 +891,8 @@ class MapAnimator(QWidget):
 
         # Groundwater group
         if result_admin.has_groundwater:
+            for lod_layer in reversed(cell_lod_layers_groundwater):
+                subgroup_groundwater.insertLayer(0, lod_layer)
             subgroup_groundwater.insertLayer(0, cell_layer_groundwater)
             self.cell_layer_groundwater = cell_layer_groundwater
             subgroup_groundwater.insertLayer(0, line_layer_groundwater)
@@ -795,6 +901,162 @@ class MapAnimator(QWidget):
 
         self.animation_group = animation_group
 
+    @timed("animation.prepare_lod_layers")
+    def prepare_lod_layers(self, cell_layer: QgsVectorLayer, origin=None):
+        """Return coarser versions of the cell layer for small map scales
+
+        The cells are merged into blocks of LOD_BLOCK_FACTORS x
+        LOD_BLOCK_FACTORS of the smallest cells, aligned to ``origin``: the
+        (x, y) of the lower left corner of the model, see
+        :py:mod:`ThreeDiToolbox.tool_animation.cell_aggregation`. Each level
+        of detail is a memory layer with a feature per block, which is shown
+        between the scales at which its blocks and the cells of the previous
+        level measure LOD_MIN_PIXELS pixels. The cell layer itself is shown
+        at larger scales only.
+
+        Returns an empty list for cell layers with less than LOD_MIN_CELLS
+        cells.
+        """
+        if cell_layer.featureCount() < LOD_MIN_CELLS:
+            return []
+
+        cell_ids = []
+        cell_bounds = []
+        z_coordinates = []
+        request = QgsFeatureRequest().setSubsetOfAttributes(
+            ["z_coordinate"], cell_layer.fields()
+        )
+        for feature in cell_layer.getFeatures(request):
+            box = feature.geometry().boundingBox()
+            cell_ids.append(feature.id())
+            cell_bounds.append(
+                (box.xMinimum(), box.yMinimum(), box.xMaximum(), box.yMaximum())
+            )
+            z_coordinate = feature["z_coordinate"]
+            z_coordinates.append(np.NaN if z_coordinate == NULL else z_coordinate)
+        # sorted by id, because the values are read by id
+        order = np.argsort(cell_ids)
+        cell_ids = np.array(cell_ids, dtype=int)[order]
+        cell_bounds = np.array(cell_bounds)[order]
+        z_coordinates = np.array(z_coordinates, dtype=float)[order]
+        areas = (cell_bounds[:, 2] - cell_bounds[:, 0]) * (
+            cell_bounds[:, 3] - cell_bounds[:, 1]
+        )
+        min_size = (cell_bounds[:, 2] - cell_bounds[:, 0]).min()
+
+        lod_layers = []
+        block_sizes = []
+        n_features = len(cell_ids)
+        for factor in LOD_BLOCK_FACTORS:
+            groups, block_bounds = cell_aggregation.aggregate_cells(
+                cell_bounds, factor * min_size, origin
+            )
+            n_blocks = len(block_bounds)
+            if n_blocks > n_features / 2:
+                # hardly coarser than the previous level
+                continue
+            n_features = n_blocks
+            block_z_coordinates = cell_aggregation.aggregate_values(
+                z_coordinates, groups, n_blocks, cell_aggregation.MEAN, areas
+            )
+
+            lod_layer = QgsVectorLayer(
+                "Polygon?crs={}".format(cell_layer.crs().authid()),
+                "Cells ({0} x {0})".format(factor),
+                "memory",
+            )
+            provider = lod_layer.dataProvider()
+            provider.addAttributes(
+                [
+                    QgsField("id", QVariant.Int),
+                    QgsField("z_coordinate", QVariant.Double),
+                    QgsField("initial_value", QVariant.Double),
+                    QgsField("result", QVariant.Double),
+                ]
+            )
+            lod_layer.updateFields()
+            features = []
+            for block_nr, (bounds, z_coordinate) in enumerate(
+                zip(block_bounds.tolist(), block_z_coordinates.tolist())
+            ):
+                feature = QgsFeature(lod_layer.fields())
+                feature.setGeometry(QgsGeometry.fromRect(QgsRectangle(*bounds)))
+                feature.setAttributes(
+                    [
+                        block_nr + 1,
+                        NULL if isnan(z_coordinate) else z_coordinate,
+                        NULL,
+                        NULL,
+                    ]
+                )
+                features.append(feature)
+            # The feature ids of a new memory layer are 1, 2, 3...: feature id
+            # minus 1 is the block number.
+            provider.addFeatures(features)
+
+            self._lod_aggregations[lod_layer.id()] = LodAggregation(
+                cell_ids, groups, areas, n_blocks, factor
+            )
+            lod_layers.append(lod_layer)
+            block_sizes.append(factor * min_size)
+
+        if not lod_layers:
+            return []
+
+        self._lod_layers[cell_layer.id()] = [layer.id() for layer in lod_layers]
+        # (minimum, maximum) scale: the minimum scale is the most zoomed out
+        scale = lod_scale(min_size)
+        self._lod_scales[cell_layer.id()] = (scale, 0)
+        for lod_layer, block_size in zip(lod_layers, block_sizes):
+            if lod_layer is lod_layers[-1]:
+                # the coarsest level is shown at all smaller scales
+                next_scale = 0
+            else:
+                next_scale = lod_scale(block_size)
+            self._lod_scales[lod_layer.id()] = (next_scale, scale)
+            scale = next_scale
+        for layer in [cell_layer] + lod_layers:
+            self.set_scale_range(layer)
+        logger.info(
+            "Created %d levels of detail for %d cells of %s",
+            len(lod_layers),
+            len(cell_ids),
+            cell_layer.name(),
+        )
+        return lod_layers
+
+    def with_lod_layers(self, cell_layer: QgsVectorLayer):
+        """Return the cell layer and its levels of detail (if any)"""
+        if cell_layer is None:
+            return []
+        project = QgsProject.instance()
+        return [cell_layer] + [
+            project.mapLayer(layer_id)
+            for layer_id in self._lod_layers.get(cell_layer.id(), [])
+        ]
+
+    def set_scale_range(self, layer: QgsVectorLayer):
+        """Show the level of detail only at its scales"""
+        minimum_scale, maximum_scale = self._lod_scales[layer.id()]
+        layer.setScaleBasedVisibility(True)
+        layer.setMinimumScale(minimum_scale)
+        layer.setMaximumScale(maximum_scale)
+
+    def apply_lod_scales(self):
+        """Restore the scale ranges of the levels of detail after styling"""
+        project = QgsProject.instance()
+        for layer_id in self._lod_scales:
+            layer = project.mapLayer(layer_id)
+            if layer is not None:
+                self.set_scale_range(layer)
+
+    def is_out_of_scale(self, layer: QgsVectorLayer):
+        """Return True if the layer is a level of detail of the cells (or the
+        cells themselves) that is not shown at the current map scale"""
+        if layer.id() not in self._lod_scales:
+            return False
+        return not layer.isInScaleRange(self.iface.mapCanvas().scale())
+
     def remove_animation_layers(self):
         """Remove animation layers and remove group if it is empty"""
         if self.animation_group is not None:
@@ -810,6 +1072,9 @@ class MapAnimator(QWidget):
             ):
                 if lyr is not None:
                     project.removeMapLayer(lyr)
+            for layer_id in self._lod_aggregations:
+                if project.mapLayer(layer_id) is not None:
+                    project.removeMapLayer(layer_id)
             self.line_layer_1d = None
             self.line_layer_2d = None
             self.node_layer = None
@@ -817,6 +1082,12 @@ class MapAnimator(QWidget):
             self.node_layer_groundwater = None
             self.line_layer_groundwater = None
             self.cell_layer_groundwater = None
+            self._feature_ids.clear()
+            self._spatial_indexes.clear()
+            self._last_updates.clear()
+            self._lod_layers.clear()
+            self._lod_aggregations.clear()
+            self._lod_scales.clear()
 
             if len(self.subgroup_1d.children()) == 0:
                 # ^^^ to prevent deleting the group when a user has added other layers into it
@@ -841,6 +1112,106 @@ class MapAnimator(QWidget):
                 )
                 self.animation_group = None
 
+    def visible_extent(self, layer: QgsVectorLayer):
+        """Return the map extent in the crs of the layer
+
+        Returns None (meaning: everything) if not only the visible features
+        are updated, or if the extent cannot be transformed.
+        """
+        if not self.visible_only_checkbox.isChecked():
+            return None
+        canvas = self.iface.mapCanvas()
+        transform = QgsCoordinateTransform(
+            canvas.mapSettings().destinationCrs(), layer.crs(), QgsProject.instance()
+        )
+        try:
+            return transform.transformBoundingBox(canvas.extent())
+        except QgsCsException:
+            logger.exception("Cannot transform the map extent to %s", layer.name())
+            return None
+
+    def is_up_to_date(self, layer: QgsVectorLayer, state, extent):
+        """Return True if the features in the extent were updated already
+
+        :param state: (result file, parameter, timestep, relative) of the update
+        :param extent: QgsRectangle, or None for all features
+        """
+        last_update = self._last_updates.get(layer.id())
+        if last_update is None:
+            return False
+        last_state, last_extent = last_update
+        if last_state != state:
+            return False
+        if last_extent is None:
+            return True
+        return extent is not None and last_extent.contains(extent)
+
+    def feature_ids_to_update(self, layer: QgsVectorLayer, extent=None):
+        """Return the feature ids (np.array) of the layer within the extent
+
+        :param extent: QgsRectangle in the crs of the layer, or None for all
+            features
+        """
+        if layer.id() not in self._feature_ids:
+            self._feature_ids[layer.id()] = np.array(
+                sorted(layer.allFeatureIds()), dtype=int
+            )
+        if extent is None:
+            return self._feature_ids[layer.id()]
+
+        if layer.id() not in self._spatial_indexes:
+            request = QgsFeatureRequest().setNoAttributes()
+            self._spatial_indexes[layer.id()] = QgsSpatialIndex(
+                layer.getFeatures(request)
+            )
+        feature_ids = self._spatial_indexes[layer.id()].intersects(extent)
+        return np.array(sorted(feature_ids), dtype=int)
+
+    @staticmethod
+    def read_values(threedi_result, parameter: str, timestep_nr: int, ids):
+        """Return the values (np.array, NaN for no data) of the nodes or
+        lines with the ids"""
+        values = threedi_result.get_values_by_timestep_nr(parameter, timestep_nr, ids)
+
+        if isinstance(values, np.ma.MaskedArray):
+            values = values.filled(np.NaN)
+
+        # I suspect the two lines above intend to do the same as the (new) line below, but the lines above
+        # don't work. Perhaps issue should be solved in threedigrid? [LvW]
+        if parameter == WATERLEVEL.name:
+            # dry cells have a NO_DATA_VALUE water level
+            values[values == NO_DATA_VALUE] = np.NaN
+        return values
+
+    @staticmethod
+    def read_aggregated_values(
+        threedi_result,
+        parameter: str,
+        timestep_nr: int,
+        aggregation: LodAggregation,
+        feature_ids,
+        method: str,
+    ):
+        """Return the maximum or mean of the cell values of the blocks of a
+        level of detail
+
+        Only the cells of the blocks with the feature ids are read.
+        """
+        block_nrs = feature_ids - 1
+        in_blocks = np.isin(aggregation.groups, block_nrs)
+        values = MapAnimator.read_values(
+            threedi_result, parameter, timestep_nr, aggregation.cell_ids[in_blocks]
+        )
+        block_values = cell_aggregation.aggregate_values(
+            values,
+            aggregation.groups[in_blocks],
+            aggregation.n_blocks,
+            method=method,
+            weights=aggregation.areas[in_blocks],
+        )
+        return block_values[block_nrs]
+
+    @timed("animation.update_results")
     def update_results(self, update_nodes: bool, update_lines: bool):
         """Fill the initial_value and result fields of the animation layers, depending on active result parameter"""
 
@@ -854,14 +1225,14 @@ class MapAnimator(QWidget):
         layers_to_update = []
         if update_nodes:
             layers_to_update.append((self.node_layer, self.current_node_parameter))
-            layers_to_update.append((self.cell_layer, self.current_node_parameter))
+            for layer in self.with_lod_layers(self.cell_layer):
+                layers_to_update.append((layer, self.current_node_parameter))
             if threedi_result.result_admin.has_groundwater:
                 layers_to_update.append(
                     (self.node_layer_groundwater, self.current_node_parameter)
                 )
-                layers_to_update.append(
-                    (self.cell_layer_groundwater, self.current_node_parameter)
-                )
+                for layer in self.with_lod_layers(self.cell_layer_groundwater):
+                    layers_to_update.append((layer, self.current_node_parameter))
         if update_lines:
             layers_to_update.append((self.line_layer_1d, self.current_line_parameter))
             layers_to_update.append((self.line_layer_2d, self.current_line_parameter))
@@ -870,64 +1241,88 @@ class MapAnimator(QWidget):
                     (self.line_layer_groundwater, self.current_line_parameter)
                 )
 
+        relative = self.difference_checkbox.isChecked()
+        lod_method = self.lod_method_combo_box.currentData()
         for layer, parameter_config in layers_to_update:
             if layer is not None:
                 provider = layer.dataProvider()
                 parameter = parameter_config["parameters"]
                 parameter_long_name = parameter_config["name"]
                 parameter_units = parameter_config["unit"]
-                values_t0 = threedi_result.get_values_by_timestep_nr(parameter, 0)
-                values_ti = threedi_result.get_values_by_timestep_nr(
-                    parameter, timestep_nr
-                )
 
-                if isinstance(values_t0, np.ma.MaskedArray):
-                    values_t0 = values_t0.filled(np.NaN)
-                if isinstance(values_ti, np.ma.MaskedArray):
-                    values_ti = values_ti.filled(np.NaN)
-
-                # I suspect the two lines above intend to do the same as the two (new) lines below, but the lines above
-                # don't work. Perhaps issue should be solved in threedigrid? [LvW]
-                if parameter == WATERLEVEL.name:
-                    # dry cells have a NO_DATA_VALUE water level
-                    values_t0[values_t0 == NO_DATA_VALUE] = np.NaN
-                    values_ti[values_ti == NO_DATA_VALUE] = np.NaN
+                if self.is_out_of_scale(layer):
+                    # updated when the map is zoomed to its scales
+                    continue
+                aggregation = self._lod_aggregations.get(layer.id())
+                extent = self.visible_extent(layer)
+                state = (threedi_result.file_path, parameter, timestep_nr, relative)
+                if aggregation is not None:
+                    state += (lod_method,)
+                if self.is_up_to_date(layer, state, extent):
+                    continue
+                self._last_updates[layer.id()] = (state, extent)
+
+                # NOTE OF CAUTION: the feature ids start from 1, just like the
+                # node and line ids (because of the trash element), which is
+                # why they can be passed as node_ids. For groundwater this
+                # holds because of some magic hackery in how the *_result
+                # layers are created/copied from the regular result layers,
+                # which is purely coincidental.
+                feature_ids = self.feature_ids_to_update(layer, extent)
+                if aggregation is None:
+                    values_t0 = self.read_values(
+                        threedi_result, parameter, 0, feature_ids
+                    )
+                    values_ti = self.read_values(
+                        threedi_result, parameter, timestep_nr, feature_ids
+                    )
+                else:
+                    values_t0 = self.read_aggregated_values(
+                        threedi_result,
+                        parameter,
+                        0,
+                        aggregation,
+                        feature_ids,
+                        lod_method,
+                    )
+                    values_ti = self.read_aggregated_values(
+                        threedi_result,
+                        parameter,
+                        timestep_nr,
+                        aggregation,
+                        feature_ids,
+                        lod_method,
+                    )
 
                 update_dict = {}
                 t0_field_index = layer.fields().lookupField("initial_value")
                 ti_field_index = layer.fields().lookupField("result")
 
-                for feature in layer.getFeatures():
-                    ids = int(feature.id())
-                    # NOTE OF CAUTION: subtracting 1 from id  is mandatory for
-                    # groundwater because those indexes start from 1 (something to
-                    # do with a trash element), but for the non-groundwater version
-                    # it is not. HOWEVER, due to some magic hackery in how the
-                    # *_result layers are created/copied from the regular result
-                    # layers, the resulting feature ids also start from 1, which
-                    # why we need to subtract it in both cases, which btw is
-                    # purely coincidental.
-                    # TODO: to avoid all this BS this part should be refactored
-                    # by passing the index to get_values_by_timestep_nr, which
-                    # should take this into account
-                    value_t0 = float(values_t0[ids - 1])
+                for feature_id, value_t0, value_ti in zip(
+                    feature_ids.tolist(),
+                    values_t0.astype(float).tolist(),
+                    values_ti.astype(float).tolist(),
+                ):
                     if isnan(value_t0):
                         value_t0 = NULL
-                    value_ti = float(values_ti[ids - 1])
                     if isnan(value_ti):
                         value_ti = NULL
-                    update_dict[ids] = {
+                    update_dict[feature_id] = {
                         t0_field_index: value_t0,
                         ti_field_index: value_ti,
                     }
 
                 provider.changeAttributeValues(update_dict)
 
-                if self.difference_checkbox.isChecked() and layer in (
-                    self.node_layer,
-                    self.node_layer_groundwater,
-                    self.cell_layer,
-                    self.cell_layer_groundwater,
+                if self.difference_checkbox.isChecked() and (
+                    layer
+                    in (
+                        self.node_layer,
+                        self.node_layer_groundwater,
+                        self.cell_layer,
+                        self.cell_layer_groundwater,
+                    )
+                    or aggregation is not None
                 ):
                     layer_name_postfix = "relative to t0"
                 else:
@@ -935,6 +1330,10 @@ class MapAnimator(QWidget):
                 layer_name = (
                     f"{parameter_long_name} [{parameter_units}] ({layer_name_postfix})"
                 )
+                if aggregation is not None:
+                    layer_name += " ({0} of {1} x {1} cells)".format(
+                        lod_method, aggregation.factor
+                    )
 
                 layer.setName(layer_name)
                 layer.triggerRepaint()
@@ -974,6 +1373,24 @@ class MapAnimator(QWidget):
         self.HLayout.addWidget(self.difference_checkbox)
         self.HLayout.addWidget(self.difference_label)
 
+        self.visible_only_checkbox = QCheckBox(self)
+        self.visible_only_checkbox.setText("Visible only")
+        self.visible_only_checkbox.setToolTip(
+            "Only update the features in the current map extent (faster for large "
+            "models), the other features are updated when they come into view"
+        )
+        self.HLayout.addWidget(self.visible_only_checkbox)
+
+        self.lod_method_combo_box = QComboBox(self)
+        self.lod_method_combo_box.setSizeAdjustPolicy(QComboBox.AdjustToContents)
+        self.lod_method_combo_box.addItem("Max", cell_aggregation.MAX)
+        self.lod_method_combo_box.addItem("Mean", cell_aggregation.MEAN)
+        self.lod_method_combo_box.setToolTip(
+            "Value of the merged cells that are shown when zoomed out (large "
+            "models only): the maximum or the area-weighted mean of the cells"
+        )
+        self.HLayout.addWidget(self.lod_method_combo_box)
+
         hline2 = QFrame()
         hline2.setFrameShape(QFrame.VLine)
         hline2.setFrameShadow(QFrame.Sunken)
@@ -990,6 +1407,10 @@ class MapAnimator(QWidget):
         self.difference_checkbox.stateChanged.connect(
             self.on_difference_checkbox_state_change
         )
+        self.visible_only_checkbox.stateChanged.connect(
+            self.on_visible_only_checkbox_state_change
+        )
+        self.lod_method_combo_box.currentIndexChanged.connect(self.on_lod_method_change)
         self.root_tool.timeslider_widget.datasource_changed.connect(
             self.on_datasource_change
         )
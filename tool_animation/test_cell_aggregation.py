@@ -0,0 +1,106 @@
+from ThreeDiToolbox.tool_animation import cell_aggregation
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture()
+def cell_bounds():
+    """Fixture: a quadtree of 4 x 4 meter, three 1 x 1 m cells in the lower
+    left corner, a 1 x 1 m cell next to them and a 2 x 2 m cell to the right
+    of those, two 2 x 2 m cells on top"""
+    return np.array(
+        [
+            [0, 0, 1, 1],
+            [1, 0, 2, 1],
+            [0, 1, 1, 2],
+            [1, 1, 2, 2],
+            [2, 0, 4, 2],
+            [0, 2, 2, 4],
+            [2, 2, 4, 4],
+        ]
+    )
+
+
+def test_aggregate_cells(cell_bounds):
+    groups, block_bounds = cell_aggregation.aggregate_cells(cell_bounds, 2)
+    # The four small cells are merged, the large cells stay as they are.
+    assert groups.tolist() == [0, 0, 0, 0, 1, 2, 3]
+    assert block_bounds.tolist() == [
+        [0, 0, 2, 2],
+        [2, 0, 4, 2],
+        [0, 2, 2, 4],
+        [2, 2, 4, 4],
+    ]
+
+
+def test_aggregate_cells_larger_blocks(cell_bounds):
+    groups, block_bounds = cell_aggregation.aggregate_cells(cell_bounds, 4)
+    assert groups.tolist() == [0] * 7
+    assert block_bounds.tolist() == [[0, 0, 4, 4]]
+
+
+def test_aggregate_cells_origin(cell_bounds):
+    groups, block_bounds = cell_aggregation.aggregate_cells(
+        cell_bounds + 10, 2, origin=(10, 10)
+    )
+    assert groups.tolist() == [0, 0, 0, 0, 1, 2, 3]
+    assert block_bounds[0].tolist() == [10, 10, 12, 12]
+
+
+def test_grid_origin():
+    # the trash element, a cell with a margin of 3 pixels of 0.5 m and a 1D node
+    cell_bounds = [[-9999] * 4, [11.5, 22.5, 12.5, 23.5], [-9999] * 4]
+    pixel_bounds = [[-9999] * 4, [3, 5, 5, 7], [-9999] * 4]
+    assert cell_aggregation.grid_origin(cell_bounds, pixel_bounds) == (10.0, 20.0)
+
+
+def test_grid_origin_without_cells():
+    assert cell_aggregation.grid_origin([[-9999] * 4], [[-9999] * 4]) is None
+
+
+def test_aggregate_cells_margin():
+    """The active cells start 1 m from the quadtree origin: a 2 x 2 m cell
+    between 1 x 1 m cells"""
+    cell_bounds = np.array(
+        [
+            [1, 0, 2, 1],
+            [1, 1, 2, 2],
+            [2, 0, 4, 2],
+            [4, 0, 5, 1],
+            [4, 1, 5, 2],
+        ]
+    )
+    groups, block_bounds = cell_aggregation.aggregate_cells(
+        cell_bounds, 2, origin=(0, 0)
+    )
+    assert groups.tolist() == [0, 0, 1, 2, 2]
+    assert block_bounds.tolist() == [[1, 0, 2, 2], [2, 0, 4, 2], [4, 0, 5, 2]]
+    # aligned to the active cells, the large cell would be merged with the
+    # small cells on its right
+    groups, block_bounds = cell_aggregation.aggregate_cells(cell_bounds, 2)
+    assert block_bounds.tolist() == [[1, 0, 2, 2], [2, 0, 5, 2]]
+
+
+def test_aggregate_values_max():
+    values = np.array([1.0, np.nan, 3.0, np.nan, np.nan])
+    groups = np.array([0, 0, 1, 1, 2])
+    result = cell_aggregation.aggregate_values(values, groups, 3, method="max")
+    assert result[:2].tolist() == [1.0, 3.0]
+    assert np.isnan(result[2])
+
+
+def test_aggregate_values_mean():
+    values = np.array([1.0, 3.0, 2.0, np.nan, np.nan])
+    groups = np.array([0, 0, 1, 1, 2])
+    weights = np.array([3.0, 1.0, 1.0, 1.0, 1.0])
+    result = cell_aggregation.aggregate_values(
+        values, groups, 3, method="mean", weights=weights
+    )
+    assert result[:2].tolist() == [1.5, 2.0]
+    assert np.isnan(result[2])
+
+
+def test_aggregate_values_unknown_method():
+    with pytest.raises(ValueError):
+        cell_aggregation.aggregate_values([1.0], np.array([0]), 1, method="median")
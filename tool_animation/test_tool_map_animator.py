@@ -1,7 +1,55 @@
-from ThreeDiToolbox.threedi_plugin import CommandBox
+from qgis.core import QgsFeature
+from qgis.core import QgsField
+from qgis.core import QgsGeometry
+from qgis.core import QgsPointXY
+from qgis.core import QgsRectangle
+from qgis.core import QgsVectorLayer
+from qgis.PyQt.QtCore import QVariant
+from ThreeDiToolbox.tests.utilities import ensure_qgis_app_is_initialized
+from ThreeDiToolbox.tool_animation import map_animator as map_animator_module
+from ThreeDiToolbox.tool_animation.map_animator import MapAnimator
+from ThreeDiToolbox.tool_commands.command_box import CommandBox
 from ThreeDiToolbox.tool_result_selection.models import TimeseriesDatasourceModel
 
 import mock
+import numpy as np
+import pytest
+
+
+@pytest.fixture()
+def map_animator():
+    ensure_qgis_app_is_initialized()
+    return MapAnimator(None, mock.Mock(), mock.Mock())
+
+
+@pytest.fixture()
+def point_layer():
+    """Fixture: memory layer with 10 points on the x axis, ids 1 to 10"""
+    layer = QgsVectorLayer("Point?crs=epsg:28992", "points", "memory")
+    features = []
+    for x in range(10):
+        feature = QgsFeature()
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, 0)))
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
+
+
+@pytest.fixture()
+def cell_layer():
+    """Fixture: memory layer with 4 x 4 cells of 1 x 1 m, ids 1 to 16"""
+    layer = QgsVectorLayer("Polygon?crs=epsg:28992", "cells", "memory")
+    layer.dataProvider().addAttributes([QgsField("z_coordinate", QVariant.Double)])
+    layer.updateFields()
+    features = []
+    for y in range(4):
+        for x in range(4):
+            feature = QgsFeature(layer.fields())
+            feature.setGeometry(QgsGeometry.fromRect(QgsRectangle(x, y, x + 1, y + 1)))
+            feature.setAttributes([float(x)])
+            features.append(feature)
+    layer.dataProvider().addFeatures(features)
+    return layer
 
 
 def test_smoke():
@@ -18,3 +66,123 @@ def test_smoke():
     toolbar_animation = iface.addToolBar("ThreeDiAnimation")
     toolbar_animation.setObjectName("ThreeDiAnimation")
     assert tdi_root_tool
+
+
+def test_feature_ids_to_update(map_animator, point_layer):
+    all_ids = map_animator.feature_ids_to_update(point_layer)
+    assert all_ids.tolist() == list(range(1, 11))
+    extent = QgsRectangle(-0.5, -1, 2.5, 1)
+    visible_ids = map_animator.feature_ids_to_update(point_layer, extent)
+    assert visible_ids.tolist() == [1, 2, 3]
+
+
+def test_is_up_to_date(map_animator, point_layer):
+    state = ("results_3di.nc", "s1", 3, False)
+    assert not map_animator.is_up_to_date(point_layer, state, None)
+
+    map_animator._last_updates[point_layer.id()] = (state, QgsRectangle(0, 0, 10, 10))
+    assert map_animator.is_up_to_date(point_layer, state, QgsRectangle(1, 1, 2, 2))
+    # Panned out of the updated extent
+    assert not map_animator.is_up_to_date(
+        point_layer, state, QgsRectangle(5, 5, 20, 20)
+    )
+    # All features are needed
+    assert not map_animator.is_up_to_date(point_layer, state, None)
+    # Another timestep
+    assert not map_animator.is_up_to_date(
+        point_layer, ("results_3di.nc", "s1", 4, False), QgsRectangle(1, 1, 2, 2)
+    )
+    # Another result
+    assert not map_animator.is_up_to_date(
+        point_layer, ("other/results_3di.nc", "s1", 3, False), QgsRectangle(1, 1, 2, 2)
+    )
+
+    map_animator._last_updates[point_layer.id()] = (state, None)
+    assert map_animator.is_up_to_date(point_layer, state, QgsRectangle(5, 5, 20, 20))
+
+
+def test_lod_scale():
+    # 1 m is 2 pixels of 0.28 mm at 1:1786
+    assert map_animator_module.lod_scale(1) == pytest.approx(1785.7, abs=0.1)
+
+
+def test_prepare_lod_layers_small_model(map_animator, cell_layer):
+    assert map_animator.prepare_lod_layers(cell_layer) == []
+    assert not cell_layer.hasScaleBasedVisibility()
+
+
+@mock.patch.object(map_animator_module, "LOD_MIN_CELLS", 10)
+@mock.patch.object(map_animator_module, "LOD_BLOCK_FACTORS", (2, 4))
+def test_prepare_lod_layers(map_animator, cell_layer):
+    lod_layers = map_animator.prepare_lod_layers(cell_layer)
+    assert [layer.name() for layer in lod_layers] == ["Cells (2 x 2)", "Cells (4 x 4)"]
+    assert [layer.featureCount() for layer in lod_layers] == [4, 1]
+    # the mean z_coordinate of the lower left cells (x = 0 and 1)
+    assert next(lod_layers[0].getFeatures())["z_coordinate"] == 0.5
+
+    # zoomed in: the cells, then 2 x 2, then 4 x 4 blocks
+    scale_1 = map_animator_module.lod_scale(1)
+    scale_2 = map_animator_module.lod_scale(2)
+    assert cell_layer.isInScaleRange(scale_1 / 2)
+    assert not cell_layer.isInScaleRange(scale_1 * 1.5)
+    assert lod_layers[0].isInScaleRange(scale_1 * 1.5)
+    assert not lod_layers[0].isInScaleRange(scale_2 * 1.5)
+    assert lod_layers[1].isInScaleRange(scale_2 * 1.5)
+    assert lod_layers[1].isInScaleRange(scale_2 * 1000)
+
+    aggregation = map_animator._lod_aggregations[lod_layers[0].id()]
+    assert aggregation.cell_ids.tolist() == list(range(1, 17))
+    assert aggregation.n_blocks == 4
+    assert aggregation.factor == 2
+
+
+@mock.patch.object(map_animator_module, "LOD_MIN_CELLS", 10)
+@mock.patch.object(map_animator_module, "LOD_BLOCK_FACTORS", (2, 4))
+def test_prepare_lod_layers_margin(map_animator):
+    """6 x 6 cells of 1 x 1 m with a margin of 1 m to the grid origin"""
+    layer = QgsVectorLayer("Polygon?crs=epsg:28992", "cells", "memory")
+    layer.dataProvider().addAttributes([QgsField("z_coordinate", QVariant.Double)])
+    layer.updateFields()
+    features = []
+    for y in range(1, 7):
+        for x in range(1, 7):
+            feature = QgsFeature(layer.fields())
+            feature.setGeometry(QgsGeometry.fromRect(QgsRectangle(x, y, x + 1, y + 1)))
+            feature.setAttributes([0.0])
+            features.append(feature)
+    layer.dataProvider().addFeatures(features)
+
+    lod_layers = map_animator.prepare_lod_layers(layer, origin=(0, 0))
+    # blocks of 2 x 2 m: the cells at x = 1, 2-3, 4-5 and 6
+    assert [lod_layer.featureCount() for lod_layer in lod_layers] == [16, 4]
+    for lod_layer in lod_layers:
+        blocks = [feature.geometry() for feature in lod_layer.getFeatures()]
+        # the blocks do not overlap and cover all cells
+        assert sum(block.area() for block in blocks) == 36
+        for block in blocks:
+            bounds = block.boundingBox()
+            assert bounds.xMinimum() in (1, 2, 4, 6)
+            assert bounds.yMinimum() in (1, 2, 4, 6)
+
+
+@mock.patch.object(map_animator_module, "LOD_MIN_CELLS", 10)
+@mock.patch.object(map_animator_module, "LOD_BLOCK_FACTORS", (2, 4))
+def test_read_aggregated_values(map_animator, cell_layer):
+    lod_layers = map_animator.prepare_lod_layers(cell_layer)
+    aggregation = map_animator._lod_aggregations[lod_layers[0].id()]
+    threedi_result = mock.Mock()
+    # the value of a cell is its id
+    threedi_result.get_values_by_timestep_nr.side_effect = (
+        lambda parameter, timestep_nr, ids: ids.astype(float)
+    )
+    values = map_animator.read_aggregated_values(
+        threedi_result, "q", 1, aggregation, np.array([1, 4]), "max"
+    )
+    # block 1: the cells 1, 2, 5 and 6, block 4: 11, 12, 15 and 16
+    assert values.tolist() == [6.0, 16.0]
+    read_ids = threedi_result.get_values_by_timestep_nr.call_args[0][2]
+    assert read_ids.tolist() == [1, 2, 5, 6, 11, 12, 15, 16]
+    values = map_animator.read_aggregated_values(
+        threedi_result, "q", 1, aggregation, np.array([1]), "mean"
+    )
+    assert values.tolist() == [3.5]
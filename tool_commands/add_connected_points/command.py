@@ -1,8 +1,10 @@
 # (c) Nelen & Schuurmans, see LICENSE.rst.
 
+from qgis.core import NULL
 from qgis.core import QgsFeatureRequest
 from qgis.core import QgsGeometry
 from qgis.core import QgsProject
+from ThreeDiToolbox.tool_commands.create_breach_locations import breach_location_utils
 from ThreeDiToolbox.tool_commands.custom_command_base import CustomCommandBase
 from ThreeDiToolbox.tool_commands.predict_calc_points.predict_calc_points_dialog import (
     AddConnectedPointsDialogWidget,
@@ -127,72 +129,97 @@ class CustomCommand(CustomCommandBase):
 
     def on_edit_command_ended(self):
         """
-        Send all added features in the stack to _handle_added(). Really, this
+        Handle all added features in the stack in one go. Really, this
         is just a delayed implementation of the action itself.
         """
-
-        while self._added_features:
-            fid = self._added_features.pop()
-            self._handle_added(fid)
-            # new feature, we need an fresh ID
-            if fid < 0:
-                self._feat_id += 1
-
-    def _handle_added(self, feature_id):
-        """
-        Actually add the feature to the layer.
-        """
+        if not self._added_features:
+            return
+        # take the whole stack first: our own edit command below ends with
+        # the editCommandEnded signal as well
+        added_features, self._added_features = self._added_features, []
         try:
-            self.connected_pnt_lyr.beginEditCommand(u"Add to connected_pnt_lyr")
-            connected_pnt, feat = self._get_connected_pnt_feature(feature_id)
-            calculation_pnt_id = connected_pnt["calculation_pnt_id"]
-            calc_pnt, calc_pnt_feat = self._get_calculation_pnt_feature(
-                calculation_pnt_id
+            self.connected_pnt_lyr.beginEditCommand("Add to connected_pnt_lyr")
+            attribute_values = {}
+            # the ids of the new features that are handled already: they are
+            # only written after the loop, but count for the threshold
+            pending_ids = {}
+            for fid in reversed(added_features):
+                values = self._handle_added(fid, pending_ids)
+                if values:
+                    attribute_values[fid] = values
+                    if fid < 0:
+                        pending_ids[fid] = self._feat_id
+                # new feature, we need an fresh ID
+                if fid < 0:
+                    self._feat_id += 1
+            breach_location_utils.change_features(
+                self.connected_pnt_lyr, attribute_values=attribute_values
             )
-            if calc_pnt is None:
-                self.connected_pnt_lyr.deleteFeature(feature_id)
-
-            current_calc_type = calc_pnt["calc_type"]
-            request = QgsFeatureRequest().setFilterExpression(
-                u'"calculation_pnt_id" = {}'.format(calculation_pnt_id)
-            )
-            selected_features = self.connected_pnt_lyr.getFeatures(request)
-
-            # QgsFeatureRequest has no count so we have to loop through the
-            # feature set to get a count
-            unique_ids = set()
-            for item in selected_features:
-                _item = dict(list(zip(self.fnames_connected_pnt, item.attributes())))
-                unique_ids.add(_item["id"])
-            thresh = constants.CONNECTED_PNTS_THRESHOLD[current_calc_type]
-            if len(unique_ids) > thresh:
-                msg = (
-                    "Calculation type {} allows only for {} "
-                    "connected points! "
-                    "Deleting point...".format(current_calc_type, thresh)
-                )
-                messagebar_message("Error", msg, level=2, duration=3)
-                self.connected_pnt_lyr.deleteFeature(feature_id)
-            if feature_id < 0:
-                feat.setAttribute("id", self._feat_id)
-            exchange_level = connected_pnt["exchange_level"]
-            if exchange_level is None:
-                exchange_level = -9999
-            feat.setAttribute("exchange_level", exchange_level)
-            levee_id = self.find_levee_intersection(calc_pnt_feat, feat)
-            if levee_id:
-                feat.setAttribute("levee_id", levee_id)
-                intersect_msg = "Created a new crevasse location at levee {}.".format(
-                    levee_id
-                )
-                messagebar_message("Info", intersect_msg, level=0, duration=5)
-
-            self.connected_pnt_lyr.updateFeature(feat)
             self.connected_pnt_lyr.endEditCommand()
         except Exception:
             self.connected_pnt_lyr.destroyEditCommand()
             raise
 
+    def _handle_added(self, feature_id, pending_ids=None):
+        """
+        Verify an added (or moved) feature.
+
+        :param pending_ids: dict like {<feature id>: <id>, ...} with the ids
+            of the new features that are not written to the layer yet
+        :returns a dict like {<field index>: <value>, ...} with the attribute
+            values to change, or None when the feature has been deleted
+        """
+        connected_pnt, feat = self._get_connected_pnt_feature(feature_id)
+        if connected_pnt is None:
+            return None
+        calculation_pnt_id = connected_pnt["calculation_pnt_id"]
+        calc_pnt, calc_pnt_feat = self._get_calculation_pnt_feature(calculation_pnt_id)
+        if calc_pnt is None:
+            self.connected_pnt_lyr.deleteFeature(feature_id)
+            return None
+
+        current_calc_type = calc_pnt["calc_type"]
+        request = QgsFeatureRequest().setFilterExpression(
+            '"calculation_pnt_id" = {}'.format(calculation_pnt_id)
+        )
+        request.setSubsetOfAttributes(["id"], self.connected_pnt_lyr.fields())
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        pending_ids = pending_ids or {}
+        # the ids of the other connected points, new points that are not
+        # handled yet (no id) are checked later
+        unique_ids = set()
+        for item in self.connected_pnt_lyr.getFeatures(request):
+            item_id = pending_ids.get(item.id(), item["id"])
+            if item.id() != feature_id and item_id not in (None, NULL):
+                unique_ids.add(item_id)
+        thresh = constants.CONNECTED_PNTS_THRESHOLD[current_calc_type]
+        if len(unique_ids) + 1 > thresh:
+            msg = (
+                "Calculation type {} allows only for {} "
+                "connected points! "
+                "Deleting point...".format(current_calc_type, thresh)
+            )
+            messagebar_message("Error", msg, level=2, duration=3)
+            self.connected_pnt_lyr.deleteFeature(feature_id)
+            return None
+
+        fields = self.connected_pnt_lyr.fields()
+        values = {}
+        if feature_id < 0:
+            values[fields.indexOf("id")] = self._feat_id
+        exchange_level = connected_pnt["exchange_level"]
+        if exchange_level is None:
+            exchange_level = -9999
+        values[fields.indexOf("exchange_level")] = exchange_level
+        levee_id = self.find_levee_intersection(calc_pnt_feat, feat)
+        if levee_id:
+            values[fields.indexOf("levee_id")] = levee_id
+            intersect_msg = "Created a new crevasse location at levee {}.".format(
+                levee_id
+            )
+            messagebar_message("Info", intersect_msg, level=0, duration=5)
+        return values
+
     def _get_calculation_pnt_feature(self, calculation_pnt_id):
         """
         :param calculation_pnt_id: id of the calculation point
@@ -202,7 +229,7 @@ class CustomCommand(CustomCommandBase):
         """
 
         calc_pnt_request = QgsFeatureRequest().setFilterExpression(
-            u'"id" = {}'.format(calculation_pnt_id)
+            '"id" = {}'.format(calculation_pnt_id)
         )
         try:
             calc_pnt_feat = next(self.calc_pnt_lyr.getFeatures(calc_pnt_request))
@@ -0,0 +1,85 @@
+from qgis.core import QgsFeature
+from qgis.core import QgsGeometry
+from qgis.core import QgsPointXY
+from qgis.core import QgsVectorLayer
+from ThreeDiToolbox.tests.utilities import ensure_qgis_app_is_initialized
+from ThreeDiToolbox.tool_commands.add_connected_points import command
+from ThreeDiToolbox.utils import constants
+
+import mock
+import pytest
+
+
+@pytest.fixture()
+def connected_points_command():
+    """Fixture: the command with memory layers, one connected calculation
+    point (id 1) and one double connected calculation point (id 2)"""
+    ensure_qgis_app_is_initialized()
+    calc_pnt_lyr = QgsVectorLayer(
+        "Point?crs=epsg:28992&field=id:integer&field=calc_type:integer",
+        "v2_calculation_point",
+        "memory",
+    )
+    features = []
+    for calc_pnt_id, calc_type in [
+        (1, constants.NODE_CALC_TYPE_CONNECTED),
+        (2, constants.NODE_CALC_TYPE_DOUBLE_CONNECTED),
+    ]:
+        feature = QgsFeature(calc_pnt_lyr.fields())
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(calc_pnt_id, 0)))
+        feature.setAttributes([calc_pnt_id, calc_type])
+        features.append(feature)
+    calc_pnt_lyr.dataProvider().addFeatures(features)
+    connected_pnt_lyr = QgsVectorLayer(
+        "Point?crs=epsg:28992&field=id:integer&field=calculation_pnt_id:integer"
+        "&field=exchange_level:double&field=levee_id:integer",
+        "v2_connected_pnt",
+        "memory",
+    )
+    levee_lyr = QgsVectorLayer(
+        "LineString?crs=epsg:28992&field=id:integer", "v2_levee", "memory"
+    )
+
+    custom_command = command.CustomCommand(iface=mock.Mock())
+    custom_command.connected_pnt_lyr = connected_pnt_lyr
+    custom_command.calc_pnt_lyr = calc_pnt_lyr
+    custom_command.levee_lyr = levee_lyr
+    with mock.patch.object(command, "messagebar_message"):
+        custom_command.supervising_user_input("Ready")
+        yield custom_command
+
+
+def add_connected_points(layer, calculation_pnt_ids):
+    """Add connected points in one edit command"""
+    layer.beginEditCommand("Add connected points")
+    for calculation_pnt_id in calculation_pnt_ids:
+        feature = QgsFeature(layer.fields())
+        feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(0, 10)))
+        feature["calculation_pnt_id"] = calculation_pnt_id
+        layer.addFeature(feature)
+    layer.endEditCommand()
+
+
+def test_new_points_get_ids(connected_points_command):
+    layer = connected_points_command.connected_pnt_lyr
+    add_connected_points(layer, [1, 2])
+    ids = sorted(feature["id"] for feature in layer.getFeatures())
+    assert ids == [1, 2]
+    assert {feature["exchange_level"] for feature in layer.getFeatures()} == {-9999}
+
+
+def test_points_past_the_threshold_are_deleted(connected_points_command):
+    layer = connected_points_command.connected_pnt_lyr
+    # calculation point 1 allows 1, calculation point 2 allows 2 points
+    add_connected_points(layer, [1, 1, 1, 2, 2, 2])
+    calculation_pnt_ids = sorted(
+        feature["calculation_pnt_id"] for feature in layer.getFeatures()
+    )
+    assert calculation_pnt_ids == [1, 2, 2]
+
+
+def test_threshold_counts_existing_points(connected_points_command):
+    layer = connected_points_command.connected_pnt_lyr
+    add_connected_points(layer, [2])
+    add_connected_points(layer, [2, 2])
+    assert layer.featureCount() == 2
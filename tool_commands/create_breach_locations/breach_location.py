@@ -1,10 +1,12 @@
 # (c) Nelen & Schuurmans, see LICENSE.rst.
 
+from cached_property import cached_property
 from qgis.core import QgsFeature
 from qgis.core import QgsFeatureRequest
 from qgis.core import QgsField
 from qgis.core import QgsGeometry
 from qgis.core import QgsPointXY
+from qgis.core import QgsSpatialIndex
 from qgis.core import QgsVectorLayer
 from qgis.PyQt.QtCore import QVariant
 from ThreeDiToolbox.tool_commands.create_breach_locations import breach_location_utils
@@ -22,6 +24,15 @@ logger = logging.getLogger(__name__)
 
 EXTRAPLORATION_RATIO = 20
 
+# Levees as loaded once by BreachLocation.levees:
+# - index: QgsSpatialIndex of the levee feature ids
+# - geometries: {feature id: QgsGeometry}
+# - engines: {feature id: prepared QgsGeometryEngine}
+# - levee_ids: {feature id: value of the levee "id" field}
+Levees = collections.namedtuple(
+    "Levees", ["index", "geometries", "engines", "levee_ids"]
+)
+
 
 class BreachLocation(object):
     """
@@ -62,6 +73,10 @@ class BreachLocation(object):
         self.is_dry_run = is_dry_run
 
         self.selected_pnt_ids = collections.defaultdict(list)
+        # hash sets of the selected connected and calculation point ids, for
+        # fast membership tests
+        self.selected_conn_pnt_ids = set()
+        self.selected_calc_pnt_ids = set()
 
         self.connected_pnt_lyr = connected_pnt_lyr
         self.fnames_conn_pnt = {
@@ -93,9 +108,44 @@ class BreachLocation(object):
             self.search_distance /= constants.DEGREE_IN_METERS
             self.distance_to_levee /= constants.DEGREE_IN_METERS
 
+        # edits are collected while moving points and applied all at once
+        # by apply_pending_edits()
+        self.pending_tmp_pnt_features = []
+        self.pending_tmp_line_features = []
+        self.pending_updates = {}
+
         # used for user feedback
         self.cnt_moved_pnts = 0
 
+    @cached_property
+    def levees(self):
+        """Load all levees once in a spatial index with prepared geometries.
+
+        Searching levees for every perpendicular line through a feature
+        request with a bbox filter is slow for large models. Instead we query
+        the levee layer once and keep the geometries (prepared for fast
+        intersects) and levee ids around, keyed by feature id.
+        """
+        index = QgsSpatialIndex()
+        geometries = {}
+        engines = {}
+        levee_ids = {}
+        request = QgsFeatureRequest().setSubsetOfAttributes(
+            ["id"], self.levee_lyr.fields()
+        )
+        for levee_feat in self.levee_lyr.getFeatures(request):
+            geometry = levee_feat.geometry()
+            if geometry.isNull():
+                continue
+            fid = levee_feat.id()
+            index.addFeature(levee_feat)
+            engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+            engine.prepareGeometry()
+            geometries[fid] = geometry
+            engines[fid] = engine
+            levee_ids[fid] = levee_feat["id"]
+        return Levees(index, geometries, engines, levee_ids)
+
     @property
     def has_valid_selection(self):
         if self.selected_pnt_ids or not self.use_selection:
@@ -117,9 +167,35 @@ class BreachLocation(object):
         user_selection = self.connected_pnt_lyr.selectedFeatures()
 
         for item in user_selection:
-            # combine feature with field names
-            conn_pnt = dict(zip(item.fields().names(), item.attributes()))
-            self.selected_pnt_ids[item.id()].append(conn_pnt["calculation_pnt_id"])
+            calc_pnt_id = item["calculation_pnt_id"]
+            self.selected_pnt_ids[item.id()].append(calc_pnt_id)
+            self.selected_conn_pnt_ids.add(item.id())
+            self.selected_calc_pnt_ids.add(calc_pnt_id)
+
+    @cached_property
+    def connected_pnts_by_calc_pnt(self):
+        """
+        All (selected) connected points, queried in one go and grouped by
+        the calculation point they belong to.
+
+        It looks like this::
+
+            {calculation point id:
+                [(connected point feature id, QgsPointXY), ...],
+            }
+
+        """
+        connected_pnts = collections.defaultdict(list)
+        request = QgsFeatureRequest().setSubsetOfAttributes(
+            ["calculation_pnt_id"], self.connected_pnt_lyr.fields()
+        )
+        if self.use_selection:
+            request.setFilterFids(list(self.selected_conn_pnt_ids))
+        for feature in self.connected_pnt_lyr.getFeatures(request):
+            connected_pnts[feature["calculation_pnt_id"]].append(
+                (feature.id(), feature.geometry().asPoint())
+            )
+        return connected_pnts
 
     def get_connected_points(self, ids, calc_type):
         """
@@ -135,23 +211,16 @@ class BreachLocation(object):
             constants.NODE_CALC_TYPE_CONNECTED: -2,
             constants.NODE_CALC_TYPE_DOUBLE_CONNECTED: -3,
         }
-        selected_points = []
-
-        id_str = ",".join([str(x) for x in ids])
-
-        # request object that will filter the connected points by its
-        # source object (e.g. all points originating from a specific pipe)
-        connected_pnt_request = QgsFeatureRequest().setFilterExpression(
-            '"calculation_pnt_id" IN ({ids})'.format(ids=id_str)
+        # (selected) connected points of all calculation points, in feature
+        # id order
+        connected_pnts = sorted(
+            itertools.chain.from_iterable(
+                self.connected_pnts_by_calc_pnt.get(calc_pnt_id, [])
+                for calc_pnt_id in ids
+            ),
+            key=lambda item: item[0],
         )
-        connected_points = self.connected_pnt_lyr.getFeatures(connected_pnt_request)
-        selected_connected_pnt_ids = list(self.selected_pnt_ids.keys())
-        for feature in connected_points:
-            if self.use_selection:
-                if feature.id() in selected_connected_pnt_ids:
-                    selected_points.append({feature.id(): feature.geometry().asPoint()})
-            else:
-                selected_points.append({feature.id(): feature.geometry().asPoint()})
+        selected_points = [{fid: point} for fid, point in connected_pnts]
         if len(selected_points) < abs(INDEX_MAP[calc_type]):
             return []
         # add a dummy point to be able to draw a line for the
@@ -187,24 +256,19 @@ class BreachLocation(object):
             '"calc_type" = {} OR "calc_type" = {}'.format(*calc_type_filter)
         )
         calc_pnt_features = self.calc_pnt_lyr.getFeatures(calc_pnt_request)
-        selected_calc_pnt_ids = list(
-            itertools.chain(*list(self.selected_pnt_ids.values()))
-        )
         for calc_pnt_feature in calc_pnt_features:
-            if any(
-                [calc_pnt_feature.id() in selected_calc_pnt_ids, not self.use_selection]
+            if (
+                self.use_selection
+                and calc_pnt_feature.id() not in self.selected_calc_pnt_ids
             ):
-                # combine feature with field names
-                calc_pnt = dict(
-                    list(zip(fnames_calc_pnt, calc_pnt_feature.attributes()))
-                )
-                user_ref = calc_pnt["user_ref"]
-                calc_type = calc_pnt["calc_type"]
-                code, src_id, src_tbl, calc_nr = user_ref.split("#")
-                source_info = "{src_id}{src_table}".format(
-                    src_id=src_id, src_table=src_tbl
-                )
-                calc_points_dict[(source_info, calc_type)].append(calc_pnt["id"])
+                continue
+            # combine feature with field names
+            calc_pnt = dict(zip(fnames_calc_pnt, calc_pnt_feature.attributes()))
+            user_ref = calc_pnt["user_ref"]
+            calc_type = calc_pnt["calc_type"]
+            code, src_id, src_tbl, calc_nr = user_ref.split("#")
+            source_info = "{src_id}{src_table}".format(src_id=src_id, src_table=src_tbl)
+            calc_points_dict[(source_info, calc_type)].append(calc_pnt["id"])
         return calc_points_dict
 
     def move_points_behind_levee(self, points, calc_type):
@@ -260,7 +324,7 @@ class BreachLocation(object):
                     org_line = QgsGeometry.fromPolylineXY([org_start, org_end])
                     feat = QgsFeature()
                     feat.setGeometry(org_line)
-                    self.provider_line.addFeatures([feat])
+                    self.pending_tmp_line_features.append(feat)
 
                 levee_intersections = self.find_levee_intersections(
                     line_start, line_end, org_start
@@ -307,37 +371,32 @@ class BreachLocation(object):
 
         """
 
-        levee_field_names = [field.name() for field in self.levee_lyr.fields()]
-
         virtual_line = QgsGeometry.fromPolylineXY([start_point, end_point])
         # filter levees by bbox of the virtual line
-        virtual_line_bbox = virtual_line.boundingBox()
-        levee_features = self.levee_lyr.getFeatures(
-            QgsFeatureRequest().setFilterRect(virtual_line_bbox)
-        )
+        levees = self.levees
+        candidate_fids = sorted(levees.index.intersects(virtual_line.boundingBox()))
 
         if self.is_dry_run:
             feat = QgsFeature()
             feat.setGeometry(virtual_line)
-            self.provider_line.addFeatures([feat])
+            self.pending_tmp_line_features.append(feat)
 
         # before we move the points get all matches because
         # they need to be sorted first (we want the closest
         # intersection)
         levee_intersections = collections.defaultdict(list)
-        for levee_feat in levee_features:
-            # combine feature with field names
-            levee = dict(list(zip(levee_field_names, levee_feat.attributes())))
-            levee_id = levee["id"]
-            if levee_feat.geometry().intersects(virtual_line):
-                intersection_pnt = levee_feat.geometry().intersection(virtual_line)
-                intersection_pnt.convertToSingleType()
-                g = intersection_pnt.constGet()
-                pnt = QgsPointXY(g.x(), g.y())
-                dist = breach_location_utils.get_distance(
-                    centroid, pnt, epsg_code=self.epsg_code
-                )
-                levee_intersections[levee_id].append((dist, pnt, levee_id))
+        for fid in candidate_fids:
+            if not levees.engines[fid].intersects(virtual_line.constGet()):
+                continue
+            levee_id = levees.levee_ids[fid]
+            intersection_pnt = levees.geometries[fid].intersection(virtual_line)
+            intersection_pnt.convertToSingleType()
+            g = intersection_pnt.constGet()
+            pnt = QgsPointXY(g.x(), g.y())
+            dist = breach_location_utils.get_distance(
+                centroid, pnt, epsg_code=self.epsg_code
+            )
+            levee_intersections[levee_id].append((dist, pnt, levee_id))
         return levee_intersections
 
     def calculate_new_position(
@@ -392,8 +451,9 @@ class BreachLocation(object):
 
     def add_to_tmp_connected_point_layer(self, new_positions):
         """
-        add features to the temporary point layer. Adds geometry and
-        levee_id of the intersection
+        queue features for the temporary point layer. Adds geometry and
+        levee_id of the intersection. The features are added to the layer
+        by apply_pending_edits()
 
         :param new_positions: list of tuples like so
             [(<geometry>, <levee id>), ...]
@@ -403,26 +463,18 @@ class BreachLocation(object):
 
         if not isinstance(new_positions, list):
             new_positions = [new_positions]
-        new_features = []
 
         for geom, levee_id in new_positions:
             new_feat = QgsFeature()
             new_feat.setGeometry(geom)
             new_feat.setAttributes([int(levee_id)])
-            new_features.append(new_feat)
-        succces, features = self.provider_pnt.addFeatures(new_features)
-        cnt_feat = len(features)
-        if succces:
-            logger.info(
-                "[*] Successfully added {} features to the layer".format(cnt_feat)
-            )
-        else:
-            logger.error("[-] Could not add features to the layer")
+            self.pending_tmp_pnt_features.append(new_feat)
 
     def update_connected_point_layer(self, to_update):
         """
-        update the database table 'v2_connected_pnt'. Adds the levee_id and
-        changes the geometry
+        queue an update of the database table 'v2_connected_pnt': the
+        levee_id and the geometry. The updates are applied by
+        apply_pending_edits()
 
         to_update is a dict like this::
 
@@ -437,13 +489,52 @@ class BreachLocation(object):
         for conn_pnt_id, (geom, levee_id) in to_update.items():
             if any([geom is None, conn_pnt_id is None]):
                 continue
-            req = QgsFeatureRequest().setFilterFid(conn_pnt_id)
-            feat = next(self.connected_pnt_lyr.getFeatures(req))
-            feat["levee_id"] = levee_id
-            feat.setGeometry(geom)
-            self.connected_pnt_lyr.updateFeature(feat)
+            self.pending_updates[conn_pnt_id] = (geom, levee_id)
             self.cnt_moved_pnts += 1
 
+    def apply_pending_edits(self):
+        """
+        apply all queued edits in one go: for a dry run the features are
+        added to the temporary layers, otherwise the new geometries and
+        levee ids are written to the connected point layer as a single edit
+        command.
+        """
+        if self.is_dry_run:
+            self.provider_line.addFeatures(self.pending_tmp_line_features)
+            succces, features = self.provider_pnt.addFeatures(
+                self.pending_tmp_pnt_features
+            )
+            if succces:
+                logger.info(
+                    "[*] Successfully added {} features to the layer".format(
+                        len(features)
+                    )
+                )
+            else:
+                logger.error("[-] Could not add features to the layer")
+            self.pending_tmp_line_features = []
+            self.pending_tmp_pnt_features = []
+            return
+
+        if not self.pending_updates:
+            return
+        levee_id_idx = self.fnames_conn_pnt["levee_id"]
+        geometries = {}
+        attribute_values = {}
+        for conn_pnt_id, (geom, levee_id) in self.pending_updates.items():
+            geometries[conn_pnt_id] = geom
+            attribute_values[conn_pnt_id] = {levee_id_idx: levee_id}
+        self.connected_pnt_lyr.beginEditCommand("Create breach locations")
+        try:
+            breach_location_utils.change_features(
+                self.connected_pnt_lyr, geometries, attribute_values
+            )
+        except Exception:
+            self.connected_pnt_lyr.destroyEditCommand()
+            raise
+        self.connected_pnt_lyr.endEditCommand()
+        self.pending_updates = {}
+
     def create_tmp_layers(self):
         """
         creates two qgis "memory" layers: "temp_connected_pnt"
@@ -1,6 +1,7 @@
 from qgis._core import QgsCoordinateReferenceSystem
 from qgis._core import QgsDistanceArea
 from qgis._core import QgsProject
+from qgis.core import QgsVectorDataProvider
 from ThreeDiToolbox.utils import constants
 
 import logging
@@ -113,3 +114,46 @@ def get_distance(pnt1, pnt2, epsg_code):
     if epsg_code == constants.EPSG_WGS84:
         distance.setEllipsoid("WGS84")
     return distance.measureLine(pnt1, pnt2)
+
+
+def change_features(layer, geometries=None, attribute_values=None):
+    """
+    change the geometries and attribute values of many features at once
+
+    If the layer is in edit mode the changes go into its edit buffer (wrap
+    the call in ``beginEditCommand()``/``endEditCommand()`` to make it a
+    single undo step). Otherwise they are written with a single
+    ``changeGeometryValues`` and ``changeAttributeValues`` call on the data
+    provider, after which the spatial index is rebuilt once.
+
+    :param layer: QgsVectorLayer instance
+    :param geometries: dict like {<feature id>: <QgsGeometry>, ...}
+    :param attribute_values: dict like
+        {<feature id>: {<field index>: <value>, ...}, ...}
+
+    :returns True if all changes could be applied
+    """
+    geometries = geometries or {}
+    attribute_values = attribute_values or {}
+    if layer.isEditable():
+        success = True
+        for feature_id, geometry in geometries.items():
+            success &= layer.changeGeometry(feature_id, geometry)
+        for feature_id, values in attribute_values.items():
+            success &= layer.changeAttributeValues(feature_id, values)
+        return success
+
+    provider = layer.dataProvider()
+    success = True
+    if geometries:
+        success &= provider.changeGeometryValues(geometries)
+    if attribute_values:
+        success &= provider.changeAttributeValues(attribute_values)
+    if (
+        geometries
+        and provider.capabilities() & QgsVectorDataProvider.CreateSpatialIndex
+    ):
+        provider.createSpatialIndex()
+    layer.updateExtents()
+    layer.triggerRepaint()
+    return success
@@ -67,6 +67,7 @@ class CustomCommand(CustomCommandBase):
                 current = (cnt / float(cnt_iterations)) * 100
                 pb.setValue(current)
                 cnt += 1
+        breach_location.apply_pending_edits()
 
         if breach_location.is_dry_run:
             breach_location.pnt_layer.commitChanges()
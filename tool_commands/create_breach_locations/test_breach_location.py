@@ -1,7 +1,9 @@
 """
 Test breach locations.
 """
+from qgis.core import QgsFeature
 from qgis.core import QgsFeatureRequest
+from qgis.core import QgsGeometry
 from qgis.core import QgsPointXY
 from qgis.core import QgsVectorLayer
 from ThreeDiToolbox.tests.test_init import TEST_DATA_DIR
@@ -108,6 +110,7 @@ class TestBreachLocationDryRun(unittest.TestCase):
         self.breach_location.move_points_behind_levee(
             connected_points_selection, calc_type=2
         )
+        self.breach_location.apply_pending_edits()
         req = QgsFeatureRequest().setFilterExpression('"levee_id" = 3')
         f_iter = self.conn_pnt_lyr.getFeatures(req)
         levee_ids = [f["levee_id"] for f in f_iter]
@@ -126,6 +129,7 @@ class TestBreachLocationDryRun(unittest.TestCase):
         self.breach_location.move_points_behind_levee(
             connected_points_selection, calc_type=2
         )
+        self.breach_location.apply_pending_edits()
         self.breach_location.pnt_layer.commitChanges()
         self.breach_location.pnt_layer.updateExtents()
 
@@ -143,6 +147,7 @@ class TestBreachLocationDryRun(unittest.TestCase):
         self.breach_location.move_points_behind_levee(
             connected_points_selection, calc_type=5
         )
+        self.breach_location.apply_pending_edits()
         self.breach_location.pnt_layer.commitChanges()
         self.breach_location.pnt_layer.updateExtents()
 
@@ -160,6 +165,21 @@ class TestBreachLocationDryRun(unittest.TestCase):
         self.breach_location.set_selected_pnt_ids()
         self.assertDictEqual(expected, self.breach_location.selected_pnt_ids)
 
+    def test_it_only_gets_selected_connected_points(self):
+        self.breach_location.use_selection = True
+        self.breach_location.connected_pnt_lyr.selectByIds([1, 2, 3])
+        self.breach_location.set_selected_pnt_ids()
+        self.assertSetEqual(self.breach_location.selected_conn_pnt_ids, {1, 2, 3})
+        self.assertSetEqual(self.breach_location.selected_calc_pnt_ids, {2, 3, 4})
+        connected_points_selection = self.breach_location.get_connected_points(
+            [2, 3, 4, 5, 6, 7, 8], calc_type=2  # ids of the calculation points
+        )
+        # three selected points plus the extrapolated one
+        self.assertListEqual(
+            [list(point.keys())[0] for point in connected_points_selection],
+            [1, 2, 3, None],
+        )
+
     def test_it_can_find_levee_intersections(self):
 
         perp_line = breach_location_utils.calculate_perpendicular_line(
@@ -181,6 +201,14 @@ class TestBreachLocationDryRun(unittest.TestCase):
         # one with levee 2, another with levee 3
         self.assertListEqual(list(levee_intersections.keys()), [2, 3])
 
+    def test_it_loads_levees_once(self):
+        levees = self.breach_location.levees
+        # the levees we intersect with in the other tests are all there
+        self.assertTrue({2, 3, 4, 5}.issubset(set(levees.levee_ids.values())))
+        self.assertEqual(set(levees.geometries), set(levees.engines))
+        # cached, so not loaded again
+        self.assertIs(levees, self.breach_location.levees)
+
     def test_it_can_calculate_new_positions(self):
         perp_line = breach_location_utils.calculate_perpendicular_line(
             [3.31369, 47.9748, 3.31376, 47.9748],
@@ -280,6 +308,7 @@ class TestBresLocation(unittest.TestCase):
         self.breach_location.move_points_behind_levee(
             connected_points_selection, calc_type=2
         )
+        self.breach_location.apply_pending_edits()
         req = QgsFeatureRequest().setFilterExpression('"levee_id" = 3')
         f_iter = self.conn_pnt_lyr.getFeatures(req)
         # should all have been moved across the first levee (id 3)
@@ -308,6 +337,35 @@ class TestBreachLocationUtils(unittest.TestCase):
         dist = breach_location_utils.get_distance(pnt, pnt1, 28992)
         self.assertEqual(dist, 10.0)
 
+    def test_it_can_change_features(self):
+        pnt_layer = QgsVectorLayer(
+            "Point?crs=EPSG:28992&field=levee_id:integer", "points", "memory"
+        )
+        features = []
+        for x in range(3):
+            feature = QgsFeature(pnt_layer.fields())
+            feature.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(x, 0)))
+            features.append(feature)
+        pnt_layer.dataProvider().addFeatures(features)
+        fids = [feature.id() for feature in pnt_layer.getFeatures()]
+        geometries = {
+            fid: QgsGeometry.fromPointXY(QgsPointXY(10, fid)) for fid in fids[:2]
+        }
+        attribute_values = {fid: {0: 42} for fid in fids[:2]}
+
+        success = breach_location_utils.change_features(
+            pnt_layer, geometries, attribute_values
+        )
+        self.assertTrue(success)
+        changed = {
+            feature.id(): (feature.geometry().asPoint(), feature["levee_id"])
+            for feature in pnt_layer.getFeatures()
+        }
+        for fid in fids[:2]:
+            self.assertEqual(changed[fid], (QgsPointXY(10, fid), 42))
+        # untouched
+        self.assertEqual(changed[fids[2]][0], QgsPointXY(2, 0))
+
     def test_it_can_calculate_perpendicular_line(self):
         line_coords = [0, 5, 0, 10]
         expected = (-20.0, 5.0, 20.0, 5.0)
@@ -1,5 +1,7 @@
 # (c) Nelen & Schuurmans, see LICENSE.rst.
 
+from sqlalchemy import and_
+from sqlalchemy import case
 from sqlalchemy import select
 from sqlalchemy import update
 from ThreeDiToolbox.sql_models.constants import Constants
@@ -51,7 +53,6 @@ class Guesser(object):
             up = up.where(Manhole.manhole_indicator.is_(None))
         ret = session.execute(up)
         update_counter += ret.rowcount
-        session.commit()
         self.messages.append(
             "Manhole indicator updated {0} pumpstation manholes.".format(update_counter)
         )
@@ -71,7 +72,6 @@ class Guesser(object):
             up = up.where(Manhole.manhole_indicator.is_(None))
         ret = session.execute(up)
         update_counter += ret.rowcount
-        session.commit()
         self.messages.append(
             "Manhole indicator updated {0} outlet manholes.".format(update_counter)
         )
@@ -87,17 +87,21 @@ class Guesser(object):
             up = up.where(Manhole.manhole_indicator.is_(None))
         ret = session.execute(up)
         update_counter += ret.rowcount
-        session.commit()
         self.messages.append(
             "Manhole indicator updated {0} manholes.".format(update_counter)
         )
 
     def guess_manhole_indicator(self, only_empty_fields=True):
-        """Guess the manhole indicator."""
+        """Guess the manhole indicator.
+
+        The three updates run in one transaction: pumpstation and outlet manholes
+        are set first, the remaining empty ones become ordinary manholes.
+        """
         session = self.db.get_session()
         self._manhole_indicator_pumpstation(session, only_empty_fields)
         self._manhole_indicator_outlet(session, only_empty_fields)
         self._manhole_indicator_manhole(session, only_empty_fields)
+        session.commit()
         session.close()
 
     def guess_pipe_friction(self, only_empty_fields=True):
@@ -125,42 +129,56 @@ class Guesser(object):
         self.messages.append("Pipe friction updated {0} pipes.".format(update_counter))
 
     def guess_manhole_area(self, only_empty_fields=True):
-        """Guess the manhole area."""
-        session = self.db.get_session()
-        update_counter = 0
+        """Guess the manhole area.
 
-        manhole_list = (
-            session.query(Manhole)
-            .join(Manhole.connection_node)
-            .filter(ConnectionNode.storage_area.is_(None))
-        )
+        The area is computed by the database in a single update of the
+        connection nodes without a storage area. When a connection node has
+        several manholes, the one with the highest id is used.
+        """
+        session = self.db.get_session()
 
         # '01' and '02' are the old identifiers, based on the sufhyd
         # standard
-        for manhole in manhole_list:
-            if (
-                manhole.shape in [Constants.MANHOLE_SHAPE_ROUND, "01"]
-                and manhole.width is not None
-            ):
-                storage_area = 0.5 * 3.14 * manhole.width * manhole.width
-            elif (
-                manhole.shape in [Constants.MANHOLE_SHAPE_RECTANGLE, "02"]
-                and manhole.width is not None
-                and manhole.length is not None
-            ):
-                storage_area = manhole.width * manhole.length
-            elif manhole.width is not None:
-                storage_area = manhole.width * manhole.width
-            else:
-                continue
-
-            up = (
-                update(ConnectionNode)
-                .where(ConnectionNode.id == manhole.connection_node_id)
-                .values(storage_area=storage_area)
+        storage_area = case(
+            [
+                (
+                    Manhole.shape.in_([Constants.MANHOLE_SHAPE_ROUND, "01"]),
+                    0.5 * 3.14 * Manhole.width * Manhole.width,
+                ),
+                (
+                    and_(
+                        Manhole.shape.in_([Constants.MANHOLE_SHAPE_RECTANGLE, "02"]),
+                        Manhole.length.isnot(None),
+                    ),
+                    Manhole.width * Manhole.length,
+                ),
+            ],
+            else_=Manhole.width * Manhole.width,
+        )
+        # note: sqlite can not use a join with another table in an update
+        # statement, so use a correlated subquery
+        manhole_area = (
+            select([storage_area])
+            .where(Manhole.connection_node_id == ConnectionNode.id)
+            .where(Manhole.width.isnot(None))
+            .order_by(Manhole.id.desc())
+            .limit(1)
+            .as_scalar()
+        )
+        up = (
+            update(ConnectionNode)
+            .where(ConnectionNode.storage_area.is_(None))
+            .where(
+                ConnectionNode.id.in_(
+                    select([Manhole.connection_node_id]).where(
+                        Manhole.width.isnot(None)
+                    )
+                )
             )
-            ret = session.execute(up)
-            update_counter += ret.rowcount
+            .values(storage_area=manhole_area)
+        )
+        ret = session.execute(up)
+        update_counter = ret.rowcount
 
         session.commit()
         session.close()
@@ -222,3 +222,46 @@ def test_guess_pipe_friction(db):
             for x in list(pipes_after_guess.values())
         ]
     )
+
+
+def test_guess_manhole_area(db):
+    session = db.get_session()
+    manholes = (
+        session.query(Manhole)
+        .filter(Manhole.width.isnot(None))
+        .filter(Manhole.connection_node_id.isnot(None))
+        .all()
+    )
+    assert manholes, "sqlite should have manholes, otherwise there is nothing to test"
+
+    # the area of the manhole with the highest id wins
+    expected = {}
+    for manhole in sorted(manholes, key=lambda manhole: manhole.id):
+        if manhole.shape in [Constants.MANHOLE_SHAPE_ROUND, "01"]:
+            area = 0.5 * 3.14 * manhole.width * manhole.width
+        elif (
+            manhole.shape in [Constants.MANHOLE_SHAPE_RECTANGLE, "02"]
+            and manhole.length is not None
+        ):
+            area = manhole.width * manhole.length
+        else:
+            area = manhole.width * manhole.width
+        expected[manhole.connection_node_id] = area
+
+    session.execute(update(ConnectionNode).values(storage_area=None))
+    session.commit()
+
+    guesser = guess_indicators_utils.Guesser(db)
+    guesser.guess_manhole_area()
+    assert guesser.messages == [
+        "Manhole area updated {0} manholes.".format(len(expected))
+    ]
+
+    # get a new session
+    session = db.get_session()
+    storage_areas = dict(
+        session.query(ConnectionNode.id, ConnectionNode.storage_area).filter(
+            ConnectionNode.id.in_(list(expected))
+        )
+    )
+    assert storage_areas == pytest.approx(expected)
@@ -5,6 +5,7 @@ from copy import copy
 from osgeo import gdal
 from osgeo import ogr
 from osgeo import osr
+from sqlalchemy import text
 from sqlalchemy.orm import load_only
 from ThreeDiToolbox.sql_models.constants import Constants
 from ThreeDiToolbox.sql_models.model_schematisation import BoundaryCondition1D
@@ -21,13 +22,40 @@ from ThreeDiToolbox.tool_commands.import_sufhyd.sufhyd_importer import SufhydRea
 from ThreeDiToolbox.utils.user_messages import messagebar_message
 
 import datetime
+import itertools
 import logging
+import struct
 
 
 logger = logging.getLogger(__name__)
 
+#: Number of objects saved to the database at once
+BATCH_SIZE = 10000
 
-def transform(wkt, srid_source, srid_dest):
+
+def save_in_batches(session, objects, batch_size=BATCH_SIZE):
+    """Save (an iterable of) objects per batch and return the number saved
+
+    Every batch is committed, so the objects don't all need to be in memory.
+    """
+    objects = iter(objects)
+    count = 0
+    while True:
+        batch = list(itertools.islice(objects, batch_size))
+        if not batch:
+            return count
+        session.bulk_save_objects(batch)
+        session.commit()
+        count += len(batch)
+
+
+def transform_points(points, srid_source, srid_dest):
+    """Return the (x, y) points transformed from srid_source to srid_dest
+
+    All points are transformed with one transformation in a single call.
+    """
+    if srid_source == srid_dest:
+        return list(points)
     source_crs = osr.SpatialReference()
     source_crs.ImportFromEPSG(srid_source)
     dest_crs = osr.SpatialReference()
@@ -37,10 +65,12 @@ def transform(wkt, srid_source, srid_dest):
         dest_crs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
 
     transformation = osr.CoordinateTransformation(source_crs, dest_crs)
+    return [point[:2] for point in transformation.TransformPoints(list(points))]
 
-    point = ogr.CreateGeometryFromWkt(wkt)
-    point.Transform(transformation)
-    return point.ExportToWkt()
+
+def point_wkb(x, y):
+    """Return the (little endian) WKB of a point"""
+    return struct.pack("<BIdd", 1, ogr.wkbPoint, x, y)
 
 
 class DataImportLogger(object):
@@ -153,8 +183,9 @@ class Importer(object):
             logger.info("sufhyd import ready = " + msg)
 
     def load_sufhyd_data(self):
-        reader = SufhydReader(open(self.import_file, "r").read(), data_log=self.log)
-        unused_fields = reader.parse_input()
+        with open(self.import_file, "r") as sufhyd_file:
+            reader = SufhydReader(sufhyd_file, data_log=self.log)
+            unused_fields = reader.parse_input()
 
         for ide_rec, unused_list in list(unused_fields.items()):
             for field, count in list(unused_list.items()):
@@ -395,6 +426,47 @@ class Importer(object):
 
         data["profiles"] = profiles
 
+    @staticmethod
+    def insert_connection_nodes(session, manholes, srid, batch_size=BATCH_SIZE):
+        """Insert a connection node for every manhole
+
+        The coordinates are transformed per source srid in one call and the
+        nodes are inserted with one executemany per batch, passing the
+        geometries as WKB.
+        """
+        insert = text(
+            "INSERT INTO {table} (code, storage_area, the_geom) "
+            "VALUES (:code, :storage_area, ST_GeomFromWKB(:the_geom, :srid))".format(
+                table=ConnectionNode.__tablename__
+            )
+        )
+        manholes_per_srid = {}
+        for manhole in manholes:
+            manholes_per_srid.setdefault(manhole["geom"][2], []).append(manhole)
+
+        for srid_source, srid_manholes in manholes_per_srid.items():
+            points = transform_points(
+                (manhole["geom"][:2] for manhole in srid_manholes), srid_source, srid
+            )
+            for start in range(0, len(srid_manholes), batch_size):
+                batch = zip(
+                    srid_manholes[start : start + batch_size],
+                    points[start : start + batch_size],
+                )
+                session.execute(
+                    insert,
+                    [
+                        {
+                            "code": manhole["code"],
+                            "storage_area": manhole["storage_area"],
+                            "the_geom": point_wkb(*point),
+                            "srid": srid,
+                        }
+                        for manhole, point in batch
+                    ],
+                )
+                session.commit()
+
     def write_data_to_db(self, data):
         """
         writes data to model database
@@ -448,7 +520,6 @@ class Importer(object):
         crs_dict = {m.code: m.id for m in crs_list}
         del crs_list
 
-        con_list = []
         srid = 4326
         if self.db.db_type == "postgres":
             geom_col = session.execute(
@@ -458,20 +529,7 @@ class Importer(object):
             )
             srid = geom_col.fetchone()[0]
 
-        for manhole in data["manholes"]:
-            wkt = transform(
-                "POINT({0} {1})".format(*manhole["geom"]), manhole["geom"][2], srid
-            )
-            con_list.append(
-                ConnectionNode(
-                    code=manhole["code"],
-                    storage_area=manhole["storage_area"],
-                    the_geom="srid={0};{1}".format(srid, wkt),
-                )
-            )
-
-        session.bulk_save_objects(con_list)
-        session.commit()
+        self.insert_connection_nodes(session, data["manholes"], srid)
 
         con_list = (
             session.query(ConnectionNode)
@@ -506,58 +564,52 @@ class Importer(object):
         con_dict[None] = None
         con_dict[""] = None
 
-        man_list = []
-        for manhole in data["manholes"]:
-            del manhole["geom"]
-            del manhole["storage_area"]
-
-            manhole["connection_node_id"] = con_dict[manhole["code"]]
-            man_list.append(Manhole(**manhole))
-
-        commit_counts["manholes"] = len(man_list)
-        session.bulk_save_objects(man_list)
-        session.commit()
-        del man_list
-
-        pipe_list = []
-        for pipe in data["pipes"]:
-            try:
-                pipe["connection_node_start_id"] = con_dict[pipe["start_node.code"]]
-            except KeyError:
-                logger.exception("Start node of pipe not found in nodes")
-                self.log.add(
-                    logging.ERROR,
-                    "Start node of pipe not found in nodes",
-                    {},
-                    "Start node {start_node} of pipe with code {code} not found",
-                    {"start_node": pipe["start_node.code"], "code": pipe["code"]},
-                )
+        def manholes():
+            for manhole in data["manholes"]:
+                del manhole["geom"]
+                del manhole["storage_area"]
+
+                manhole["connection_node_id"] = con_dict[manhole["code"]]
+                yield Manhole(**manhole)
+
+        commit_counts["manholes"] = save_in_batches(session, manholes())
+
+        def pipes():
+            for pipe in data["pipes"]:
+                try:
+                    pipe["connection_node_start_id"] = con_dict[pipe["start_node.code"]]
+                except KeyError:
+                    logger.exception("Start node of pipe not found in nodes")
+                    self.log.add(
+                        logging.ERROR,
+                        "Start node of pipe not found in nodes",
+                        {},
+                        "Start node {start_node} of pipe with code {code} not found",
+                        {"start_node": pipe["start_node.code"], "code": pipe["code"]},
+                    )
 
-            try:
-                pipe["connection_node_end_id"] = con_dict[pipe["end_node.code"]]
-            except KeyError:
-                logger.exception("End node of pipe not found in nodes")
-                self.log.add(
-                    logging.ERROR,
-                    "End node of pipe not found in nodes",
-                    {},
-                    "End node {end_node} of pipe with code {code} not found",
-                    {"end_node": pipe["end_node.code"], "code": pipe["code"]},
-                )
+                try:
+                    pipe["connection_node_end_id"] = con_dict[pipe["end_node.code"]]
+                except KeyError:
+                    logger.exception("End node of pipe not found in nodes")
+                    self.log.add(
+                        logging.ERROR,
+                        "End node of pipe not found in nodes",
+                        {},
+                        "End node {end_node} of pipe with code {code} not found",
+                        {"end_node": pipe["end_node.code"], "code": pipe["code"]},
+                    )
 
-            pipe["cross_section_definition_id"] = crs_dict[pipe["crs_code"]]
+                pipe["cross_section_definition_id"] = crs_dict[pipe["crs_code"]]
 
-            del pipe["start_node.code"]
-            del pipe["end_node.code"]
-            del pipe["crs_code"]
-            del pipe["cross_section_details"]
+                del pipe["start_node.code"]
+                del pipe["end_node.code"]
+                del pipe["crs_code"]
+                del pipe["cross_section_details"]
 
-            pipe_list.append(Pipe(**pipe))
+                yield Pipe(**pipe)
 
-        commit_counts["pipes"] = len(pipe_list)
-        session.bulk_save_objects(pipe_list)
-        session.commit()
-        del pipe_list
+        commit_counts["pipes"] = save_in_batches(session, pipes())
 
         obj_list = []
         for pump in data["pumpstations"]:
@@ -689,13 +741,9 @@ class Importer(object):
         del outlet_list
 
         # Impervious surfaces
-        imp_list = []
-        for imp in data["impervious_surfaces"]:
-            imp_list.append(ImperviousSurface(**imp))
-
-        commit_counts["impervious_surfaces"] = len(imp_list)
-        session.bulk_save_objects(imp_list)
-        session.commit()
+        commit_counts["impervious_surfaces"] = save_in_batches(
+            session, (ImperviousSurface(**imp) for imp in data["impervious_surfaces"])
+        )
 
         imp_list = (
             session.query(ImperviousSurface)
@@ -706,29 +754,33 @@ class Importer(object):
         imp_dict = {m.code: m.id for m in imp_list}
         del imp_list
 
-        map_list = []
-        for imp_map in data["impervious_surface_maps"]:
-            try:
-                imp_map["connection_node_id"] = con_dict[imp_map["node.code"]]
-            except KeyError:
-                logger.exception("Manhole connected to impervious surface not found")
-                self.log.add(
-                    logging.ERROR,
-                    "Manhole connected to impervious surface not found",
-                    {},
-                    "Node {node} of impervious surface map connected to "
-                    "impervious surface with code {code} not found",
-                    {"node": imp_map["node.code"], "code": imp_map["imp_surface.code"]},
-                )
-                continue
+        def impervious_surface_maps():
+            for imp_map in data["impervious_surface_maps"]:
+                try:
+                    imp_map["connection_node_id"] = con_dict[imp_map["node.code"]]
+                except KeyError:
+                    logger.exception(
+                        "Manhole connected to impervious surface not found"
+                    )
+                    self.log.add(
+                        logging.ERROR,
+                        "Manhole connected to impervious surface not found",
+                        {},
+                        "Node {node} of impervious surface map connected to "
+                        "impervious surface with code {code} not found",
+                        {
+                            "node": imp_map["node.code"],
+                            "code": imp_map["imp_surface.code"],
+                        },
+                    )
+                    continue
 
-            imp_map["impervious_surface_id"] = imp_dict[imp_map["imp_surface.code"]]
-            del imp_map["node.code"]
-            del imp_map["imp_surface.code"]
+                imp_map["impervious_surface_id"] = imp_dict[imp_map["imp_surface.code"]]
+                del imp_map["node.code"]
+                del imp_map["imp_surface.code"]
 
-            map_list.append(ImperviousSurfaceMap(**imp_map))
+                yield ImperviousSurfaceMap(**imp_map)
 
-        session.bulk_save_objects(map_list)
-        session.commit()
+        save_in_batches(session, impervious_surface_maps())
 
         return commit_counts
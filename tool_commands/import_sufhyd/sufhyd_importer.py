@@ -131,10 +131,17 @@ def point(x, y, srid_input=28992):
 
 
 class SufhydReader(object):
-    """class loading sufhydfile"""
+    """class loading sufhydfile
 
-    def __init__(self, content_string, data_log):
-        self.content_string = content_string
+    content is the sufhyd data as a string or an iterable of lines (e.g. an
+    open file). The lines are parsed one at a time, so only the resulting
+    records are kept in memory.
+    """
+
+    def __init__(self, content, data_log):
+        if isinstance(content, str):
+            content = [content]
+        self.content = content
         self.active_object = None
         self.output = None
         self.errors = []
@@ -143,7 +150,7 @@ class SufhydReader(object):
     def get_hydro_objects(self):
 
         hydrofact = HydroObjectFactory()
-        return hydrofact.hydroObjectListFromSUFHYD(self.content_string, self.log)
+        return hydrofact.iterHydroObjectsFromSUFHYD(self.content, self.log)
 
     def parse_input(self):
         """
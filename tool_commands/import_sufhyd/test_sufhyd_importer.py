@@ -0,0 +1,71 @@
+from osgeo import ogr
+from ThreeDiToolbox.tool_commands.import_sufhyd.import_sufhyd_main import (
+    DataImportLogger,
+)
+from ThreeDiToolbox.tool_commands.import_sufhyd.import_sufhyd_main import point_wkb
+from ThreeDiToolbox.tool_commands.import_sufhyd.import_sufhyd_main import (
+    save_in_batches,
+)
+from ThreeDiToolbox.tool_commands.import_sufhyd.import_sufhyd_main import (
+    transform_points,
+)
+from ThreeDiToolbox.tool_commands.import_sufhyd.sufhyd_importer import SufhydReader
+
+import pytest
+
+
+KNP_LINES = [
+    "*KNP   0000NOORD1                 164371100  388463700   19.14  0   100   100.000        00    5.00                   \n",  # noqa
+    "*KNP   0000NOORD2                 164381100  388473700   19.04  0   100   100.000        00    4.80                   \n",  # noqa
+]
+
+
+def test_reader_parses_lines_one_by_one():
+    def lines():
+        # a generator, like an open file: the content is never a single string
+        yield from KNP_LINES
+
+    reader = SufhydReader(lines(), data_log=DataImportLogger())
+    reader.parse_input()
+    from_lines = reader.get_data()
+
+    reader = SufhydReader("".join(KNP_LINES), data_log=DataImportLogger())
+    reader.parse_input()
+    from_string = reader.get_data()
+
+    assert len(from_lines["manholes"]) == 2
+    assert from_lines == from_string
+
+
+def test_save_in_batches():
+    class Session:
+        def __init__(self):
+            self.batches = []
+            self.commits = 0
+
+        def bulk_save_objects(self, objects):
+            self.batches.append(objects)
+
+        def commit(self):
+            self.commits += 1
+
+    session = Session()
+    assert save_in_batches(session, iter(range(5)), batch_size=2) == 5
+    assert session.batches == [[0, 1], [2, 3], [4]]
+    assert session.commits == 3
+
+
+def test_transform_points():
+    # Amersfoort, the origin of the Dutch RD coordinate system
+    points = transform_points([(155000.0, 463000.0), (155000.0, 463000.0)], 28992, 4326)
+    assert len(points) == 2
+    assert points[0] == pytest.approx((5.3872, 52.1552), abs=1e-3)
+
+
+def test_transform_points_same_srid():
+    assert transform_points(iter([(1.0, 2.0)]), 28992, 28992) == [(1.0, 2.0)]
+
+
+def test_point_wkb():
+    geometry = ogr.CreateGeometryFromWkb(point_wkb(1.5, 2.5))
+    assert geometry.ExportToWkt() == "POINT (1.5 2.5)"
@@ -1204,6 +1204,23 @@ class HydroObjectFactory(object):
         if strict is True:
             raise RuntimeError('SUFHYD data does not match any pattern ("%s")' % persid)
 
+    def iterHydroObjectsFromSUFHYD(self, lines, data_log=None, strict=False):
+        """yield the objects of SUFHYD input, one line at a time.
+
+        lines is an iterable of strings, e.g. an open file, so a SUFHYD file
+        never needs to be in memory as a whole. A string may contain multiple
+        lines. Non parseable lines are handled as in hydroObjectListFromSUFHYD.
+        The AlgemeneInformatie records are yielded as they are.
+        """
+        self.log = data_log
+        for line in lines:
+            for persid in re.split("[\n\r]+", line):
+                if not persid:
+                    continue
+                obj = self.hydroObjectFromSUFHYD(persid, strict)
+                if obj:
+                    yield obj
+
     def hydroObjectListFromSUFHYD(self, input, data_log=None, strict=False):
         """
 
@@ -1212,15 +1229,7 @@ class HydroObjectFactory(object):
           else: ignore those parts.
         """
 
-        self.log = data_log
-        # logger.info('logging non parsed input as WARNING')
-        result = [
-            self.hydroObjectFromSUFHYD(i, strict)
-            for i in re.split("[\n\r]+", input)
-            if i
-        ]
-        result = [i for i in result if i]
-        # logger.info('end of non parsed input')
+        result = list(self.iterHydroObjectsFromSUFHYD([input], data_log, strict))
 
         ai_list = [i for i in result if i.__class__ == AlgemeneInformatie]
         if ai_list:
@@ -2,16 +2,8 @@
 from cached_property import cached_property
 from gdal import GA_ReadOnly
 from osgeo import gdal
+from osgeo import ogr
 from osgeo import osr
-from qgis.core import QgsCoordinateReferenceSystem
-from qgis.core import QgsFeature
-from qgis.core import QgsField
-from qgis.core import QgsFields
-from qgis.core import QgsGeometry
-from qgis.core import QgsPointXY
-from qgis.core import QgsVectorFileWriter
-from qgis.core import QgsWkbTypes
-from qgis.PyQt.QtCore import QVariant
 from sqlalchemy import MetaData
 from sqlalchemy.ext.declarative import declarative_base
 from ThreeDiToolbox.tool_commands.raster_checker import raster_checker_log
@@ -56,7 +48,7 @@ class RasterChecker(object):
 
         self.progress_bar = None
         self.unique_id_name = []
-        self.too_many_wrong_pixels = False
+        self.input_data_shp = []
 
         # some check constants
         self.no_data_value_int = -9999
@@ -609,47 +601,17 @@ class RasterChecker(object):
 
     def check_pixel_alignment(self, setting_id, rast_item, check_id, dem):
         """
-        # we will check pixel alignment for raster A and B only if:
-        # - diff between nr data pixels A and nr data pixels B < 50000, and
-        # - diff between nr nodata pixels A and nr nodata pixels B < 50000
-        # Otherwise it likely that this check takes too long.
+        # we compare raster A (dem) and B blockwise: a pixel is wrong if it is
+        # data in A and nodata in B, or the other way around. The wrong pixels
+        # are burned into a compact (sparse, compressed) in-memory mask raster
+        # that create_shp() later turns into polygons with gdal.Polygonize.
         :param setting_id:
         :param rast_item:
         :param check_id:
         :param dem:
         :return:
         """
-
         detail = ""
-        [(dem_cnt_data, dem_cnt_nodata, cnt_data, cnt_nodata)] = [
-            (
-                chck.get("dem_cnt_data"),
-                chck.get("dem_cnt_nodata"),
-                chck.get("cnt_data"),
-                chck.get("cnt_nodata"),
-            )
-            for chck in self.results.store_cnt_data_nodata
-            if chck.get("raster") == rast_item and chck.get("setting_id") == setting_id
-        ]
-        diff_data = abs(dem_cnt_data - cnt_data)
-        diff_nodata = abs(dem_cnt_nodata - cnt_nodata)
-        max_wrong_pixels = 50000
-        if diff_data > max_wrong_pixels or diff_nodata > max_wrong_pixels:
-            detail = (
-                "Wrong pixels are not written too .shp as too many "
-                "wrong pixels were found"
-            )
-            self.too_many_wrong_pixels = True
-            result = False
-            self.results._add(
-                setting_id=setting_id,
-                raster=rast_item,
-                check_id=check_id,
-                result=result,
-                detail=detail,
-            )
-            return
-
         dem_path = os.path.join(self.sqlite_dir, dem)
         dem_raster = gdal.Open(dem_path, GA_ReadOnly)
         dem_band = dem_raster.GetRasterBand(1)
@@ -667,33 +629,40 @@ class RasterChecker(object):
         )
         self.progress_bar.increase_progress(progress_per_raster)
 
-        self.pixel_specs = self.get_pixel_specs(dem_path)
-
-        found_wrong_pixel = False
-        wrong_pixels_list = []
+        mask_raster = None
+        nr_wrong_pixels = 0
 
         # compare two rasters blockwise
-        for data1, data2 in list(
-            zip(generator_dem.__next__(), generator_other.__next__())
-        ):
-            wrong_pixels = self.compare_pixel_bbox(data1, data2)
-            if wrong_pixels:
-                found_wrong_pixel = True
-                wrong_pixels_list.append(wrong_pixels)
+        for data1, data2 in zip(generator_dem.__next__(), generator_other.__next__()):
+            compare_mask = self.compare_pixel_bbox(data1, data2)
+            if compare_mask is None:
+                continue
+            if mask_raster is None:
+                mask_raster = self.create_mask_raster(dem_raster, setting_id, rast_item)
+            bbox1 = data1[0]
+            mask_raster.GetRasterBand(1).WriteArray(
+                compare_mask.astype(np.uint8), bbox1[0], bbox1[1]
+            )
+            nr_wrong_pixels += int(np.count_nonzero(compare_mask))
 
         dem_raster = None  # close raster
         other_tif_raster = None  # close raster
 
-        if found_wrong_pixel:
+        if mask_raster is not None:
+            mask_raster.FlushCache()
             self.input_data_shp.append(
                 {
                     "setting_id": setting_id,
                     "raster": rast_item,
-                    "coords": wrong_pixels_list,
+                    "mask": mask_raster,
+                    "nr_wrong_pixels": nr_wrong_pixels,
                 }
             )
             result = False
-            detail = "the mismatch locations have been written to .shp file"
+            detail = (
+                "%d mismatch pixels, their locations have been written to "
+                ".shp file" % nr_wrong_pixels
+            )
         else:
             result = True
         self.results._add(
@@ -704,6 +673,31 @@ class RasterChecker(object):
             detail=detail,
         )
 
+    @staticmethod
+    def create_mask_raster(dem_raster, setting_id, rast_item):
+        """Return an empty Byte mask raster with the same grid as the dem.
+
+        The mask lives in GDAL's in-memory filesystem as a tiled, sparse and
+        deflate compressed GeoTIFF: blocks without wrong pixels are never
+        allocated, so even a mask of a country-wide dem stays small.
+        """
+        mask_path = "/vsimem/raster_checker_mask_%s_%s.tif" % (
+            setting_id,
+            rast_item.replace("/", "_").replace("\\", "_"),
+        )
+        driver = gdal.GetDriverByName("GTiff")
+        mask_raster = driver.Create(
+            mask_path,
+            dem_raster.RasterXSize,
+            dem_raster.RasterYSize,
+            1,
+            gdal.GDT_Byte,
+            options=["TILED=YES", "SPARSE_OK=TRUE", "COMPRESS=DEFLATE"],
+        )
+        mask_raster.SetGeoTransform(dem_raster.GetGeoTransform())
+        mask_raster.SetProjection(dem_raster.GetProjection())
+        return mask_raster
+
     def get_nr_blocks(self, raster_path):
         raster = gdal.Open(raster_path, GA_ReadOnly)
         band = raster.GetRasterBand(1)
@@ -718,68 +712,12 @@ class RasterChecker(object):
         while True:
             yield self.iter_blocks(band, block_width=w, block_height=h)
 
-    @staticmethod
-    def get_pixel_specs(dem_path):
-        dem = gdal.Open(dem_path, GA_ReadOnly)
-        ulx, xres, xskew, uly, yskew, yres = dem.GetGeoTransform()
-        pixelsize = abs(min(xres, yres))
-        pixel_specs = (ulx, xres, xskew, uly, yskew, yres, pixelsize)
-        return pixel_specs
-
-    def get_wrong_pixel(self, bbox1, compare_mask):
-        """The function finds the x,y coordinates (in same projection as the
-        dem) of wrong pixels:
-        - where dem is data and other raster nodata
-        - where dem is nodata and other raster data
-        We dont analyse whole raster at once, but blockwise (per boundingbox).
-        Each pixel is represented by a column nr (in the end used to get
-        x-coor) and a row nr (in the end used to get y-coor).
-        :param setting_id: int (v2_global_setting id of model entry)
-        :param bbox1:
-        :param compare_mask:
-        :return: coords
-        """
-        ulx, xres, xskew, uly, yskew, yres, pixelsize = self.pixel_specs
-
-        # get the column and row nr of the left upper pixel of bounding box
-        # the left upper pixel of whole rasters has column = 0 and row = 0
-        # Going south row nr increases. Going right column nr increases
-        ul_col = bbox1[0]
-        ul_row = bbox1[1]
-
-        # indices in the bbox of wrong (True) pixels
-        bbox_idx = np.argwhere(compare_mask)
-        # bbox_idx is 2D np.array:
-        # 1st element = nth column (in west-east direction) in bbox
-        # 2nd element = nth row (in north-south direction) in bbox
+    def compare_pixel_bbox(self, data1, data2):
+        """Return a boolean mask of the wrong pixels in one block, or None.
 
+        A pixel is wrong where the dem is data and the other raster nodata, or
+        where the dem is nodata and the other raster data.
         """
-        # 1. indices in the whole raster of wrong (True) pixels
-        raster_idx = bbox_idx + [ul_row, ul_col]
-        # 1st element = nth column (in west-east direction) in whole raster
-        # 2nd element = nth row (in north-south direction) in whole raster
-
-        # 2. distance from whole raster's lup corner to wrong pixels
-        distance = raster_idx * pixelsize
-
-        # 3. now get the centre coords (remember: row=y, col=x) of wrong pixels
-        coords = [uly, ulx] + (distance * [-1, 1]) + \
-                        [-0.5 * pixelsize, 0.5 * pixelsize]
-        # 1st element (y-dir) is "distance *-1" as we substract to go south
-        # 2nd element (x-dir) is "distance -1" as we add to go east
-        # times 0.5 because we want centre coord and not left up corner
-        """
-
-        # all (1, 2 and 3) in once:
-        coords = (
-            [uly, ulx]
-            + ((bbox_idx + [ul_row, ul_col]) * pixelsize) * [-1, 1]
-            + [-0.5 * pixelsize, 0.5 * pixelsize]
-        )
-        # note that: x = coords[:][0] and y = coords[:][1]
-        return coords
-
-    def compare_pixel_bbox(self, data1, data2):
         bbox1, arr1 = data1
         bbox2, arr2 = data2
         # create masks (without data and fill_value. Only mask)
@@ -790,8 +728,7 @@ class RasterChecker(object):
         # is there any True in the compare mask? then there is at least
         # one wrong pixel
         if np.any(compare_mask):
-            coords = self.get_wrong_pixel(bbox1, compare_mask)
-            return coords.tolist()
+            return compare_mask
 
     def run_check(self, base_check_name, **kwargs):
         prefix = "check_"
@@ -982,55 +919,75 @@ class RasterChecker(object):
         self.progress_bar.set_progress(100)
 
     def create_shp(self):
-        fields = QgsFields()
-        fields.append(QgsField("setting_id", QVariant.String))
-        fields.append(QgsField("raster", QVariant.String))
-        fields.append(QgsField("x centre", QVariant.String))
-        fields.append(QgsField("y centre", QVariant.String))
+        """Write the wrong pixels of all rasters as polygons to a shapefile.
 
+        Each mask raster is vectorized with gdal.Polygonize, so neighbouring
+        wrong pixels end up in one polygon instead of one point per pixel.
+        """
         self.shape_path = self.results.log_path.split(".log")[0] + ".shp"
-        writer = QgsVectorFileWriter(
-            self.shape_path,
-            "CP1250",
-            fields,
-            QgsWkbTypes.Point,
-            QgsCoordinateReferenceSystem(),
-            "ESRI Shapefile",
-        )
+        driver = ogr.GetDriverByName("ESRI Shapefile")
+        if os.path.exists(self.shape_path):
+            driver.DeleteDataSource(self.shape_path)
         try:
-            if writer.hasError() != QgsVectorFileWriter.NoError:
-                msg = "Error while creating shapefile: " + str(writer.errorMessage())
+            data_source = driver.CreateDataSource(self.shape_path)
+            if data_source is None:
+                msg = "Error while creating shapefile: %s" % self.shape_path
                 logger.error(msg)
                 raise Exception(msg)
-            else:
-                for pixel_check_dict in self.input_data_shp:
-                    raster = pixel_check_dict.get("raster")
-                    setting_id = pixel_check_dict.get("setting_id")
-                    coords = pixel_check_dict.get("coords")
-                    for row in coords:
-                        for point in row:
-                            point_y = point[0]
-                            point_x = point[1]
-                            feat = QgsFeature()
-                            feat.setGeometry(
-                                QgsGeometry.fromPointXY(QgsPointXY(point_x, point_y))
-                            )
-                            feat.setAttributes([setting_id, raster, point_x, point_y])
-                            writer.addFeature(feat)
+            # all masks share the grid of a dem, which is in the same projection
+            srs = osr.SpatialReference()
+            srs.ImportFromWkt(self.input_data_shp[0]["mask"].GetProjection())
+            layer = data_source.CreateLayer("wrong_pixels", srs, ogr.wkbPolygon)
+            layer.CreateField(ogr.FieldDefn("setting_id", ogr.OFTString))
+            layer.CreateField(ogr.FieldDefn("raster", ogr.OFTString))
+            layer.CreateField(ogr.FieldDefn("nr_pixels", ogr.OFTInteger))
+            definition = layer.GetLayerDefn()
+            memory_driver = ogr.GetDriverByName("Memory")
+            for pixel_check_dict in self.input_data_shp:
+                mask_raster = pixel_check_dict["mask"]
+                mask_band = mask_raster.GetRasterBand(1)
+                _, xres, _, _, _, yres = mask_raster.GetGeoTransform()
+                pixel_area = abs(xres * yres)
+                memory_source = memory_driver.CreateDataSource("")
+                memory_layer = memory_source.CreateLayer("mask", srs, ogr.wkbPolygon)
+                # use the mask band as its own mask: only the wrong pixels (1)
+                # become polygons
+                gdal.Polygonize(mask_band, mask_band, memory_layer, -1, [])
+                for memory_feature in memory_layer:
+                    geom = memory_feature.GetGeometryRef()
+                    feature = ogr.Feature(definition)
+                    feature.SetGeometry(geom)
+                    feature.SetField("setting_id", str(pixel_check_dict["setting_id"]))
+                    feature.SetField("raster", pixel_check_dict["raster"])
+                    feature.SetField(
+                        "nr_pixels", int(round(geom.GetArea() / pixel_area))
+                    )
+                    layer.CreateFeature(feature)
+                memory_source = None
         except Exception:
-            # TODO: there's a "raise" inside the try, there's a raise
-            # below. What's the intention?
             logger.exception("Error creating shapefile")
-            raise AssertionError("could not write XY point to shp file")
-        # delete the writer to flush features to disk
-        del writer
+            raise AssertionError("could not write wrong pixels to shp file")
+        finally:
+            self.close_mask_rasters()
+        # dereference the data source to flush features to disk
+        data_source = None
+
+    def close_mask_rasters(self):
+        """Close the in-memory mask rasters and free their /vsimem files."""
+        for pixel_check_dict in self.input_data_shp:
+            mask_raster = pixel_check_dict.pop("mask", None)
+            if mask_raster is None:
+                continue
+            mask_path = mask_raster.GetDescription()
+            mask_raster = None  # close raster
+            gdal.Unlink(mask_path)
 
     def pop_up_finished(self):
         header = "Raster checker is finished"
         if self.need_to_create_shp:
             msg = (
                 "The check results have been written to: \n %s \n "
-                "The coordinates of wrong pixels are written to: \n"
+                "The locations of wrong pixels are written to: \n"
                 "%s" % (self.results.log_path, self.shape_path)
             )
         else:
@@ -1047,32 +1004,27 @@ class RasterChecker(object):
             logger.error("Layer %s failed to load!", self.shape_path)
 
     def pop_up_finished_or_question(self):
-        """3 things (columns below) can be true or false. Dependent on that we
+        """2 things (columns below) can be true or false. Dependent on that we
         return a pop_up_info (user clicks okay),
         pop_up_question (user clicks yes/no), Assertionerror
 
-            self.results.nr_error_logrows   self.need_to_create_shp self.too_many_wrong_pixels (more rows than shp can handle)
-            count_error > 0                 shp contains pixels     too many pixels for shp
-        1.  True                            False                   False   --> pop_up_info
-        2.  True                            False                   True    --> pop_up_info + warning
-        3.  True                            True                    False   --> pop_up_question
-        4.  True                            True                    True    --> pop_up_question + warning
-        5.  False                           False                   False   --> pop_up_info
-        6.  False                           False                   True    --> raise AssertionError
-        7.  False                           True                    False   --> raise AssertionError
-        8.  False                           True                    True    --> raise AssertionError
+            self.results.nr_error_logrows   self.need_to_create_shp
+            count_error > 0                 shp contains wrong pixels
+        1.  True                            False   --> pop_up_info
+        2.  True                            True    --> pop_up_question
+        3.  False                           False   --> pop_up_info
+        4.  False                           True    --> raise AssertionError
         """
 
         nr_errors = self.results.nr_error_logrows
         create_shp = self.need_to_create_shp
-        too_many_wrong_pixels = self.too_many_wrong_pixels
         nr_warnings = self.results.nr_warning_logrows
 
         header = "Raster checker is finished"
         question = "Do you want to add .shp to current view?"
 
-        # case 1
-        if nr_errors > 0 and not create_shp and not too_many_wrong_pixels:
+        # case 1 and 3
+        if not create_shp:
             # pop_up_info
             msg = (
                 "Found %d errors, %d warnings (see .log) and no wrong pixels. \n\n"
@@ -1081,53 +1033,19 @@ class RasterChecker(object):
             )
             pop_up_info(msg, header)
         # case 2
-        elif nr_errors > 0 and not create_shp and too_many_wrong_pixels:
-            # pop_up_info + warning
-            msg = (
-                "Found %d errors, %d warnings (see .log). \n"
-                "Found too many wrong pixels to write to .shp file "
-                "(see .log). \n\n "
-                "The check results have been written to: \n "
-                "%s" % (nr_errors, nr_warnings, self.results.log_path)
-            )
-            pop_up_info(msg, header)
-        # case 3
-        elif nr_errors > 0 and create_shp and not too_many_wrong_pixels:
+        elif nr_errors > 0:
             # pop_up_question
             msg = (
                 "Found %d errors, %d warnings and some wrong pixels. \n\n "
                 "The check results have been written to: \n %s \n\n "
-                "The coordinates of wrong pixels are written to: \n %s"
+                "The locations of wrong pixels are written to: \n %s"
                 % (nr_errors, nr_warnings, self.results.log_path, self.shape_path)
             )
             pop_up_info(msg, header)
             if pop_up_question(question, "Add shapefile?"):
                 self.add_shp_to_iface()
         # case 4
-        elif nr_errors > 0 and create_shp and too_many_wrong_pixels:
-            # pop_up_question + warning
-            msg = (
-                "Found %d errors, %d warnings and some wrong pixels. \n "
-                "Also found for 1 or more rasters too many wrong pixels "
-                "to write to .shp file. \n\n"
-                "The check results have been written to: \n %s \n\n "
-                "The coordinates of wrong pixels are written to: \n %s"
-                % (nr_errors, nr_warnings, self.results.log_path, self.shape_path)
-            )
-            pop_up_info(msg, header)
-            if pop_up_question(question, "Add shapefile?"):
-                self.add_shp_to_iface()
-        # case 5
-        elif nr_errors == 0 and not create_shp and not too_many_wrong_pixels:
-            # pop_up_info()
-            msg = (
-                "Found %d errors, %d warnings (see .log) and no wrong pixels. \n\n "
-                "The check results have been written to: \n "
-                "%s" % (nr_errors, nr_warnings, self.results.log_path)
-            )
-            pop_up_info(msg, header)
-        # scenario 6, 7, or 8
-        elif nr_errors == 0 and create_shp ^ too_many_wrong_pixels:
+        else:
             raise AssertionError("this result combination is impossible")
 
     def run(self, tasks):
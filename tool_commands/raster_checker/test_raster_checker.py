@@ -15,6 +15,7 @@ from ThreeDiToolbox.tool_commands.raster_checker.raster_checker_prework import (
 from ThreeDiToolbox.utils.threedi_database import ThreediDatabase
 
 import mock
+import numpy as np
 import os
 import unittest
 import unittest.mock
@@ -485,14 +486,21 @@ class TestRasterChecker(unittest.TestCase):
         self.checker.check_pixel_alignment(setting_id, rast_item, check_id, dem)
         result = self.get_result()
         self.assertFalse(result)
-        input_data_shp_expect = [
-            {
-                "raster": rast_item,
-                "coords": [[[8.5, 1.5], [0.5, 0.5], [0.5, 6.5]]],
-                "setting_id": setting_id,
-            }
+        [pixel_check_dict] = self.checker.input_data_shp
+        self.assertEqual(pixel_check_dict["raster"], rast_item)
+        self.assertEqual(pixel_check_dict["setting_id"], setting_id)
+        self.assertEqual(pixel_check_dict["nr_wrong_pixels"], 3)
+        # the mask raster has the dem grid: derive the wrong pixel centres (y, x)
+        mask_raster = pixel_check_dict["mask"]
+        ulx, xres, _, uly, _, yres = mask_raster.GetGeoTransform()
+        wrong_rows, wrong_cols = np.nonzero(mask_raster.ReadAsArray())
+        centres = [
+            [uly + (row + 0.5) * yres, ulx + (col + 0.5) * xres]
+            for row, col in zip(wrong_rows, wrong_cols)
         ]
-        self.assertEqual(self.checker.input_data_shp, input_data_shp_expect)
+        self.assertEqual(sorted(centres), sorted([[8.5, 1.5], [0.5, 0.5], [0.5, 6.5]]))
+        self.checker.close_mask_rasters()
+        self.assertNotIn("mask", pixel_check_dict)
 
     def test_get_check_ids_names(self):
         self.assertTrue(hasattr(self.checker, "get_check_ids_names"))
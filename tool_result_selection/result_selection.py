@@ -8,7 +8,6 @@ from qgis.PyQt.QtCore import QUrl
 from qgis.PyQt.QtNetwork import QNetworkRequest
 from qgis.PyQt.QtWidgets import QFileDialog
 from ThreeDiToolbox.tool_result_selection import models
-from ThreeDiToolbox.tool_result_selection import result_selection_view
 from ThreeDiToolbox.utils.user_messages import messagebar_message
 from ThreeDiToolbox.utils.user_messages import pop_up_info
 from urllib.parse import urlparse
@@ -108,6 +107,10 @@ class ThreeDiResultSelection(QObject):
             self.is_active = True
 
             if self.dialog is None:
+                # Late import: the dialog (with the lizard connector) is only
+                # needed when the tool is used, not at the start of QGIS.
+                from ThreeDiToolbox.tool_result_selection import result_selection_view
+
                 # Create the dialog (after translation) and keep reference
                 self.dialog = result_selection_view.ThreeDiResultSelectionWidget(
                     parent=None,
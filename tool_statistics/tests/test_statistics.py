@@ -73,6 +73,10 @@ class TestStatistics(unittest.TestCase):
         self.assertTrue(os.path.exists(model_sqlite_path))
         self.assertTrue(os.path.exists(gridadmin_sqlite_path))
 
+    def test_results_are_not_cached(self):
+        # every timestep is read once, so no variable is kept in memory
+        self.assertEqual(self.stat.ts_datasources.threedi_result()._cache, {})
+
     def test_flowline_stats_view(self):
         resultdb_path = self.stat.ts_datasources.sqlite_gridadmin_filepath()
         con_res = dbapi.connect(resultdb_path)
@@ -12,14 +12,13 @@ from collections import OrderedDict
 from qgis.core import QgsDataSourceUri
 from qgis.core import QgsProject
 from qgis.core import QgsVectorLayer
-from sqlalchemy import create_engine
 from sqlalchemy import func
 from sqlalchemy import MetaData
-from sqlalchemy.event import listen
 from sqlalchemy.orm import sessionmaker
 from sqlite3 import dbapi2
 from ThreeDiToolbox.datasource.threedi_results import ThreediResult
-from ThreeDiToolbox.utils.threedi_database import load_spatialite
+from ThreeDiToolbox.utils.threedi_database import ThreediDatabase
+from ThreeDiToolbox.utils.timing import timed
 from ThreeDiToolbox.utils.user_messages import pop_up_info
 from ThreeDiToolbox.utils.user_messages import pop_up_question
 from ThreeDiToolbox.utils.user_messages import progress_bar
@@ -90,7 +89,7 @@ class StatisticsTool(object):
         self.ts_datasources = ts_datasources
 
         self.icon_path = ":/plugins/ThreeDiToolbox/icons/icon_statistical_analysis.png"
-        self.menu_text = u"Statistical Tool"
+        self.menu_text = "Statistical Tool"
 
         self.plugin_is_active = False
         self.widget = None
@@ -108,13 +107,10 @@ class StatisticsTool(object):
     def get_modeldb_session(self):
 
         if self.modeldb_engine is None:
-            self.modeldb_engine = create_engine(
-                "sqlite:///{0}".format(self.ts_datasources.model_spatialite_filepath),
-                echo=False,
-            )
-            listen(self.modeldb_engine, "connect", load_spatialite)
-
-            # activate the spatialite extension!
+            # the shared engine (with the spatialite extension already loaded)
+            self.modeldb_engine = ThreediDatabase(
+                {"db_path": self.ts_datasources.model_spatialite_filepath}
+            ).engine
 
             self.modeldb_meta = MetaData()
             self.modeldb_meta.reflect(bind=self.modeldb_engine)
@@ -217,6 +213,7 @@ class StatisticsTool(object):
             != 0
         )
 
+    @timed("statistics.manholes")
     def get_manhole_attributes_and_statistics(self):
         """read manhole information from model spatialite and put in manhole statistic table"""
 
@@ -264,8 +261,7 @@ class StatisticsTool(object):
         if "s1_max" in self.ds.available_vars:
             agg_h_max = True
             h_max = np.full(nr_manholes, -9999.0)
-            for i, timestamp in enumerate(self.ds.get_timestamps(parameter="s1_max")):
-                h = self.ds.get_values_by_timestep_nr("s1_max", i, node_ids=manhole_idx)
+            for h in self.ds.iter_values_by_timestep("s1_max", node_ids=manhole_idx):
                 # unmask result (dry cells no have -9999 values
                 h_array = np.asarray(h)
                 h_max = np.maximum(h_max, h_array)
@@ -278,14 +274,15 @@ class StatisticsTool(object):
         t_water_surface = np.zeros(nr_manholes, dtype=np.float32)
 
         # loop over timestamps and calculate statistics
+        # read data from netcdf using index to get only manholes. Every
+        # timestep is read once, so the timesteps are read in blocks (not cached).
+        h_values = self.ds.iter_values_by_timestep("s1", node_ids=manhole_idx)
         prev_timestamp = 0.0
-        for i, timestamp in enumerate(self.ds.timestamps):
+        for i, (timestamp, h) in enumerate(zip(self.ds.timestamps, h_values)):
             logger.debug("timestamp %i - %i s", i, timestamp)
 
             timestep = timestamp - prev_timestamp
             prev_timestamp = timestamp
-            # read data from netcdf using index to get only manholes
-            h = self.ds.get_values_by_timestep_nr("s1", i, node_ids=manhole_idx)
 
             # unmask result (dry cells no have -9999 values
             h_array = np.asarray(h)
@@ -296,7 +293,7 @@ class StatisticsTool(object):
             t_water_surface[h >= manhole_surface_level] += timestep
 
         h_end = self.ds.get_values_by_timestep_nr(
-            "s1", len(self.ds.timestamps) - 1, node_ids=manhole_idx
+            "s1", len(self.ds.timestamps) - 1, node_ids=manhole_idx, use_cache=False
         )
 
         manhole_stats = []
@@ -441,12 +438,14 @@ class StatisticsTool(object):
             result = self.ds.get_values_by_timestep_nr(
                 parameter_name,
                 len(self.ds.get_timestamps(parameter=parameter_name)) - 1,
+                use_cache=False,
             )
         else:
             agg_cum = False
             result = np.zeros(nr)
         return result, agg_cum
 
+    @timed("statistics.flowlines")
     def calc_flowline_statistics(self):
 
         ds = self.ds
@@ -477,14 +476,20 @@ class StatisticsTool(object):
         hmax_end = np.full(ds.nFlowLine, -9999.0)
         dh_max_calc = True
 
+        # every timestep is read once, in blocks of timesteps (not cached)
+        values = zip(
+            ds.timestamps,
+            ds.iter_values_by_timestep("q"),
+            ds.iter_values_by_timestep("u1"),
+            ds.iter_values_by_timestep("s1", node_ids=start_idx),
+            ds.iter_values_by_timestep("s1", node_ids=end_idx),
+        )
         prev_timestamp = 0.0
-        for i, timestamp in enumerate(ds.timestamps):
+        for i, (timestamp, q, v, h_start, h_end) in enumerate(values):
             logger.debug("timestamp %i - %i s", i, timestamp)
             timestep = timestamp - prev_timestamp
             prev_timestamp = timestamp
 
-            q = ds.get_values_by_timestep_nr("q", i)
-
             if not agg_q_cum:
                 # todo: most accurate way to calculate cum based on normal netcdf
                 qcum += q * timestep
@@ -497,13 +502,9 @@ class StatisticsTool(object):
             qmax = np.maximum(qmax, q)
             qmin = np.minimum(qmin, q)
 
-            v = ds.get_values_by_timestep_nr("u1", i)
             vmax = np.maximum(vmax, v)
             vmin = np.minimum(vmin, v)
 
-            h_start = ds.get_values_by_timestep_nr("s1", i, node_ids=start_idx)
-            h_end = ds.get_values_by_timestep_nr("s1", i, node_ids=end_idx)
-
             try:
                 np.copyto(
                     dh_max, np.maximum(dh_max, np.asarray(np.absolute(h_start - h_end)))
@@ -529,13 +530,17 @@ class StatisticsTool(object):
         np.copyto(direction, -1, where=vmax < -1 * vmin)
         vmax = np.maximum(vmax, -1 * vmin) * direction
 
-        qend = ds.get_values_by_timestep_nr("q", len(ds.timestamps) - 1)
-        vend = ds.get_values_by_timestep_nr("u1", len(ds.timestamps) - 1)
+        qend = ds.get_values_by_timestep_nr(
+            "q", len(ds.timestamps) - 1, use_cache=False
+        )
+        vend = ds.get_values_by_timestep_nr(
+            "u1", len(ds.timestamps) - 1, use_cache=False
+        )
         hend_start = ds.get_values_by_timestep_nr(
-            "s1", len(ds.timestamps) - 1, node_ids=start_idx
+            "s1", len(ds.timestamps) - 1, node_ids=start_idx, use_cache=False
         )
         hend_end = ds.get_values_by_timestep_nr(
-            "s1", len(ds.timestamps) - 1, node_ids=end_idx
+            "s1", len(ds.timestamps) - 1, node_ids=end_idx, use_cache=False
         )
 
         # save stats to the database
@@ -674,6 +679,7 @@ class StatisticsTool(object):
                 "weir_stats", "perc_volume_negative", False, param, avg_timestep
             )
 
+    @timed("statistics.pipes_and_weirs")
     def calc_pipe_and_weir_statistics(self):
 
         res_session = self.db.get_session()
@@ -876,6 +882,7 @@ class StatisticsTool(object):
 
         res_session.commit()
 
+    @timed("statistics.pumps")
     def get_pump_attributes_and_statistics(self):
         """read manhole information from model spatialite and put in manhole statistic table"""
         res_session = self.db.get_session()
@@ -905,21 +912,23 @@ class StatisticsTool(object):
         q_max = np.zeros(nr_pumps, dtype=np.float32)
 
         # loop over timestamps and calculate statistics
+        # every timestep is read once, in blocks of timesteps (not cached)
+        q_values = self.ds.iter_values_by_timestep("q_pump")
         prev_timestamp = 0.0
-        for i, timestamp in enumerate(self.ds.timestamps):
+        for i, (timestamp, q) in enumerate(zip(self.ds.timestamps, q_values)):
             logger.debug("timestamp %i - %i s", i, timestamp)
 
             timestep = timestamp - prev_timestamp
             prev_timestamp = timestamp
-            # read data from netcdf using index to get only manholes
-            q = self.ds.get_values_by_timestep_nr("q_pump", i)
             # calculate statistics
             if not agg_q_cum:
                 q_cum += q * timestep
 
             q_max = np.maximum(q_max, q)
 
-        q_end = self.ds.get_values_by_timestep_nr("q_pump", len(self.ds.timestamps) - 1)
+        q_end = self.ds.get_values_by_timestep_nr(
+            "q_pump", len(self.ds.timestamps) - 1, use_cache=False
+        )
 
         pump_stats = []
         logger.info("Make Pumpline statistic instances ")
@@ -1010,6 +1019,7 @@ class StatisticsTool(object):
             )
         return
 
+    @timed("statistics.line_views")
     def create_line_views(self):
 
         session = self.db.get_session()
@@ -1215,6 +1225,7 @@ class StatisticsTool(object):
 
         session.commit()
 
+    @timed("statistics.node_views")
     def create_node_views(self):
         session = self.db.get_session()
 
@@ -1313,6 +1324,7 @@ class StatisticsTool(object):
 
         session.commit()
 
+    @timed("statistics.pump_views")
     def create_pump_views(self):
         session = self.db.get_session()
 
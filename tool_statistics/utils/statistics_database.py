@@ -1,5 +1,6 @@
 from ..sql_models.statistics import Base
 from osgeo import ogr
+from ThreeDiToolbox.utils.threedi_database import dispose_engine
 from ThreeDiToolbox.utils.threedi_database import ThreediDatabase
 
 import copy
@@ -25,6 +26,9 @@ class StaticsticsDatabase(ThreediDatabase):
         if self.db_type == "spatialite":
 
             if overwrite and os.path.isfile(self.settings["db_file"]):
+                # pooled connections would still point to the removed file
+                self._engine = None
+                dispose_engine(self.db_type, self.settings, self.echo)
                 os.remove(self.settings["db_file"])
 
             drv = ogr.GetDriverByName("SQLite")
@@ -321,6 +321,19 @@ def test_barmanger_2d_groundwater(wb_widget):
     assert bm_2d_groundwater.xlabels == expected_labels
 
 
+def test_balance_prefix_sums():
+    ts = np.array([0.0, 10.0, 20.0, 40.0])
+    ts_series = np.array([[0.0, 1.0], [1.0, -1.0], [-2.0, 2.0], [3.0, 0.5]])
+    prefix_sums = waterbalance_widget.BalancePrefixSums(ts, ts_series)
+    # volumes = [[0, 0], [10, -10], [-20, 20], [60, 10]]
+    assert prefix_sums.balance_in([0]) == 70.0
+    assert prefix_sums.balance_out([0]) == -20.0
+    assert prefix_sums.balance_in([0, 1], t1=10, t2=40) == 30.0
+    assert prefix_sums.balance_out([0, 1], t1=10, t2=40) == -30.0
+    # an empty range
+    assert prefix_sums.balance_in([0, 1], t1=40, t2=10) == 0.0
+
+
 @pytest.fixture()
 @mock.patch("ThreeDiToolbox.tool_result_selection.models.StatusProgressBar")
 def waterbalance_widget_timeseries(progress_bar_mock, wb_widget, wb_polygon):
@@ -419,3 +432,41 @@ def test_waterbalance_closure(
     assert _helper_round_numpy(
         sum([d_vol_1d, d_vol_2d, d_vol_2d_gr])
     ) == _helper_round_numpy(d_vol_net)
+
+
+def test_barchart_data_is_cached(wb_widget):
+    ts = np.array([0.0, 10.0, 20.0])
+    ts_series = np.ones((3, len(waterbalance_widget.INPUT_SERIES)))
+    wb_widget.calc_wb_barchart = mock.Mock(return_value=(ts, ts_series))
+    first = wb_widget._get_barchart_data()
+    assert wb_widget._get_barchart_data() is first
+    assert wb_widget.calc_wb_barchart.call_count == 1
+
+
+def test_update_barchart_follows_time_range(wb_widget):
+    ts = np.array([0.0, 10.0, 20.0])
+    ts_series = np.ones((3, len(waterbalance_widget.INPUT_SERIES)))
+    wb_widget.calc_wb_barchart = mock.Mock(return_value=(ts, ts_series))
+    wb_widget.bm_net = waterbalance_widget.BarManager(wb_widget._get_io_series_net())
+    wb_widget.bm_2d = waterbalance_widget.BarManager(wb_widget._get_io_series_2d())
+    wb_widget.bm_2d_groundwater = waterbalance_widget.BarManager(
+        wb_widget._get_io_series_2d_groundwater()
+    )
+    wb_widget.bm_1d = waterbalance_widget.BarManager(wb_widget._get_io_series_1d())
+    wb_widget._barchart_model_slug = "model"
+    wb_widget._barchart_label = mock.Mock()
+    wb_widget._barchart_bars = [(wb_widget.bm_2d, mock.Mock(), mock.Mock())]
+    wb_widget.wb_barchart_widget = mock.Mock()
+    wb_widget.wb_barchart_widget.isVisible.return_value = True
+
+    view_box = wb_widget.plot_widget.getPlotItem().getViewBox()
+    _, bars_in, bars_out = wb_widget._barchart_bars[0]
+    for x_max in [10.0, 20.0]:
+        view_box.setXRange(0, x_max, padding=0)
+        expected = waterbalance_widget.BarManager(wb_widget._get_io_series_2d())
+        t1, t2 = wb_widget._get_barchart_time_range()
+        expected.calc_balance(ts, ts_series, t1, t2)
+        assert bars_in.setOpts.call_args[1]["height"] == expected.end_balance_in
+        assert bars_out.setOpts.call_args[1]["height"] == expected.end_balance_out
+    # the time series are read only once
+    assert wb_widget.calc_wb_barchart.call_count == 1
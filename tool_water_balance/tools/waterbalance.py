@@ -7,6 +7,7 @@ from ThreeDiToolbox.tool_water_balance.views.waterbalance_widget import (
     WaterBalanceWidget,
 )
 from ThreeDiToolbox.utils.patched_threedigrid import GridH5Admin
+from ThreeDiToolbox.utils.timing import timed
 
 import logging
 import numpy as np
@@ -67,6 +68,7 @@ class WaterBalanceCalculation(object):
                 range(y_grndwtr_range_min, y_grndwtr_range_max + 1)
             )
 
+    @timed("water_balance.link_ids")
     def get_incoming_and_outcoming_link_ids(self, wb_polygon, model_part):
         """Returns a tuple of dictionaries with ids by category:
 
@@ -373,6 +375,7 @@ class WaterBalanceCalculation(object):
         logger.info(str(flow_lines))
         return flow_lines, pump_selection
 
+    @timed("water_balance.nodes")
     def get_nodes(self, wb_polygon, model_part):
         """Returns a dictionary with node ids by category:
 
@@ -413,6 +416,7 @@ class WaterBalanceCalculation(object):
 
         return nodes
 
+    @timed("water_balance.aggregated_flows")
     def get_aggregated_flows(self, link_ids, pump_ids, node_ids, model_part):
         """
         Returns a tuple (ts, total_time) defined as:
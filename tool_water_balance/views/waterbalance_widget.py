@@ -103,6 +103,45 @@ def _get_feature_iterator(layer, request_filter):
 #######################
 
 
+class BalancePrefixSums(object):
+    """Cumulative in- and outgoing volumes per INPUT_SERIES column
+
+    The volumes are summed once per calculation, so the balance of any time
+    range is the difference of two rows: independent of the simulation length.
+    """
+
+    def __init__(self, ts, ts_series):
+        self.ts = ts
+        ts_deltas = np.concatenate(([0], np.diff(ts)))
+        # shape = (len(ts), N_series)
+        volumes = ts_deltas[:, np.newaxis] * ts_series
+        # row i contains the volumes of the timesteps before i
+        start = np.zeros((1, volumes.shape[1]))
+        self.volume_in = np.concatenate((start, np.cumsum(volumes.clip(min=0), axis=0)))
+        self.volume_out = np.concatenate(
+            (start, np.cumsum(volumes.clip(max=0), axis=0))
+        )
+
+    def _get_time_indices(self, t1, t2):
+        """Start and end (exclusive) time series index of range t1-t2."""
+        idx_x1 = np.searchsorted(self.ts, t1)
+        if not t2:
+            idx_x2 = len(self.ts)
+        else:
+            idx_x2 = np.searchsorted(self.ts, t2)
+        return idx_x1, max(idx_x1, idx_x2)
+
+    def balance_in(self, idxs, t1=0, t2=None):
+        """Total incoming volume of the series in range t1-t2."""
+        idx_x1, idx_x2 = self._get_time_indices(t1, t2)
+        return (self.volume_in[idx_x2, idxs] - self.volume_in[idx_x1, idxs]).sum()
+
+    def balance_out(self, idxs, t1=0, t2=None):
+        """Total outgoing (negative) volume of the series in range t1-t2."""
+        idx_x1, idx_x2 = self._get_time_indices(t1, t2)
+        return (self.volume_out[idx_x2, idxs] - self.volume_out[idx_x1, idxs]).sum()
+
+
 @functools.total_ordering
 class Bar(object):
     """Bar for waterbalance barchart with positive and negative components."""
@@ -117,43 +156,29 @@ class Bar(object):
         self._balance_in = None
         self._balance_out = None
 
-    @staticmethod
-    def _get_time_indices(ts, t1, t2):
-        """Time series indices in range t1-t2."""
-        idx_x1 = np.searchsorted(ts, t1)
-        if not t2:
-            idx_x2 = len(ts)
-        else:
-            idx_x2 = np.searchsorted(ts, t2)
-        return np.arange(idx_x1, idx_x2)
-
     @property
     def end_balance_in(self):
         return self._balance_in
 
-    def set_end_balance_in(self, ts, ts_series, t1=0, t2=None):
+    def set_end_balance_in(self, prefix_sums, t1=0, t2=None):
         idxs = [self.SERIES_NAME_TO_INDEX[name] for name in self.in_series]
-        ts_indices_sliced = self._get_time_indices(ts, t1, t2)
-        ts_deltas = np.concatenate(([0], np.diff(ts)))
-        # shape = (N_idxs, len(ts))
-        balance_tmp = (ts_deltas * ts_series[:, idxs].T).clip(min=0)
-        self._balance_in = balance_tmp[:, ts_indices_sliced].sum()
+        self._balance_in = prefix_sums.balance_in(idxs, t1, t2)
 
     @property
     def end_balance_out(self):
         return self._balance_out
 
-    def set_end_balance_out(self, ts, ts_series, t1=0, t2=None):
+    def set_end_balance_out(self, prefix_sums, t1=0, t2=None):
         idxs = [self.SERIES_NAME_TO_INDEX[name] for name in self.out_series]
-        ts_indices_sliced = self._get_time_indices(ts, t1, t2)
-        ts_deltas = np.concatenate(([0], np.diff(ts)))
-        balance_tmp = (ts_deltas * ts_series[:, idxs].T).clip(max=0)
-        self._balance_out = balance_tmp[:, ts_indices_sliced].sum()
+        self._balance_out = prefix_sums.balance_out(idxs, t1, t2)
+
+    def calc_balance(self, prefix_sums, t1=0, t2=None):
+        """Calculate balance values.
 
-    def calc_balance(self, ts, ts_series, t1=0, t2=None):
-        """Calculate balance values."""
-        self.set_end_balance_in(ts, ts_series, t1, t2)
-        self.set_end_balance_out(ts, ts_series, t1, t2)
+        :param prefix_sums: BalancePrefixSums of the time series
+        """
+        self.set_end_balance_in(prefix_sums, t1, t2)
+        self.set_end_balance_out(prefix_sums, t1, t2)
         if self.is_storage_like:
             self.convert_to_net()
 
@@ -205,9 +230,18 @@ class BarManager(object):
             ]
         )
 
-    def calc_balance(self, ts, ts_series, t1, t2, net=False, invert=[]):
+    def calc_balance(
+        self, ts, ts_series, t1, t2, net=False, invert=[], prefix_sums=None
+    ):
+        """Calculate the balance of all bars in range t1-t2.
+
+        Pass ``prefix_sums`` (a BalancePrefixSums of ts and ts_series) to share
+        it between bar managers and time ranges.
+        """
+        if prefix_sums is None:
+            prefix_sums = BalancePrefixSums(ts, ts_series)
         for b in self.bars:
-            b.calc_balance(ts, ts_series, t1=t1, t2=t2)
+            b.calc_balance(prefix_sums, t1=t1, t2=t2)
             if net:
                 b.convert_to_net()
             if b.label_name in invert:
@@ -682,10 +716,20 @@ class WaterBalanceWidget(QDockWidget):
         self.sum_type_combo_box.insertItems(0, list(serie_settings.keys()))
         self.agg_combo_box.insertItems(0, ["m3/s", "m3 cumulative"])
 
+        # ts, ts_series and BalancePrefixSums of the bar chart, dropped when
+        # the water balance is recalculated
+        self._barchart_cache = None
+        self.wb_barchart_widget = None
+        self._barchart_label = None
+        self._barchart_bars = []
+
         # add listeners
         self.select_polygon_button.toggled.connect(self.toggle_polygon_button)
         self.reset_waterbalans_button.clicked.connect(self.reset_waterbalans)
         self.chart_button.clicked.connect(self.show_barchart)
+        self.plot_widget.getPlotItem().getViewBox().sigXRangeChanged.connect(
+            self.update_barchart
+        )
         # self.polygon_tool.deactivated.connect(self.update_wb)
         self.modelpart_combo_box.currentIndexChanged.connect(self.update_wb)
         self.sum_type_combo_box.currentIndexChanged.connect(self.update_wb)
@@ -743,43 +787,88 @@ class WaterBalanceWidget(QDockWidget):
         ]
         return io_series_1d
 
+    def _get_barchart_data(self):
+        """Return the (cached) ts, ts_series and BalancePrefixSums of the
+        bar chart."""
+        if self._barchart_cache is None:
+            # always use domain '1d and 2d' to get all flows in the barchart
+            wb_barchart_modelpart = "1d and 2d"
+            ts, ts_series = self.calc_wb_barchart(wb_barchart_modelpart)
+            # the cumulative volumes are shared by all bars and time ranges
+            prefix_sums = BalancePrefixSums(ts, ts_series)
+            self._barchart_cache = ts, ts_series, prefix_sums
+        return self._barchart_cache
+
+    def _get_barchart_time_range(self):
+        """Return the timeseries x range (t1, t2) of the plot widget."""
+        viewbox_state = self.plot_widget.getPlotItem().getViewBox().getState()
+        view_range = viewbox_state["viewRange"]
+        t1, t2 = view_range[0]
+        return t1, t2
+
+    def calc_barchart_balance(self, t1, t2):
+        """Calculate the bars of the bar chart in range t1-t2."""
+        ts, ts_series, prefix_sums = self._get_barchart_data()
+        self.bm_net.calc_balance(
+            ts, ts_series, t1, t2, net=True, prefix_sums=prefix_sums
+        )
+        self.bm_2d.calc_balance(ts, ts_series, t1, t2, prefix_sums=prefix_sums)
+        self.bm_2d_groundwater.calc_balance(
+            ts,
+            ts_series,
+            t1,
+            t2,
+            invert=["in/exfiltration (domain exchange)"],
+            prefix_sums=prefix_sums,
+        )
+        self.bm_1d.calc_balance(ts, ts_series, t1, t2, prefix_sums=prefix_sums)
+
+    def _get_barchart_title(self, t1, t2):
+        return "Water balance from t=%.2f to t=%.2f \n Model name: %s" % (
+            max(0, t1),
+            t2,
+            self._barchart_model_slug,
+        )
+
+    def update_barchart(self, *args):
+        """Update the open bar chart to the time range of the plot widget.
+
+        Only the bars are recalculated, using the cached prefix sums.
+        """
+        if self.wb_barchart_widget is None or not self.wb_barchart_widget.isVisible():
+            return
+        t1, t2 = self._get_barchart_time_range()
+        self.calc_barchart_balance(t1, t2)
+        for bar_manager, bars_in, bars_out in self._barchart_bars:
+            bars_in.setOpts(height=bar_manager.end_balance_in)
+            bars_out.setOpts(height=bar_manager.end_balance_out)
+        self._barchart_label.setText(self._get_barchart_title(t1, t2))
+
     def show_barchart(self):
 
         # only possible to calculate bars when a polygon has been drawn
         if self.select_polygon_button.text() == "Finalize polygon":
             return
 
-        # always use domain '1d and 2d' to get all flows in the barchart
-        wb_barchart_modelpart = "1d and 2d"
-        ts, ts_series = self.calc_wb_barchart(wb_barchart_modelpart)
-
         io_series_net = self._get_io_series_net()
         io_series_2d = self._get_io_series_2d()
         io_series_2d_groundwater = self._get_io_series_2d_groundwater()
         io_series_1d = self._get_io_series_1d()
 
-        # get timeseries x range in plot widget
-        viewbox_state = self.plot_widget.getPlotItem().getViewBox().getState()
-        view_range = viewbox_state["viewRange"]
-        t1, t2 = view_range[0]
-
-        bm_net = BarManager(io_series_net)
-        bm_2d = BarManager(io_series_2d)
-        bm_2d_groundwater = BarManager(io_series_2d_groundwater)
-        bm_1d = BarManager(io_series_1d)
+        t1, t2 = self._get_barchart_time_range()
 
-        bm_net.calc_balance(ts, ts_series, t1, t2, net=True)
-        bm_2d.calc_balance(ts, ts_series, t1, t2)
-        bm_2d_groundwater.calc_balance(
-            ts, ts_series, t1, t2, invert=["in/exfiltration (domain exchange)"]
+        self.bm_net = bm_net = BarManager(io_series_net)
+        self.bm_2d = bm_2d = BarManager(io_series_2d)
+        self.bm_2d_groundwater = bm_2d_groundwater = BarManager(
+            io_series_2d_groundwater
         )
-        bm_1d.calc_balance(ts, ts_series, t1, t2)
+        self.bm_1d = bm_1d = BarManager(io_series_1d)
+        self.calc_barchart_balance(t1, t2)
 
         nc_path = self.ts_datasources.rows[0].threedi_result().file_path
         h5 = find_h5_file(nc_path)
         ga = GridH5Admin(h5)
 
-        t_start = max(0, t1)
         try:
             short_model_slug = ga.model_slug.rsplit("-", 1)[0]
         except Exception:
@@ -788,16 +877,13 @@ class WaterBalanceWidget(QDockWidget):
                 "Using model_name"
             )
             short_model_slug = ga.model_name
+        self._barchart_model_slug = short_model_slug
 
         self.wb_barchart_widget = pg.GraphicsView()
         layout = pg.GraphicsLayout()
         self.wb_barchart_widget.setCentralItem(layout)
-        text = "Water balance from t=%.2f to t=%.2f \n Model name: %s" % (
-            t_start,
-            t2,
-            short_model_slug,
-        )
-        layout.addLabel(text, row=0, col=0, colspan=3)
+        text = self._get_barchart_title(t1, t2)
+        self._barchart_label = layout.addLabel(text, row=0, col=0, colspan=3)
 
         self.wb_barchart_widget.setWindowTitle("Waterbalance")
         self.wb_barchart_widget.resize(1000, 600)
@@ -1042,6 +1128,14 @@ class WaterBalanceWidget(QDockWidget):
         )
         network1d_plot.setYRange(min=y_min, max=y_max)
 
+        # the bars that follow the time range of the plot widget
+        self._barchart_bars = [
+            (bm_net, bg_net_in, bg_net_out),
+            (bm_2d, surface_in, surface_out),
+            (bm_2d_groundwater, groundwater_in, groundwater_out),
+            (bm_1d, network1d_in, network1d_out),
+        ]
+
     def hover_enter_map_visualization(self, name):
         """On hover rubberband visualisation using the table item name.
 
@@ -1165,6 +1259,8 @@ class WaterBalanceWidget(QDockWidget):
         return modelpart_graph_series
 
     def update_wb(self):
+        # the polygon or the results changed
+        self._barchart_cache = None
         ts, graph_series = self.calc_wb_graph(
             self.modelpart_combo_box.currentText(),
             self.agg_combo_box.currentText(),
@@ -1427,6 +1523,9 @@ class WaterBalanceWidget(QDockWidget):
         self.select_polygon_button.toggled.disconnect(self.toggle_polygon_button)
         self.reset_waterbalans_button.clicked.disconnect(self.reset_waterbalans)
         self.chart_button.clicked.disconnect(self.show_barchart)
+        self.plot_widget.getPlotItem().getViewBox().sigXRangeChanged.disconnect(
+            self.update_barchart
+        )
         # self.polygon_tool.deactivated.disconnect(self.update_wb)
         self.iface.mapCanvas().unsetMapTool(self.polygon_tool)
         self.polygon_tool.close()
@@ -3,6 +3,7 @@ from osgeo import ogr
 from qgis.core import QgsDataSourceUri
 from qgis.core import QgsVectorLayer
 from ThreeDiToolbox.datasource.spatialite import disable_sqlite_synchronous
+from ThreeDiToolbox.utils.timing import timed
 
 import logging
 import os
@@ -47,13 +48,14 @@ def get_or_create_flowline_layer(ds, output_path):
     if not os.path.exists(output_path) or not contains_layer(
         output_path, FLOWLINES_LAYER_NAME
     ):
-        ga = ds.gridadmin
-        from .gridadmin import QgisLinesOgrExporter
+        with timed("export.flowline_layer"):
+            ga = ds.gridadmin
+            from .gridadmin import QgisLinesOgrExporter
 
-        exporter = QgisLinesOgrExporter("dont matter")
-        exporter.driver = ogr.GetDriverByName("SQLite")
-        sliced = ga.lines.slice(IGNORE_FIRST).reproject_to(str(WGS84_EPSG))
-        exporter.save(output_path, FLOWLINES_LAYER_NAME, sliced.data, 4326)
+            exporter = QgisLinesOgrExporter("dont matter")
+            exporter.driver = ogr.GetDriverByName("SQLite")
+            sliced = ga.lines.slice(IGNORE_FIRST).reproject_to(str(WGS84_EPSG))
+            exporter.save(output_path, FLOWLINES_LAYER_NAME, sliced.data, 4326)
     return _get_vector_layer(output_path, FLOWLINES_LAYER_NAME)
 
 
@@ -62,13 +64,14 @@ def get_or_create_node_layer(ds, output_path):
     if not os.path.exists(output_path) or not contains_layer(
         output_path, NODES_LAYER_NAME
     ):
-        ga = ds.gridadmin
-        from .gridadmin import QgisNodesOgrExporter
+        with timed("export.node_layer"):
+            ga = ds.gridadmin
+            from .gridadmin import QgisNodesOgrExporter
 
-        exporter = QgisNodesOgrExporter("dont matter")
-        exporter.driver = ogr.GetDriverByName("SQLite")
-        sliced = ga.nodes.slice(IGNORE_FIRST).reproject_to(str(WGS84_EPSG))
-        exporter.save(output_path, NODES_LAYER_NAME, sliced.data, WGS84_EPSG)
+            exporter = QgisNodesOgrExporter("dont matter")
+            exporter.driver = ogr.GetDriverByName("SQLite")
+            sliced = ga.nodes.slice(IGNORE_FIRST).reproject_to(str(WGS84_EPSG))
+            exporter.save(output_path, NODES_LAYER_NAME, sliced.data, WGS84_EPSG)
     return _get_vector_layer(output_path, NODES_LAYER_NAME)
 
 
@@ -77,17 +80,22 @@ def get_or_create_cell_layer(ds, output_path):
     if not os.path.exists(output_path) or not contains_layer(
         output_path, CELLS_LAYER_NAME
     ):
-        ga = ds.gridadmin
-        from .gridadmin import QgisNodesOgrExporter
-
-        exporter = QgisNodesOgrExporter("dont matter")
-        exporter.driver = ogr.GetDriverByName("SQLite")
-        sliced = ga.cells.slice(
-            IGNORE_FIRST
-        )  # do not reproject to prevent coordinate drift
-        exporter.save(
-            output_path, CELLS_LAYER_NAME, sliced.data, int(ga.epsg_code), as_cells=True
-        )
+        with timed("export.cell_layer"):
+            ga = ds.gridadmin
+            from .gridadmin import QgisNodesOgrExporter
+
+            exporter = QgisNodesOgrExporter("dont matter")
+            exporter.driver = ogr.GetDriverByName("SQLite")
+            sliced = ga.cells.slice(
+                IGNORE_FIRST
+            )  # do not reproject to prevent coordinate drift
+            exporter.save(
+                output_path,
+                CELLS_LAYER_NAME,
+                sliced.data,
+                int(ga.epsg_code),
+                as_cells=True,
+            )
     return _get_vector_layer(output_path, CELLS_LAYER_NAME)
 
 
@@ -98,11 +106,14 @@ def get_or_create_pumpline_layer(ds, output_path):
         output_path, PUMPLINES_LAYER_NAME
     ):
         if ga.has_pumpstations:
-            from .gridadmin import QgisPumpsOgrExporter
-
-            exporter = QgisPumpsOgrExporter(node_data=ga.nodes.data)
-            exporter.driver = ogr.GetDriverByName("SQLite")
-            sliced = ga.pumps.slice(IGNORE_FIRST).reproject_to(str(WGS84_EPSG))
-            exporter.save(output_path, PUMPLINES_LAYER_NAME, sliced.data, WGS84_EPSG)
+            with timed("export.pumpline_layer"):
+                from .gridadmin import QgisPumpsOgrExporter
+
+                exporter = QgisPumpsOgrExporter(node_data=ga.nodes.data)
+                exporter.driver = ogr.GetDriverByName("SQLite")
+                sliced = ga.pumps.slice(IGNORE_FIRST).reproject_to(str(WGS84_EPSG))
+                exporter.save(
+                    output_path, PUMPLINES_LAYER_NAME, sliced.data, WGS84_EPSG
+                )
     if ga.has_pumpstations:
         return _get_vector_layer(output_path, PUMPLINES_LAYER_NAME)
@@ -0,0 +1,84 @@
+"""Stand-in for a tool that is only imported when it is first used
+
+Most tools import heavy modules (pyqtgraph, SQLAlchemy models, ``.ui`` files)
+that slow down the start of QGIS. :py:class:`LazyTool` has the attributes the
+plugin needs to register the toolbar action (``icon_path`` and
+``menu_text``). The tool module is imported and the tool is created on the
+first ``run()``. After that, the stand-in passes on all attributes to the
+tool. Before that, it only knows its ``defaults``: checks like
+``hasattr(tool, "set_state")`` (see
+:py:class:`ThreeDiToolbox.utils.qprojects.ProjectStateMixin`) must not load
+the tool.
+
+Note: this module does not import qgis.
+
+"""
+import importlib
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class LazyTool(object):
+    """Tool that is imported and created on first use
+
+    args:
+        import_path (str): ``"module.path:ClassName"`` of the tool
+        icon_path (str): icon of the toolbar action, same as the tool's
+        menu_text (str): text of the menu item, same as the tool's
+        args: arguments of the tool's constructor
+        defaults (dict): attribute values that are returned as long as the
+            tool isn't loaded, e.g. ``{"active": False}``
+    """
+
+    def __init__(self, import_path, icon_path, menu_text, *args, defaults=None):
+        self.import_path = import_path
+        self.icon_path = icon_path
+        self.menu_text = menu_text
+        self.args = args
+        self.defaults = defaults or {}
+        self._tool = None
+
+    def __repr__(self):
+        return "<LazyTool {} ({})>".format(
+            self.import_path, "loaded" if self.loaded else "not loaded"
+        )
+
+    @property
+    def loaded(self):
+        return self._tool is not None
+
+    @property
+    def tool(self):
+        """The actual tool, imported and created on first access"""
+        if self._tool is None:
+            module_name, class_name = self.import_path.split(":")
+            logger.info("Loading tool %s", self.import_path)
+            tool_class = getattr(importlib.import_module(module_name), class_name)
+            tool = tool_class(*self.args)
+            if "action_icon" in self.__dict__:
+                # The plugin sets the action_icon of the tools, see
+                # ``ThreeDiPlugin.add_action()``.
+                tool.action_icon = self.action_icon
+            self._tool = tool
+        return self._tool
+
+    def run(self):
+        return self.tool.run()
+
+    def on_unload(self):
+        if self.loaded:
+            self._tool.on_unload()
+
+    def __getattr__(self, name):
+        # Only called for attributes the stand-in doesn't have itself.
+        if name.startswith("__") or name in ("_tool", "defaults"):
+            raise AttributeError(name)
+        if self.loaded:
+            return getattr(self._tool, name)
+        if name in self.defaults:
+            return self.defaults[name]
+        raise AttributeError(
+            "{} has no attribute {} (the tool is not loaded yet)".format(self, name)
+        )
@@ -23,6 +23,8 @@ import os
 
 #: Name of the logfile.
 LOGFILE_NAME = "threedi-qgis-log.txt"
+#: Name of the summary of the timed operations, see ``utils/timing.py``.
+TIMING_SUMMARY_NAME = "threedi-qgis-timings.txt"
 PYTHON_FORMAT = "%(name)s %(levelname)s %(message)s"
 QGIS_FORMAT = "%(name)s\n%(message)s"  # Note: split over two lines.
 
@@ -73,6 +75,11 @@ def logfile_path():
     return os.path.join(QgsApplication.qgisSettingsDirPath(), LOGFILE_NAME)
 
 
+def timing_summary_path():
+    """Return the location of the timing summary, next to the logfile"""
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), TIMING_SUMMARY_NAME)
+
+
 def setup_logging():
     """Set up python and qgis logging.
 
@@ -5,19 +5,38 @@ from sqlalchemy import create_engine
 from sqlalchemy.event import listen
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql import text
 from ThreeDiToolbox.utils.user_messages import StatusProgressBar
 
 import collections
 import copy
+import hashlib
 import logging
 import os
+import threading
 
 
 Base = declarative_base()
 
 logger = logging.getLogger(__name__)
 
+# Process-wide registry of engines, keyed by connection settings (see
+# engine_key()). Predictor, Guesser, the statistics tool etc. all create their
+# own ThreediDatabase, this way they share one connection pool per database.
+_engines = {}
+_engines_lock = threading.Lock()
+
+# Applied to every new (pooled) spatialite connection. The journal mode is
+# left alone: WAL would permanently change the user's model databases and
+# keep committed edits in a -wal file next to them. So is synchronous=FULL:
+# with the default (DELETE) journal mode, NORMAL can corrupt the database on
+# a power loss.
+SPATIALITE_PRAGMAS = [
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",  # 64 MB
+]
+
 
 def load_spatialite(con, connection_record):
     """Load spatialite extension as described in
@@ -53,6 +72,94 @@ def load_spatialite(con, connection_record):
     con.enable_load_extension(False)
 
 
+def set_spatialite_pragmas(con, connection_record):
+    """Tune a new spatialite connection, see ``SPATIALITE_PRAGMAS``"""
+    import sqlite3
+
+    cur = con.cursor()
+    for pragma in SPATIALITE_PRAGMAS:
+        try:
+            cur.execute(pragma)
+        except sqlite3.OperationalError:
+            logger.exception("Could not set '%s', continuing anyway", pragma)
+    cur.close()
+
+
+def engine_key(db_type, connection_settings, echo=False):
+    """Return the key of an engine in the registry of shared engines"""
+    if db_type == "spatialite":
+        return (db_type, os.path.abspath(str(connection_settings["db_path"])), echo)
+    return (
+        db_type,
+        connection_settings["host"],
+        str(connection_settings["port"]),
+        connection_settings["database"],
+        connection_settings["username"],
+        # other credentials need another engine, don't keep the password itself
+        hashlib.sha256(
+            str(connection_settings.get("password", "")).encode("utf-8")
+        ).hexdigest(),
+        echo,
+    )
+
+
+def create_threedi_engine(db_type, connection_settings, echo=False):
+    """Return a new sqlalchemy engine with a connection pool
+
+    For spatialite the extension is loaded and the pragmas are set once per
+    pooled connection instead of for every session.
+    """
+    if db_type == "spatialite":
+        engine = create_engine(
+            "sqlite:///{0}".format(connection_settings["db_path"]),
+            echo=echo,
+            poolclass=QueuePool,
+            pool_size=5,
+            max_overflow=10,
+            # pooled connections can be handed out to other (processing) threads
+            connect_args={"check_same_thread": False},
+        )
+        listen(engine, "connect", load_spatialite)
+        listen(engine, "connect", set_spatialite_pragmas)
+        return engine
+    elif db_type == "postgres":
+        con = "postgresql://{username}:{password}@{host}:" "{port}/{database}".format(
+            **connection_settings
+        )
+        return create_engine(con, echo=echo, pool_pre_ping=True)
+
+
+def get_shared_engine(db_type, connection_settings, echo=False):
+    """Return the engine from the registry, create and register it if needed"""
+    key = engine_key(db_type, connection_settings, echo)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = create_threedi_engine(db_type, connection_settings, echo)
+            if engine is not None:
+                _engines[key] = engine
+    return engine
+
+
+def dispose_engine(db_type, connection_settings, echo=False):
+    """Close the pooled connections of one engine and remove it from the registry"""
+    key = engine_key(db_type, connection_settings, echo)
+    with _engines_lock:
+        engine = _engines.pop(key, None)
+    if engine is not None:
+        engine.dispose()
+
+
+def dispose_all_engines():
+    """Close all pooled connections, called when the plugin is unloaded"""
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.dispose()
+    logger.debug("Disposed %s shared database engines", len(engines))
+
+
 class ThreediDatabase(object):
     def __init__(self, connection_settings, db_type="spatialite", echo=False):
         """
@@ -82,6 +189,9 @@ class ThreediDatabase(object):
         if self.db_type == "spatialite":
 
             if overwrite and os.path.isfile(self.settings["db_file"]):
+                # pooled connections would still point to the removed file
+                self._engine = None
+                dispose_engine(self.db_type, self.settings, self.echo)
                 os.remove(self.settings["db_file"])
 
             drv = ogr.GetDriverByName("SQLite")
@@ -98,30 +208,15 @@ class ThreediDatabase(object):
         return self.get_engine()
 
     def get_engine(self, get_seperate_engine=False):
+        """Return the shared engine for our connection settings
 
-        if self._engine is None or get_seperate_engine:
-            if self.db_type == "spatialite":
-                engine = create_engine(
-                    "sqlite:///{0}".format(self.settings["db_path"]), echo=self.echo
-                )
-                listen(engine, "connect", load_spatialite)
-                if get_seperate_engine:
-                    return engine
-                else:
-                    self._engine = engine
-
-            elif self.db_type == "postgres":
-                con = (
-                    "postgresql://{username}:{password}@{host}:"
-                    "{port}/{database}".format(**self.settings)
-                )
-
-                engine = create_engine(con, echo=self.echo)
-                if get_seperate_engine:
-                    return engine
-                else:
-                    self._engine = engine
-
+        :param get_seperate_engine: return a new engine that is not shared
+            with other ThreediDatabase instances
+        """
+        if get_seperate_engine:
+            return create_threedi_engine(self.db_type, self.settings, self.echo)
+        if self._engine is None:
+            self._engine = get_shared_engine(self.db_type, self.settings, self.echo)
         return self._engine
 
     def get_metadata(self, including_existing_tables=True, engine=None):
@@ -512,13 +607,13 @@ def get_databases():
             },
         }
 
-        if qs.value(prefix + "/saveUsername") == u"true":
+        if qs.value(prefix + "/saveUsername") == "true":
             settings["saveUsername"] = True
             settings["db_settings"]["username"] = qs.value(prefix + "/username")
         else:
             settings["saveUsername"] = False
 
-        if qs.value(prefix + "/savePassword") == u"true":
+        if qs.value(prefix + "/savePassword") == "true":
             settings["savePassword"] = True
             settings["db_settings"]["password"] = qs.value(prefix + "/password")
         else:
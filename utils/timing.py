@@ -0,0 +1,220 @@
+"""Timing of the slow operations: result reads, layer exports, water balance...
+
+Wrap an operation in :py:func:`timed`, which works both as a context manager
+and as a decorator::
+
+    with timed("threedi_result.read_variable") as measurement:
+        values = ...
+        measurement.add_bytes(values.nbytes)
+
+    @timed("water_balance.aggregated_flows")
+    def get_aggregated_flows(...):
+        ...
+
+Timing is off by default, see :py:func:`enable`. When it is on, the duration,
+the bytes read and the cache hits and misses of every run are collected per
+operation and logged (DEBUG) to the logger of this module, so they
+end up in the logfile (see :py:mod:`ThreeDiToolbox.utils.qlogging`).
+:py:func:`summary` returns a text overview with a histogram of the durations
+per operation, which can be attached to a bug report.
+
+Note: this module does not import qgis.
+
+"""
+import collections
+import contextlib
+import datetime
+import logging
+import numpy as np
+import threading
+import time
+
+
+#: Number of durations per operation that are kept for the percentiles.
+MAX_DURATIONS = 1000
+#: Upper bounds (seconds) of the histogram bins, the last bin is open.
+HISTOGRAM_BOUNDS = [0.001, 0.01, 0.1, 1, 10]
+HISTOGRAM_LABELS = ["< 1 ms", "< 10 ms", "< 100 ms", "< 1 s", "< 10 s", ">= 10 s"]
+HISTOGRAM_WIDTH = 40
+
+logger = logging.getLogger(__name__)
+
+_settings = {"enabled": False}
+_statistics = collections.OrderedDict()
+# Processing algorithms run in a background thread.
+_lock = threading.Lock()
+
+
+class Measurement(object):
+    """The bytes read and the cache hits and misses of one run"""
+
+    __slots__ = ("duration", "nbytes", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.duration = None
+        self.nbytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add_bytes(self, nbytes):
+        self.nbytes += int(nbytes)
+
+    def cache_hit(self, hit=True):
+        """Count a cache hit, or a cache miss when ``hit`` is False"""
+        if hit:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+
+
+class OperationStatistics(object):
+    """The runs of one operation"""
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.nbytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.durations = collections.deque(maxlen=MAX_DURATIONS)
+        self.histogram = [0] * len(HISTOGRAM_LABELS)
+
+    def add(self, measurement):
+        duration = measurement.duration
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.nbytes += measurement.nbytes
+        self.cache_hits += measurement.cache_hits
+        self.cache_misses += measurement.cache_misses
+        self.durations.append(duration)
+        self.histogram[np.searchsorted(HISTOGRAM_BOUNDS, duration, side="right")] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count
+
+    def percentile(self, q):
+        """Return the q-th percentile of the last MAX_DURATIONS durations"""
+        return float(np.percentile(self.durations, q))
+
+
+def enable(enabled=True):
+    """Switch timing on (or off), e.g. from the performance panel"""
+    _settings["enabled"] = bool(enabled)
+    logger.info("Timing of operations %s", "enabled" if enabled else "disabled")
+
+
+def is_enabled():
+    return _settings["enabled"]
+
+
+@contextlib.contextmanager
+def timed(operation):
+    """Time an operation, yields a :py:class:`Measurement`
+
+    When timing is disabled, the measurement is simply dropped.
+    """
+    measurement = Measurement()
+    if not _settings["enabled"]:
+        yield measurement
+        return
+    start = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement.duration = time.perf_counter() - start
+        record(operation, measurement)
+
+
+def record(operation, measurement):
+    """Add a finished measurement to the statistics of the operation"""
+    with _lock:
+        if operation not in _statistics:
+            _statistics[operation] = OperationStatistics(operation)
+        _statistics[operation].add(measurement)
+    logger.debug(
+        "%s: %.4f s, %d bytes read, %d cache hits, %d cache misses",
+        operation,
+        measurement.duration,
+        measurement.nbytes,
+        measurement.cache_hits,
+        measurement.cache_misses,
+    )
+
+
+def statistics():
+    """Return a dict of operation name to :py:class:`OperationStatistics`"""
+    with _lock:
+        return dict(_statistics)
+
+
+def reset():
+    """Forget all measurements"""
+    with _lock:
+        _statistics.clear()
+
+
+def _format_histogram(histogram):
+    largest = max(histogram)
+    lines = []
+    for label, count in zip(HISTOGRAM_LABELS, histogram):
+        bar = "#" * int(round(HISTOGRAM_WIDTH * count / largest))
+        lines.append(
+            "    {:>8} | {:<{width}} {}".format(
+                label, bar, count, width=HISTOGRAM_WIDTH
+            )
+        )
+    return lines
+
+
+def summary():
+    """Return a text overview of the timed operations
+
+    Per operation the number of runs, total, mean, median, 90th percentile and
+    maximum duration, the data read and the cache hits and misses, followed by
+    a histogram of the durations.
+    """
+    lines = [
+        "3Di toolbox timings ({}, timing {})".format(
+            datetime.datetime.now().isoformat(timespec="seconds"),
+            "enabled" if is_enabled() else "disabled",
+        )
+    ]
+    operations = statistics()
+    if not operations:
+        lines.append("No operations timed yet.")
+        return "\n".join(lines) + "\n"
+
+    for name, stats in sorted(operations.items(), key=lambda item: -item[1].total):
+        lines.append("")
+        lines.append(name)
+        lines.append(
+            "  runs: {}, total: {:.3f} s, mean: {:.4f} s, p50: {:.4f} s, "
+            "p90: {:.4f} s, max: {:.4f} s".format(
+                stats.count,
+                stats.total,
+                stats.mean,
+                stats.percentile(50),
+                stats.percentile(90),
+                stats.max,
+            )
+        )
+        if stats.nbytes or stats.cache_hits or stats.cache_misses:
+            lines.append(
+                "  read: {:.3f} MB, cache hits: {}, cache misses: {}".format(
+                    stats.nbytes / 1000 / 1000, stats.cache_hits, stats.cache_misses
+                )
+            )
+        lines.extend(_format_histogram(stats.histogram))
+    return "\n".join(lines) + "\n"
+
+
+def write_summary(path):
+    """Write the :py:func:`summary` to a text file, return the path"""
+    with open(path, "w", encoding="utf-8") as summary_file:
+        summary_file.write(summary())
+    logger.info("Wrote timing summary to %s", path)
+    return path
@@ -0,0 +1,101 @@
+from qgis.PyQt.QtCore import pyqtSignal
+from qgis.PyQt.QtGui import QFont
+from qgis.PyQt.QtWidgets import QCheckBox
+from qgis.PyQt.QtWidgets import QDockWidget
+from qgis.PyQt.QtWidgets import QHBoxLayout
+from qgis.PyQt.QtWidgets import QLabel
+from qgis.PyQt.QtWidgets import QPlainTextEdit
+from qgis.PyQt.QtWidgets import QPushButton
+from qgis.PyQt.QtWidgets import QVBoxLayout
+from qgis.PyQt.QtWidgets import QWidget
+from ThreeDiToolbox.utils import qlogging
+from ThreeDiToolbox.utils import timing
+
+
+class TimingDockWidget(QDockWidget):
+    """Dock widget with the timings of the slow operations
+
+    Recording can be switched on and off, the summary (see
+    :py:func:`ThreeDiToolbox.utils.timing.summary`) can be saved next to the
+    logfile to attach it to a bug report.
+    """
+
+    closingWidget = pyqtSignal(int)
+
+    def __init__(self, iface, parent_widget=None, nr=0):
+        super().__init__(parent_widget)
+        self.iface = iface
+        self.nr = nr
+        self.setup_ui()
+
+        self.record_checkbox.setChecked(timing.is_enabled())
+        self.record_checkbox.stateChanged.connect(self.on_record_changed)
+        self.refresh_button.clicked.connect(self.refresh)
+        self.reset_button.clicked.connect(self.on_reset)
+        self.save_button.clicked.connect(self.on_save)
+        self.refresh()
+
+    def on_record_changed(self, state):
+        timing.enable(self.record_checkbox.isChecked())
+        self.refresh()
+
+    def refresh(self):
+        self.summary_text.setPlainText(timing.summary())
+
+    def on_reset(self):
+        timing.reset()
+        self.refresh()
+
+    def on_save(self):
+        path = timing.write_summary(qlogging.timing_summary_path())
+        self.saved_label.setText("Saved to %s" % path)
+        self.refresh()
+
+    def on_close(self):
+        """
+        unloading widget and remove all required stuff
+        :return:
+        """
+        self.record_checkbox.stateChanged.disconnect(self.on_record_changed)
+        self.refresh_button.clicked.disconnect(self.refresh)
+        self.reset_button.clicked.disconnect(self.on_reset)
+        self.save_button.clicked.disconnect(self.on_save)
+
+    def closeEvent(self, event):
+        """
+        overwrite of QDockWidget class to emit signal
+        :param event: QEvent
+        """
+        self.on_close()
+        self.closingWidget.emit(self.nr)
+        event.accept()
+
+    def setup_ui(self):
+        self.setObjectName("TimingDockWidget")
+        self.setWindowTitle("3Di performance timings")
+
+        self.contents = QWidget(self)
+        layout = QVBoxLayout(self.contents)
+
+        button_bar = QHBoxLayout()
+        self.record_checkbox = QCheckBox("Record timings", self.contents)
+        self.refresh_button = QPushButton("Refresh", self.contents)
+        self.reset_button = QPushButton("Reset", self.contents)
+        self.save_button = QPushButton("Save summary", self.contents)
+        button_bar.addWidget(self.record_checkbox)
+        button_bar.addStretch()
+        button_bar.addWidget(self.refresh_button)
+        button_bar.addWidget(self.reset_button)
+        button_bar.addWidget(self.save_button)
+        layout.addLayout(button_bar)
+
+        self.summary_text = QPlainTextEdit(self.contents)
+        self.summary_text.setReadOnly(True)
+        self.summary_text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.summary_text.setFont(QFont("Monospace"))
+        layout.addWidget(self.summary_text)
+
+        self.saved_label = QLabel(self.contents)
+        layout.addWidget(self.saved_label)
+
+        self.setWidget(self.contents)